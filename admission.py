@@ -0,0 +1,128 @@
+# admission.py
+"""
+Admission control for the prediction routes.
+
+Two cheap checks run before any expensive work:
+    * inspect_image() validates format and dimensions from the image header
+      only (PIL reads pixels lazily), so oversized images and decompression
+      bombs are rejected before a single pixel is decoded
+    * AdmissionController caps the number of requests decoding and scoring
+      at once; a bounded number of further requests wait briefly for a slot,
+      anything beyond that is shed immediately with 429, and requests that
+      waited too long get 503, both with Retry-After
+
+Admitted requests therefore never queue behind an unbounded backlog, which
+keeps their latency bounded when the server is overloaded.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Formats the model pipeline accepts (PIL format names)
+DEFAULT_FORMATS = ('JPEG', 'PNG', 'BMP', 'GIF')
+# PIL reports many phone and camera JPEGs (multi-picture format) as MPO
+FORMAT_ALIASES = {'MPO': 'JPEG'}
+
+
+class ImageRejected(Exception):
+    """Image refused from its header alone"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Overloaded(Exception):
+    """Request shed by admission control"""
+
+    def __init__(self, message, status_code, retry_after, reason):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def inspect_image(image, allowed_formats=DEFAULT_FORMATS, max_pixels=40_000_000, max_side=10_000):
+    """
+    Validate a freshly opened (not yet loaded) PIL image from its header.
+    Raises ImageRejected for unsupported formats (415) or oversized dimensions (413).
+    """
+    if FORMAT_ALIASES.get(image.format, image.format) not in allowed_formats:
+        raise ImageRejected(f"Unsupported image format {image.format or 'unknown'} "
+                            f"(allowed: {', '.join(allowed_formats)})", 415)
+
+    width, height = image.size
+    if width <= 0 or height <= 0:
+        raise ImageRejected('Invalid image dimensions')
+    if width > max_side or height > max_side or width * height > max_pixels:
+        raise ImageRejected(f'Image too large: {width}x{height} (max {max_side} px per side, '
+                            f'{max_pixels / 1e6:.0f} MP)', 413)
+    return image
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=32, max_queue=64, queue_timeout=2.0):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @contextmanager
+    def admit(self):
+        """
+        Hold one of max_concurrent slots for the duration of the block; yields
+        the seconds spent waiting. Raises Overloaded when the request is shed.
+        """
+        start = time.perf_counter()
+        with self._condition:
+            if self.in_flight >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    self.shed_queue_full += 1
+                    raise Overloaded('Server is overloaded, retry shortly', 429, 1, 'queue_full')
+
+                self.waiting += 1
+                try:
+                    admitted = self._condition.wait_for(lambda: self.in_flight < self.max_concurrent,
+                                                        timeout=self.queue_timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self.shed_timeout += 1
+                    raise Overloaded('Server is busy, retry shortly', 503, 2, 'queue_timeout')
+
+            self.in_flight += 1
+            self.admitted += 1
+            waited = time.perf_counter() - start
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            yield waited
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'queue_timeout_ms': self.queue_timeout * 1000.0,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'shed_queue_full': self.shed_queue_full,
+                'shed_timeout': self.shed_timeout,
+                'avg_wait_ms': self._wait_total / self.admitted * 1000.0 if self.admitted else 0.0,
+                'max_wait_ms': self._wait_max * 1000.0
+            }
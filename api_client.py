@@ -0,0 +1,153 @@
+# api_client.py
+"""
+Client for the skin cancer detection API, used by gui_app.py and scripts.
+
+    from api_client import SkinCancerAPIClient
+
+    client = SkinCancerAPIClient('http://127.0.0.1:5000', downscale=True)
+    prediction, error = client.predict_file('TestImages/Benign/ISIC_0024306.jpg')
+
+One requests.Session with a connection pool is kept for the lifetime of the
+client, so requests reuse keep-alive connections. Connection errors, 503
+(model still loading, server busy) and 429 (load shed) responses are retried
+with exponential backoff, honouring the server's Retry-After header.
+
+downscale=True resizes images to the model input size (224x224) on the
+client, the same way the server would, and uploads them as lossless PNG, so
+multi-megabyte photos become ~100 KB uploads with identical predictions.
+compress=True gzips request bodies (Content-Encoding: gzip); this mostly
+helps JSON/base64 and PNG bodies, JPEG data is already compressed.
+"""
+import base64
+import gzip
+import io
+import mimetypes
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from preprocessing import TARGET_SIZE, load_image_array
+
+
+class SkinCancerAPIClient:
+    def __init__(self, base_url='http://127.0.0.1:5000', connect_timeout=3.05, read_timeout=30,
+                 retries=3, backoff_factor=0.5, pool_maxsize=4, downscale=False, compress=False):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.downscale = downscale
+        self.compress = compress
+
+        retry = Retry(total=retries, connect=retries, read=0, status=retries,
+                      status_forcelist=(429, 503), allowed_methods=None, backoff_factor=backoff_factor,
+                      respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Requests
+
+    def _post(self, path, data, content_type, params=None):
+        headers = {'Content-Type': content_type}
+        if self.compress:
+            data = gzip.compress(data, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        return self.session.post(f'{self.base_url}{path}', data=data, headers=headers, params=params,
+                                 timeout=self.timeout)
+
+    @staticmethod
+    def _error(response):
+        try:
+            return response.json().get('error', f'Server error ({response.status_code})')
+        except ValueError:
+            return f'Server error ({response.status_code})' if response.content else 'Server unavailable'
+
+    def health(self):
+        """GET /health as a dict (raises requests exceptions if the server is unreachable)"""
+        response = self.session.get(f'{self.base_url}/health', timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def ready(self):
+        """True once the server's model is loaded"""
+        try:
+            return self.session.get(f'{self.base_url}/ready', timeout=self.timeout).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def prepare_image(self, image_bytes, content_type):
+        """Return (body, content type) to upload, downscaled to the model input size if enabled"""
+        if not self.downscale:
+            return image_bytes, content_type
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            if image.size == tuple(TARGET_SIZE) and image.format == 'PNG':
+                return image_bytes, content_type
+            array = load_image_array(image, TARGET_SIZE)
+        buffer = io.BytesIO()
+        Image.fromarray(array).save(buffer, format='PNG')
+        return buffer.getvalue(), 'image/png'
+
+    def predict_bytes(self, image_bytes, content_type='application/octet-stream', model=None, tta=None, tiles=None,
+                      explain=False):
+        """
+        Score raw image bytes with /predict; returns (prediction, error).
+        tiles=N requests tiled inference, which needs the full-resolution upload.
+        explain=True adds prediction['explanation'] with a Grad-CAM heatmap and
+        a base64 PNG overlay (see overlay_image()).
+        """
+        if tiles:
+            body = image_bytes
+        else:
+            body, content_type = self.prepare_image(image_bytes, content_type)
+        params = {key: value for key, value in (('model', model), ('tta', tta), ('tiles', tiles),
+                                                ('explain', int(explain))) if value}
+        response = self._post('/predict', body, content_type, params)
+        if response.status_code == 200:
+            result = response.json()
+            if result.get('success'):
+                return result['prediction'], None
+            return None, result.get('error', 'Unknown error')
+        return None, self._error(response)
+
+    def predict_file(self, file_path, model=None, tta=None, tiles=None, explain=False):
+        """Score an image file; returns (prediction, error)"""
+        with open(file_path, 'rb') as f:
+            image_bytes = f.read()
+        content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        return self.predict_bytes(image_bytes, content_type, model=model, tta=tta, tiles=tiles, explain=explain)
+
+    @staticmethod
+    def overlay_image(prediction):
+        """Grad-CAM overlay of an explained prediction as a PIL image, or None"""
+        encoded = prediction.get('explanation', {}).get('overlay_png')
+        if not encoded:
+            return None
+        image = Image.open(io.BytesIO(base64.b64decode(encoded)))
+        image.load()
+        return image
+
+    def predict_batch(self, file_paths, model=None):
+        """Score several files in one /predict_batch request; returns (results, error)"""
+        files = []
+        for path in file_paths:
+            with open(path, 'rb') as f:
+                body, content_type = self.prepare_image(f.read(), mimetypes.guess_type(path)[0])
+            files.append(('images', (path, body, content_type or 'application/octet-stream')))
+
+        # Multipart bodies are built by requests, so they are sent uncompressed
+        response = self.session.post(f'{self.base_url}/predict_batch', files=files,
+                                     params={'model': model} if model else None, timeout=self.timeout)
+        if response.status_code == 200:
+            return response.json()['results'], None
+        return None, self._error(response)
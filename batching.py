@@ -0,0 +1,145 @@
+# batching.py
+import threading
+import queue
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching scheduler in front of the model.
+
+    Requests submit a preprocessed image and block on a Future. A single worker
+    thread collects pending images and flushes them as one batch when either
+    max_batch_size images are queued or max_wait_ms has passed since the first
+    image of the batch arrived. Results are fanned back out row by row.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        # Counters used to tune batch size / deadline
+        self._batches = 0
+        self._items = 0
+        self._full_batches = 0
+        self._wait_total = 0.0
+
+    def _ensure_worker(self):
+        # The worker is started lazily on first use
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='micro-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, image_array):
+        """
+        Queue a single preprocessed image (shape (1, H, W, C) or (H, W, C))
+        and return a Future resolving to its prediction row.
+        """
+        if image_array.ndim == 4:
+            image_array = image_array[0]
+
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((image_array, future, time.perf_counter()))
+        return future
+
+    def predict(self, image_array, timeout=None):
+        """Blocking helper: submit an image and wait for its prediction row"""
+        return self.submit(image_array).result(timeout=timeout)
+
+    def close(self):
+        """Stop the worker thread once the requests already queued have been served"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+
+    def _collect(self):
+        # Block until the first item arrives, then fill up to the deadline
+        first = self._queue.get()
+        if first is None:
+            return None
+        items = [first]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Close requested: serve this batch, then stop
+                self._queue.put(None)
+                return items
+            items.append(item)
+
+        # Drain anything already waiting without extending the deadline
+        while len(items) < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            items.append(item)
+
+        return items
+
+    def _worker(self):
+        while True:
+            items = self._collect()
+            if items is None:
+                return
+            futures = [future for _, future, _ in items]
+
+            try:
+                batch = np.stack([array for array, _, _ in items])
+                predictions = self.predict_fn(batch)
+                if len(predictions) != len(items):
+                    raise ValueError(f"predict_fn returned {len(predictions)} rows for a batch of {len(items)}")
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            now = time.perf_counter()
+            with self._lock:
+                self._batches += 1
+                self._items += len(items)
+                if len(items) == self.max_batch_size:
+                    self._full_batches += 1
+                self._wait_total += sum(now - queued_at for _, _, queued_at in items)
+
+            for i, future in enumerate(futures):
+                future.set_result(predictions[i])
+
+    def stats(self):
+        """Return batching counters (average fill, queue depth, latency)"""
+        with self._lock:
+            batches = self._batches
+            items = self._items
+            avg_batch_size = items / batches if batches else 0.0
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': batches,
+                'items': items,
+                'full_batches': self._full_batches,
+                'avg_batch_size': avg_batch_size,
+                'avg_batch_fill': avg_batch_size / self.max_batch_size if batches else 0.0,
+                'avg_queue_to_result_ms': (self._wait_total / items * 1000.0) if items else 0.0,
+                'queue_depth': self._queue.qsize()
+            }
@@ -0,0 +1,99 @@
+# benchmarks/bench_embedding_index.py
+"""
+Build time, query latency and footprint of the embedding index.
+
+Usage:
+    python benchmarks/bench_embedding_index.py [--sizes 10000 100000 1000000] [--dim 1280]
+        [--queries 200] [--k 5] [--dir /tmp/bench_index]
+
+Fills an index with random unit vectors (MobileNetV2's pooled features are
+1280-d), then queries it with perturbed copies of stored rows, the way a
+re-photographed lesion looks. Reports build time, exact and approximate
+search latency, approximate recall@1 (does it find the row the query was
+made from) and disk footprint. 1M x 1280-d needs ~2.7 GB of disk.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_index import EmbeddingIndex, normalize
+
+
+def build(path, size, dim, chunk=10_000, seed=0):
+    rng = np.random.default_rng(seed)
+    index = EmbeddingIndex(path, dim, max_entries=size)
+    start = time.perf_counter()
+    for offset in range(0, size, chunk):
+        n = min(chunk, size - offset)
+        vectors = rng.standard_normal((n, dim), dtype=np.float32)
+        probabilities = rng.dirichlet((1, 1), n).astype(np.float32)
+        keys = [f'{offset + i:032x}' for i in range(n)]
+        index.add(vectors, keys, probabilities)
+    index.flush()
+    return index, time.perf_counter() - start
+
+
+def query_latency(index, queries, k, exact):
+    times, rows = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, found = index.search(query, k=k, exact=exact)
+        times.append((time.perf_counter() - start) * 1000.0)
+        rows.append(found[0, 0])
+    return np.array(times), np.array(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--dim', type=int, default=1280)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--noise', type=float, default=0.2, help='Query perturbation relative to the vector norm')
+    parser.add_argument('--dir', default=None, help='Where to build the indexes (default: a temp directory)')
+    args = parser.parse_args()
+
+    root = args.dir or tempfile.mkdtemp(prefix='bench_index_')
+    rng = np.random.default_rng(1)
+    print(f"{'entries':>10}{'build s':>10}{'disk MB':>10}{'exact p50':>11}{'exact p95':>11}"
+          f"{'approx p50':>12}{'approx p95':>12}{'recall@1':>10}")
+    try:
+        for size in args.sizes:
+            path = os.path.join(root, str(size))
+            shutil.rmtree(path, ignore_errors=True)
+            index, build_seconds = build(path, size, args.dim)
+
+            targets = rng.integers(0, size, args.queries)
+            stored = np.asarray(index._arrays['vectors'][np.sort(targets)], dtype=np.float32)
+            targets = np.sort(targets)
+            queries = normalize(stored + rng.standard_normal(stored.shape, dtype=np.float32)
+                                * args.noise / np.sqrt(args.dim))
+
+            exact_ms, exact_rows = query_latency(index, queries, args.k, exact=True)
+            approx_ms, approx_rows = query_latency(index, queries, args.k, exact=False)
+            exact_recall = (exact_rows == targets).mean()
+            recall = (approx_rows == targets).mean()
+
+            print(f"{size:>10}{build_seconds:>10.2f}{index.disk_bytes() / 2 ** 20:>10.1f}"
+                  f"{np.percentile(exact_ms, 50):>11.2f}{np.percentile(exact_ms, 95):>11.2f}"
+                  f"{np.percentile(approx_ms, 50):>12.2f}{np.percentile(approx_ms, 95):>12.2f}{recall:>10.3f}")
+            if exact_recall < 1.0:
+                print(f"  note: exact search recall@1 is {exact_recall:.3f}, --noise is too high to tell rows apart")
+            shutil.rmtree(path, ignore_errors=True)
+    finally:
+        if not args.dir:
+            shutil.rmtree(root, ignore_errors=True)
+    print("\nLatencies in ms per query; float16 vectors take dim x 2 bytes per entry "
+          f"({args.dim * 2} B here) plus 256 B of projection, 32 B key and the model output.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
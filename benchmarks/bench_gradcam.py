@@ -0,0 +1,87 @@
+# benchmarks/bench_gradcam.py
+"""
+Added latency of Grad-CAM explanations over a plain prediction.
+
+Usage:
+    python benchmarks/bench_gradcam.py [--images TestImages] [--model mobilenetv2_checkpoint.h5]
+        [--batch-sizes 1 8 32] [--repeat 5]
+
+For each batch size, times per image:
+    predict     the serving forward pass (KerasBackend.predict)
+    batched     GradCAM.compute on the whole batch (one forward + one backward pass)
+    per image   GradCAM.compute called once per image (the naive way)
+    overlay     rendering and PNG-encoding the overlays
+and reports the added latency of batched Grad-CAM + overlay over predict.
+Also checks that Grad-CAM's forward pass gives the same probabilities as predict.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compare_backends import load_dataset
+from gradcam import GradCAM, overlay, to_png
+from inference_backends import load_backend
+
+
+def best_ms_per_image(fn, n, repeat):
+    fn()  # warm-up / tracing
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000.0 / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', default='TestImages', help='Labeled image folder tree')
+    parser.add_argument('--model', default='mobilenetv2_checkpoint.h5', help='Keras checkpoint')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=None, help='Backend thread count')
+    args = parser.parse_args()
+
+    paths, _, images = load_dataset(args.images)
+    if not paths:
+        print(f"No labeled images found under {args.images}")
+        return 1
+
+    backend = load_backend('keras', args.model, num_threads=args.threads)
+    backend.warmup()
+    start = time.perf_counter()
+    explainer = GradCAM(backend.model)
+    print(f"Grad-CAM layer: {explainer.layer_name} (sub-model built in {time.perf_counter() - start:.2f}s)")
+
+    _, probabilities, _ = explainer.compute(images)
+    max_diff = float(np.abs(probabilities - backend.predict(images)).max())
+    print(f"Max |p_gradcam - p_predict| over {len(images)} images: {max_diff:.2e}\n")
+
+    print(f"{'batch':>6}{'predict':>10}{'batched':>10}{'per image':>11}{'overlay':>10}{'added':>10}{'x predict':>11}"
+          "   (ms per image)")
+    for size in args.batch_sizes:
+        # Tile the image set up to the batch size
+        batch = images[np.arange(size) % len(images)]
+        pixels = np.uint8(batch * 255)
+
+        predict_ms = best_ms_per_image(lambda: backend.predict(batch), size, args.repeat)
+        batched_ms = best_ms_per_image(lambda: explainer.compute(batch), size, args.repeat)
+        single_ms = best_ms_per_image(lambda: [explainer.compute(batch[i:i + 1]) for i in range(size)],
+                                      size, args.repeat)
+        heatmaps, _, _ = explainer.compute(batch)
+        overlay_ms = best_ms_per_image(lambda: [to_png(overlay(p, h)) for p, h in zip(pixels, heatmaps)],
+                                       size, args.repeat)
+
+        added = batched_ms + overlay_ms - predict_ms
+        print(f"{size:>6}{predict_ms:>10.2f}{batched_ms:>10.2f}{single_ms:>11.2f}{overlay_ms:>10.2f}"
+              f"{added:>10.2f}{(batched_ms + overlay_ms) / predict_ms:>11.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# benchmarks/bench_preprocess.py
+"""
+Microbenchmark: original preprocess_image() path vs the Preprocessor engine.
+
+Usage:
+    python benchmarks/bench_preprocess.py [--images TestImages] [--repeat 20] [--batch 8]
+
+Every iteration re-opens the image from in-memory bytes (draft mode only
+applies to images that have not been decoded yet), so both paths include
+the full decode. Also checks the engine output against the reference
+within the tolerance documented in preprocessing.py.
+"""
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocessing import (DRAFT_MAX_ABS_TOLERANCE, DRAFT_MEAN_ABS_TOLERANCE, Preprocessor,
+                           preprocess_image, preprocess_image_reference)
+
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png', '*.bmp')
+
+
+def find_images(root):
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(root, '**', pattern), recursive=True))
+    return sorted(paths)
+
+
+def time_per_image(fn, payloads, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(payloads)
+    return (time.perf_counter() - start) / (repeat * len(payloads)) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', default='TestImages', help='Folder of test images')
+    parser.add_argument('--repeat', type=int, default=20, help='Passes over the image set')
+    parser.add_argument('--batch', type=int, default=8, help='Batch size for the batched engine path')
+    args = parser.parse_args()
+
+    paths = find_images(args.images)
+    if not paths:
+        print(f"No images found under {args.images}")
+        return 1
+
+    payloads = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            payloads.append(f.read())
+
+    def reference(batch):
+        for data in batch:
+            preprocess_image_reference(Image.open(io.BytesIO(data)))
+
+    def single(use_draft):
+        def run(batch):
+            out = np.empty((1, 224, 224, 3), dtype=np.float32)
+            for data in batch:
+                preprocess_image(Image.open(io.BytesIO(data)), out=out, use_draft=use_draft)
+        return run
+
+    engine = Preprocessor(capacity=args.batch)
+
+    def batched(batch):
+        for start in range(0, len(batch), args.batch):
+            chunk = batch[start:start + args.batch]
+            engine.preprocess_batch([Image.open(io.BytesIO(data)) for data in chunk])
+
+    print(f"{len(paths)} images, {args.repeat} passes")
+    print(f"{'path':<32}{'ms/image':>10}")
+    results = [
+        ('reference preprocess_image', time_per_image(reference, payloads, args.repeat)),
+        ('engine single, no draft', time_per_image(single(False), payloads, args.repeat)),
+        ('engine single, draft', time_per_image(single(True), payloads, args.repeat)),
+        (f'engine batch={args.batch}, draft', time_per_image(batched, payloads, args.repeat)),
+    ]
+    baseline = results[0][1]
+    for name, ms in results:
+        print(f"{name:<32}{ms:>10.3f}  ({baseline / ms:.2f}x)")
+
+    # Numerical equivalence
+    max_exact_diff = 0.0
+    mean_diffs, max_diffs = [], []
+    for data in payloads:
+        expected = preprocess_image_reference(Image.open(io.BytesIO(data)))
+        exact = preprocess_image(Image.open(io.BytesIO(data)), use_draft=False)
+        drafted = preprocess_image(Image.open(io.BytesIO(data)), use_draft=True)
+        max_exact_diff = max(max_exact_diff, float(np.abs(exact - expected).max()))
+        diff = np.abs(drafted - expected)
+        mean_diffs.append(float(diff.mean()))
+        max_diffs.append(float(diff.max()))
+
+    print(f"\nno-draft max abs diff: {max_exact_diff:.6f} (expected 0)")
+    print(f"draft mean abs diff:   {max(mean_diffs):.4f} worst image (tolerance {DRAFT_MEAN_ABS_TOLERANCE})")
+    print(f"draft max abs diff:    {max(max_diffs):.4f} worst pixel (tolerance {DRAFT_MAX_ABS_TOLERANCE})")
+
+    ok = (max_exact_diff == 0.0
+          and max(mean_diffs) <= DRAFT_MEAN_ABS_TOLERANCE
+          and max(max_diffs) <= DRAFT_MAX_ABS_TOLERANCE)
+    print("Equivalence check:", "PASSED" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# benchmarks/bench_startup.py
+"""
+Time-to-first-listen and time-to-ready of the API server.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 3] [--server flask_api.py]
+
+Starts the server repeatedly with MODEL_BACKGROUND_LOAD=0 (model loaded at
+import, the previous behaviour) and MODEL_BACKGROUND_LOAD=1 (background
+loading), and measures from process start until
+    * first listen: /health answers
+    * ready:        /ready returns 200 (model loaded and warmed up)
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def status_code(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, OSError):
+        return None
+
+
+def measure(server, background, timeout):
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, MODEL_BACKGROUND_LOAD='1' if background else '0')
+    if server == 'serve.py':
+        command = [sys.executable, server, '--port', str(port), '--workers', '1']
+    else:
+        # flask_api.py always binds to port 5000; run its app on a free port instead
+        command = [sys.executable, '-c', f'import flask_api; flask_api.app.run(port={port}, threaded=True)']
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    listen = ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if listen is None and status_code(f'{url}/health') == 200:
+                listen = time.perf_counter() - start
+            if listen is not None and status_code(f'{url}/ready') == 200:
+                ready = time.perf_counter() - start
+                break
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return listen, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--server', default='flask_api.py', choices=['flask_api.py', 'serve.py'])
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    print(f"{'mode':<22}{'first listen s':>16}{'ready s':>10}")
+    for background in (False, True):
+        mode = 'background load' if background else 'load at import'
+        for _ in range(args.runs):
+            listen, ready = measure(args.server, background, args.timeout)
+            print(f"{mode:<22}{listen if listen is not None else float('nan'):>16.2f}"
+                  f"{ready if ready is not None else float('nan'):>10.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
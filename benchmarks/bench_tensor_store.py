@@ -0,0 +1,111 @@
+# benchmarks/bench_tensor_store.py
+"""
+Evaluation wall time: decoding every image each run vs reading the tensor store.
+
+Usage:
+    python benchmarks/bench_tensor_store.py [--images TestImages] [--store .tensor_store]
+        [--backend keras] [--model mobilenetv2_checkpoint.h5] [--batch-size 64] [--repeat 3]
+        [--data-only]
+
+Builds (or refreshes) the store for --images, then times full evaluation
+passes both ways and checks that both produce the same predictions. Reports
+the disk footprint of the source images, the store, and what float32
+tensors would take. --data-only skips the model and times the data path only.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_backends import BACKENDS, load_backend
+from preprocessing import Preprocessor
+from score_offline import iter_directory
+from tensor_store import TensorStore
+
+
+def decode_pass(items, batch_size, predict):
+    preprocessor = Preprocessor(capacity=batch_size)
+    outputs = {}
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        images = [Image.open(path) for path, _ in chunk]
+        batch, ok_indices, _ = preprocessor.preprocess_batch(images)
+        for image in images:
+            image.close()
+        predictions = predict(batch)
+        for i, row in zip(ok_indices, predictions):
+            outputs[os.path.relpath(chunk[i][0])] = row
+    return outputs
+
+
+def store_pass(store, batch_size, predict):
+    outputs = {}
+    for ids, _, batch in store.float_batches(batch_size):
+        for image_id, row in zip(ids, predict(batch)):
+            outputs[image_id] = row
+    return outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', default='TestImages')
+    parser.add_argument('--store', default='.tensor_store')
+    parser.add_argument('--backend', default='keras', choices=BACKENDS)
+    parser.add_argument('--model', default='mobilenetv2_checkpoint.h5')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=3, help='Evaluation passes per path')
+    parser.add_argument('--data-only', action='store_true', help='Skip inference, time loading only')
+    args = parser.parse_args()
+
+    items = list(iter_directory(args.images))
+    if not items:
+        print(f"No images found under {args.images}")
+        return 1
+
+    store = TensorStore(args.store)
+    start = time.perf_counter()
+    updated, removed, failed = store.build(items)
+    print(f"Store refresh: {updated} decoded, {removed} removed, {len(failed)} failed "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    if args.data_only:
+        predict = (lambda batch: batch.reshape(len(batch), -1)[:, :8].copy())
+    else:
+        backend = load_backend(args.backend, args.model)
+        backend.warmup()
+        predict = backend.predict
+
+    timings = {'decode every run': [], 'tensor store': []}
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        decoded = decode_pass(items, args.batch_size, predict)
+        timings['decode every run'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        stored = store_pass(store, args.batch_size, predict)
+        timings['tensor store'].append(time.perf_counter() - start)
+
+    mismatched = [i for i in stored if not np.allclose(stored[i], decoded.get(i, np.nan), atol=1e-5)]
+
+    source_bytes = sum(os.path.getsize(path) for path, _ in items)
+    float_bytes = len(store) * int(np.prod(store.image_shape)) * 4
+    print(f"\nImages: {len(store)}")
+    print(f"{'disk footprint':<24}{'MB':>10}")
+    print(f"{'source files':<24}{source_bytes / 2 ** 20:>10.1f}")
+    print(f"{'tensor store (uint8)':<24}{store.disk_bytes() / 2 ** 20:>10.1f}")
+    print(f"{'float32 tensors':<24}{float_bytes / 2 ** 20:>10.1f}")
+
+    print(f"\n{'eval path':<24}{'best s':>10}{'mean s':>10}{'images/s':>12}")
+    for name, values in timings.items():
+        print(f"{name:<24}{min(values):>10.3f}{np.mean(values):>10.3f}{len(store) / min(values):>12.1f}")
+    print(f"\nPredictions differing between paths: {len(mismatched)}")
+    return 1 if mismatched else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
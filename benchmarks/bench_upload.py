@@ -0,0 +1,81 @@
+# benchmarks/bench_upload.py
+"""
+Compare /predict upload paths: JSON + base64 vs raw binary body vs multipart.
+
+Usage:
+    python benchmarks/bench_upload.py [--images TestImages] [--repeat 10]
+
+Runs in-process against the Flask test client (requires the model file) and
+reports request body size and server-side CPU time per image. CPU time is
+measured with time.process_time() around each request, so it covers request
+parsing, decoding, preprocessing and inference. The prediction cache is
+disabled, otherwise every pass after the first would be a cache hit.
+"""
+import argparse
+import base64
+import io
+import json
+import mimetypes
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_preprocess import find_images
+
+
+def build_requests(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    body = json.dumps({'image': base64.b64encode(raw).decode()}).encode()
+    return {
+        'json+base64': (len(body), dict(data=body, content_type='application/json')),
+        'raw binary': (len(raw), dict(data=raw, content_type=content_type)),
+        # The test client consumes the file object, so multipart bodies are rebuilt per request
+        'multipart': (len(raw), lambda: dict(data={'image': (io.BytesIO(raw), os.path.basename(path))},
+                                             content_type='multipart/form-data')),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', default='TestImages', help='Folder of test images')
+    parser.add_argument('--repeat', type=int, default=10, help='Passes over the image set')
+    args = parser.parse_args()
+
+    paths = find_images(args.images)
+    if not paths:
+        print(f"No images found under {args.images}")
+        return 1
+
+    os.environ['CACHE_ENABLED'] = '0'
+    import flask_api
+    client = flask_api.app.test_client()
+
+    totals = {}
+    for path in paths:
+        for name, (size, kwargs) in build_requests(path).items():
+            entry = totals.setdefault(name, {'bytes': 0, 'cpu': 0.0, 'count': 0, 'errors': 0})
+            for _ in range(args.repeat):
+                request_kwargs = kwargs() if callable(kwargs) else kwargs
+                start = time.process_time()
+                response = client.post('/predict', **request_kwargs)
+                entry['cpu'] += time.process_time() - start
+                entry['bytes'] += size
+                entry['count'] += 1
+                if response.status_code != 200:
+                    entry['errors'] += 1
+
+    print(f"{len(paths)} images x {args.repeat} passes")
+    print(f"{'path':<16}{'avg body KB':>14}{'CPU ms/image':>15}{'errors':>8}")
+    for name, entry in totals.items():
+        print(f"{name:<16}{entry['bytes'] / entry['count'] / 1024:>14.1f}"
+              f"{entry['cpu'] / entry['count'] * 1000:>15.2f}{entry['errors']:>8}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
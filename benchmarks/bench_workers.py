@@ -0,0 +1,127 @@
+# benchmarks/bench_workers.py
+"""
+Memory per worker and requests/second of serve.py for several worker counts.
+
+Usage:
+    python benchmarks/bench_workers.py [--workers 1 2 4 8] [--threads 8]
+                                       [--concurrency 16] [--duration 20] [--images TestImages]
+
+For each worker count, starts `python serve.py --workers N` on a free port,
+waits for /ready, drives /predict with raw image uploads from --concurrency
+client threads for --duration seconds (using load_test.py) and samples memory of the master and
+worker processes (RSS, plus USS/PSS when available, which account for pages
+shared copy-on-write after preload). The servers run with CACHE_ENABLED=0 so
+the few distinct test images are actually inferred instead of answered from
+the prediction cache. Prints a Markdown table for the README.
+Requires psutil for memory figures.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import HttpTarget, build_request_pool, load_images, parse_mix, run_load, summarize
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(url, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f'{url}/ready', timeout=1).status_code == 200:
+                return True
+        except (requests.RequestException, ValueError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def memory_usage(pid):
+    """Return {'rss', 'uss', 'pss'} in MB summed over the master and worker processes"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+
+    master = psutil.Process(pid)
+    totals = {'rss': 0.0, 'uss': 0.0, 'pss': 0.0}
+    for process in [master] + master.children(recursive=True):
+        try:
+            info = process.memory_full_info()
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
+            continue
+        totals['rss'] += info.rss / (1024 * 1024)
+        totals['uss'] += getattr(info, 'uss', 0) / (1024 * 1024)
+        totals['pss'] += getattr(info, 'pss', 0) / (1024 * 1024)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--threads', type=int, default=8, help='Threads per worker')
+    parser.add_argument('--concurrency', type=int, default=16, help='Client threads')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of load per worker count')
+    parser.add_argument('--images', default=os.path.join(ROOT, 'TestImages'))
+    parser.add_argument('--no-preload', action='store_true')
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        print(f"No images found under {args.images}")
+        return 1
+    pool = build_request_pool(images, parse_mix('', sorted(images)), 'raw', '/predict', 1)
+
+    rows = []
+    for workers in args.workers:
+        port = free_port()
+        url = f'http://127.0.0.1:{port}'
+        command = [sys.executable, 'serve.py', '--port', str(port), '--workers', str(workers),
+                   '--threads', str(args.threads)]
+        if args.no_preload:
+            command.append('--no-preload')
+
+        env = dict(os.environ, CACHE_ENABLED='0')
+        server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for_server(url):
+                print(f"{workers} workers: server did not become ready")
+                continue
+            target = HttpTarget(url)
+            run_load(target, '/predict', pool, args.concurrency, duration=min(args.duration, 3))  # warm every worker
+            summary = summarize(run_load(target, '/predict', pool, args.concurrency, duration=args.duration))
+            memory = memory_usage(server.pid)
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+        rows.append((workers, summary, memory))
+        print(f"{workers} workers: {summary['throughput_rps']:.1f} req/s, "
+              f"p99 {summary['latency_ms']['p99']:.0f} ms, {summary['errors']} errors, "
+              f"{summary['cache_hits']} cache hits")
+
+    print("\n| Workers | Req/s | p99 ms | Errors | Total RSS MB | Total PSS MB | PSS MB / worker |")
+    print("|---|---|---|---|---|---|---|")
+    for workers, summary, memory in rows:
+        cells = f"| {workers} | {summary['throughput_rps']:.1f} | {summary['latency_ms']['p99']:.0f} | {summary['errors']} "
+        if memory:
+            print(cells + f"| {memory['rss']:.0f} | {memory['pss']:.0f} | {memory['pss'] / workers:.0f} |")
+        else:
+            print(cells + "| n/a | n/a | n/a |")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
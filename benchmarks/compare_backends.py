@@ -0,0 +1,126 @@
+# benchmarks/compare_backends.py
+"""
+Accuracy-parity and latency comparison of inference backends.
+
+Usage:
+    python benchmarks/compare_backends.py [--images TestImages]
+        [--backend keras:mobilenetv2_checkpoint.h5 --backend tflite:mobilenetv2_checkpoint_int8.tflite ...]
+        [--max-prob-diff 0.05] [--repeat 10] [--batch 32]
+
+Without --backend, compares the Keras checkpoint with every converted model
+produced by convert_model.py that exists next to it. The first backend is the
+reference. Labels come from the folder names (TestImages/Benign, TestImages/Malignant).
+Exits non-zero if any backend disagrees with the reference on a predicted class
+or differs by more than --max-prob-diff on any probability.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_preprocess import find_images
+from convert_model import FORMATS, VARIANTS, output_path
+from inference_backends import load_backend
+from postprocessing import CLASS_NAMES
+from preprocessing import Preprocessor
+
+
+def load_dataset(root):
+    """Preprocess every image under root; label is the index of its parent folder name in CLASS_NAMES"""
+    paths = [p for p in find_images(root) if os.path.basename(os.path.dirname(p)) in CLASS_NAMES]
+    labels = np.array([CLASS_NAMES.index(os.path.basename(os.path.dirname(p))) for p in paths])
+
+    batch = np.empty((len(paths), 224, 224, 3), dtype=np.float32)
+    images = [Image.open(p) for p in paths]
+    ok_indices, errors = Preprocessor().preprocess_into(images, batch)
+    for i, error in errors.items():
+        print(f"Skipping {paths[i]}: {error}")
+    return [paths[i] for i in ok_indices], labels[ok_indices], batch[:len(ok_indices)]
+
+
+def default_backends(model_path):
+    specs = [('keras', model_path)]
+    for fmt in FORMATS:
+        for variant in VARIANTS:
+            path = output_path(model_path, os.path.dirname(model_path) or '.', variant, fmt)
+            if os.path.exists(path):
+                specs.append((fmt, path))
+    return specs
+
+
+def measure(backend, batch, repeat, batch_size):
+    """Return (probabilities, single-image latencies in ms, batched images/second)"""
+    probabilities = np.concatenate([backend.predict(batch[i:i + batch_size])
+                                    for i in range(0, len(batch), batch_size)])
+
+    latencies = []
+    for _ in range(repeat):
+        for i in range(len(batch)):
+            start = time.perf_counter()
+            backend.predict(batch[i:i + 1])
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(0, len(batch), batch_size):
+            backend.predict(batch[i:i + batch_size])
+    throughput = repeat * len(batch) / (time.perf_counter() - start)
+
+    return probabilities, np.array(latencies), throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', default='TestImages', help='Labeled image folder tree')
+    parser.add_argument('--model', default='mobilenetv2_checkpoint.h5', help='Reference Keras checkpoint')
+    parser.add_argument('--backend', action='append', help='kind:path, may be repeated')
+    parser.add_argument('--max-prob-diff', type=float, default=0.05, help='Allowed max |p - p_ref|')
+    parser.add_argument('--repeat', type=int, default=10, help='Timing passes over the image set')
+    parser.add_argument('--batch', type=int, default=32, help='Batch size for throughput')
+    parser.add_argument('--threads', type=int, default=None, help='Backend thread count')
+    args = parser.parse_args()
+
+    specs = [tuple(spec.split(':', 1)) for spec in args.backend] if args.backend else default_backends(args.model)
+
+    paths, labels, batch = load_dataset(args.images)
+    if not paths:
+        print(f"No labeled images found under {args.images}")
+        return 1
+    print(f"{len(paths)} images, {len(specs)} backends\n")
+
+    print(f"{'backend':<48}{'acc':>6}{'agree':>7}{'max dp':>8}{'p50 ms':>8}{'p95 ms':>8}{'img/s':>8}")
+    reference = None
+    passed = True
+    for kind, path in specs:
+        try:
+            backend = load_backend(kind, path, num_threads=args.threads)
+        except Exception as e:
+            print(f"{kind + ':' + path:<48} FAILED to load: {e}")
+            passed = False
+            continue
+
+        probabilities, latencies, throughput = measure(backend, batch, args.repeat, args.batch)
+        predicted = probabilities.argmax(axis=1)
+        if reference is None:
+            reference = probabilities
+        agreement = float((predicted == reference.argmax(axis=1)).mean())
+        max_diff = float(np.abs(probabilities - reference).max())
+        accuracy = float((predicted == labels).mean())
+
+        print(f"{kind + ':' + os.path.basename(path):<48}{accuracy:>6.3f}{agreement:>7.3f}{max_diff:>8.4f}"
+              f"{np.percentile(latencies, 50):>8.2f}{np.percentile(latencies, 95):>8.2f}{throughput:>8.1f}")
+
+        if agreement < 1.0 or max_diff > args.max_prob_diff:
+            passed = False
+
+    print("\nParity check:", "PASSED" if passed else "FAILED")
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
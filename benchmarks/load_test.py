@@ -0,0 +1,365 @@
+# benchmarks/load_test.py
+"""
+Load test and latency benchmark for the prediction API.
+
+Usage:
+    python benchmarks/load_test.py [--url http://127.0.0.1:5000] [--endpoint /predict]
+        [--format raw|json|multipart] [--concurrency 8] [--requests 500 | --duration 30]
+        [--rate 50] [--mix Benign=0.5,Malignant=0.5] [--batch-size 16]
+        [--output results.json]
+
+Without --url the app is driven in-process through the Flask test client
+(imports flask_api, so the model must be available); with --url a running
+server is used. Images are drawn from the subfolders of --images
+(TestImages/Benign, TestImages/Malignant) according to --mix.
+
+Without --rate, every client thread sends its next request as soon as the
+previous one returns (closed loop). With --rate, requests are scheduled at a
+fixed rate and latency is measured from the scheduled send time, so queueing
+in the client is not hidden when the server falls behind.
+
+The pool only holds a handful of distinct images, so with the prediction
+cache on nearly every request would be an LRU lookup. The in-process target
+therefore runs with CACHE_ENABLED=0 unless --cache is given; start a server
+under test with CACHE_ENABLED=0 too. Responses served from the cache are
+counted and reported separately either way.
+
+Reports p50/p95/p99 latency, throughput, error rate, cache hits and server
+CPU/RSS (from /stats) and writes everything as JSON for comparison between versions.
+"""
+import argparse
+import base64
+import json
+import mimetypes
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_preprocess import find_images
+
+
+def cached_count(response_json):
+    """Images in one /predict or /predict_batch response that were answered from the cache"""
+    if not isinstance(response_json, dict):
+        return 0
+    if 'results' in response_json:
+        return sum(1 for result in response_json['results'] if result.get('cached'))
+    return 1 if response_json.get('cached') else 0
+
+
+class HttpTarget:
+    """Sends requests to a running server, one keep-alive session per thread"""
+
+    def __init__(self, url):
+        import requests
+
+        self.url = url.rstrip('/')
+        self._requests = requests
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        return session
+
+    def post(self, path, body, content_type):
+        try:
+            response = self._session().post(self.url + path, data=body,
+                                            headers={'Content-Type': content_type}, timeout=120)
+        except self._requests.RequestException:
+            return None, 0
+        try:
+            return response.status_code, cached_count(response.json())
+        except ValueError:
+            return response.status_code, 0
+
+    def server_stats(self):
+        try:
+            return self._session().get(self.url + '/stats', timeout=10).json()
+        except (self._requests.RequestException, ValueError):
+            return None
+
+
+class InProcessTarget:
+    """Drives flask_api.app through the Flask test client, one client per thread"""
+
+    def __init__(self, cache=False):
+        if not cache:
+            os.environ['CACHE_ENABLED'] = '0'
+        import flask_api
+
+        self.app = flask_api.app
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+
+    def post(self, path, body, content_type):
+        try:
+            response = self._client().post(path, data=body, content_type=content_type)
+            return response.status_code, cached_count(response.get_json(silent=True))
+        except Exception:
+            return None, 0
+
+    def server_stats(self):
+        return self._client().get('/stats').get_json()
+
+
+def parse_mix(mix, labels):
+    """'Benign=0.7,Malignant=0.3' -> normalized weights per label; uniform when empty"""
+    if not mix:
+        return {label: 1.0 / len(labels) for label in labels}
+    weights = {}
+    for part in mix.split(','):
+        label, weight = part.split('=')
+        if label not in labels:
+            raise ValueError(f"Unknown label '{label}' in --mix (found {', '.join(labels)})")
+        weights[label] = float(weight)
+    total = sum(weights.values())
+    return {label: weight / total for label, weight in weights.items()}
+
+
+def load_images(root):
+    """Return {label: [(filename, bytes, content_type), ...]} grouped by parent folder"""
+    images = {}
+    for path in find_images(root):
+        label = os.path.basename(os.path.dirname(path))
+        with open(path, 'rb') as f:
+            data = f.read()
+        images.setdefault(label, []).append(
+            (os.path.basename(path), data, mimetypes.guess_type(path)[0] or 'application/octet-stream'))
+    return images
+
+
+def encode_body(items, fmt, endpoint):
+    """Build (body bytes, content type) for one request carrying the given images"""
+    from urllib3 import encode_multipart_formdata
+
+    if endpoint == '/predict_batch':
+        if fmt == 'json':
+            body = {'images': [base64.b64encode(data).decode() for _, data, _ in items]}
+            return json.dumps(body).encode(), 'application/json'
+        return encode_multipart_formdata([('images', item) for item in items])
+
+    name, data, content_type = items[0]
+    if fmt == 'json':
+        return json.dumps({'image': base64.b64encode(data).decode()}).encode(), 'application/json'
+    if fmt == 'multipart':
+        return encode_multipart_formdata([('image', (name, data, content_type))])
+    return data, content_type
+
+
+def build_request_pool(images, weights, fmt, endpoint, batch_size, size=256, seed=0):
+    """Pre-encode a pool of request bodies so encoding cost isn't measured"""
+    rng = random.Random(seed)
+    labels = list(weights)
+    pool = []
+    for _ in range(size):
+        count = batch_size if endpoint == '/predict_batch' else 1
+        items = []
+        for _ in range(count):
+            label = rng.choices(labels, weights=[weights[l] for l in labels])[0]
+            items.append(rng.choice(images[label]))
+        body, content_type = encode_body(items, fmt, endpoint)
+        pool.append((body, content_type, count))
+    return pool
+
+
+def run_load(target, endpoint, pool, concurrency, total_requests=None, duration=None, rate=None):
+    """
+    Send requests from `concurrency` threads until total_requests are sent or
+    duration has passed. Returns a dict of raw latencies and counters.
+    """
+    lock = threading.Lock()
+    sequence = iter(range(total_requests or 10 ** 12))
+    latencies, statuses = [], {}
+    counts = {'requests': 0, 'errors': 0, 'images': 0, 'bytes': 0, 'cache_hits': 0}
+    start = time.perf_counter()
+    stop_at = start + duration if duration else None
+
+    def worker():
+        while True:
+            with lock:
+                k = next(sequence, None)
+            if k is None:
+                return
+
+            scheduled = start + k / rate if rate else time.perf_counter()
+            if stop_at and scheduled >= stop_at:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            body, content_type, images = pool[k % len(pool)]
+            status, cached = target.post(endpoint, body, content_type)
+            latency = time.perf_counter() - scheduled
+
+            with lock:
+                latencies.append(latency)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                counts['requests'] += 1
+                counts['images'] += images
+                counts['bytes'] += len(body)
+                counts['cache_hits'] += cached
+                if status != 200:
+                    counts['errors'] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return dict(counts, latencies=latencies, statuses=statuses, elapsed=time.perf_counter() - start)
+
+
+def summarize(run):
+    latencies_ms = np.array(run['latencies']) * 1000.0 if run['latencies'] else np.zeros(1)
+    elapsed = run['elapsed']
+    return {
+        'requests': run['requests'],
+        'images': run['images'],
+        'errors': run['errors'],
+        'error_rate': run['errors'] / run['requests'] if run['requests'] else 0.0,
+        'status_codes': run['statuses'],
+        'elapsed_seconds': elapsed,
+        'throughput_rps': run['requests'] / elapsed if elapsed else 0.0,
+        'throughput_images_per_second': run['images'] / elapsed if elapsed else 0.0,
+        'avg_request_bytes': run['bytes'] / run['requests'] if run['requests'] else 0,
+        'cache_hits': run['cache_hits'],
+        'cache_hit_rate': run['cache_hits'] / run['images'] if run['images'] else 0.0,
+        'latency_ms': {
+            'mean': float(latencies_ms.mean()),
+            'p50': float(np.percentile(latencies_ms, 50)),
+            'p95': float(np.percentile(latencies_ms, 95)),
+            'p99': float(np.percentile(latencies_ms, 99)),
+            'max': float(latencies_ms.max())
+        }
+    }
+
+
+def server_usage(before, after, elapsed):
+    """Server CPU and memory during the run from two /stats snapshots"""
+    if not before or not after or 'process' not in after:
+        return None
+    cpu = after['process']['cpu_seconds'] - before['process']['cpu_seconds']
+    usage = {
+        'cpu_seconds': cpu,
+        'cpu_utilization': cpu / elapsed if elapsed else 0.0,
+        'rss_mb': after['process'].get('rss_mb'),
+        'max_rss_mb': after['process'].get('max_rss_mb'),
+    }
+    if 'batching' in after:
+        usage['avg_batch_size'] = after['batching'].get('avg_batch_size')
+    return usage
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Server URL; omit to run in-process with the Flask test client')
+    parser.add_argument('--endpoint', default='/predict', choices=['/predict', '/predict_batch'])
+    parser.add_argument('--format', default='raw', choices=['raw', 'json', 'multipart'],
+                        help='Upload encoding (/predict_batch supports json and multipart)')
+    parser.add_argument('--images', default=os.path.join(ROOT, 'TestImages'))
+    parser.add_argument('--mix', default='', help='Label weights, e.g. Benign=0.7,Malignant=0.3')
+    parser.add_argument('--batch-size', type=int, default=16, help='Images per /predict_batch request')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads')
+    parser.add_argument('--requests', type=int, default=None, help='Total requests (default 500)')
+    parser.add_argument('--duration', type=float, default=None, help='Run for this many seconds instead')
+    parser.add_argument('--rate', type=float, default=None, help='Target requests/second (open loop)')
+    parser.add_argument('--warmup', type=int, default=10, help='Untimed requests before the run')
+    parser.add_argument('--cache', action='store_true',
+                        help='Keep the prediction cache on for the in-process target (measures cache hits, not inference)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    if args.endpoint == '/predict_batch' and args.format == 'raw':
+        args.format = 'multipart'
+    if args.requests is None and args.duration is None:
+        args.requests = 500
+
+    images = load_images(args.images)
+    if not images:
+        print(f"No images found under {args.images}")
+        return 1
+    weights = parse_mix(args.mix, sorted(images))
+    pool = build_request_pool(images, weights, args.format, args.endpoint, args.batch_size)
+
+    target = HttpTarget(args.url) if args.url else InProcessTarget(cache=args.cache)
+
+    if args.warmup:
+        run_load(target, args.endpoint, pool, min(args.concurrency, args.warmup), total_requests=args.warmup)
+
+    before = target.server_stats()
+    run = run_load(target, args.endpoint, pool, args.concurrency,
+                   total_requests=args.requests, duration=args.duration, rate=args.rate)
+    after = target.server_stats()
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_revision': git_revision(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(),
+                 'cpu_count': os.cpu_count()},
+        'config': {
+            'target': args.url or 'in-process',
+            'endpoint': args.endpoint,
+            'format': args.format,
+            'mix': weights,
+            'batch_size': args.batch_size if args.endpoint == '/predict_batch' else 1,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'duration': args.duration,
+            'rate': args.rate,
+            'cache': bool(args.cache) if not args.url else None
+        },
+        'results': summarize(run),
+        'server': server_usage(before, after, run['elapsed'])
+    }
+
+    summary = results['results']
+    latency = summary['latency_ms']
+    print(f"{summary['requests']} requests in {summary['elapsed_seconds']:.1f}s "
+          f"({summary['throughput_rps']:.1f} req/s, {summary['throughput_images_per_second']:.1f} images/s)")
+    print(f"latency ms: p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  p99 {latency['p99']:.1f}  "
+          f"max {latency['max']:.1f}")
+    print(f"errors: {summary['errors']} ({summary['error_rate']:.2%})  status codes: {summary['status_codes']}")
+    print(f"cache hits: {summary['cache_hits']} of {summary['images']} images ({summary['cache_hit_rate']:.2%})")
+    if summary['cache_hits'] and not args.cache:
+        print("warning: the server answered from its prediction cache, latencies do not measure inference "
+              "(run it with CACHE_ENABLED=0)")
+    if results['server']:
+        server = results['server']
+        print(f"server: CPU {server['cpu_seconds']:.1f}s ({server['cpu_utilization']:.2f} cores), "
+              f"RSS {server.get('rss_mb') or server.get('max_rss_mb') or 0:.0f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
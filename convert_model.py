@@ -0,0 +1,107 @@
+# convert_model.py
+"""
+Export the Keras checkpoint to optimized inference formats.
+
+Usage:
+    python convert_model.py [--model mobilenetv2_checkpoint.h5] [--formats tflite onnx]
+                            [--variants float32 float16 int8] [--output-dir .]
+
+Produces, for a checkpoint named mobilenetv2_checkpoint.h5:
+    mobilenetv2_checkpoint.tflite            float32
+    mobilenetv2_checkpoint_float16.tflite    float16 weights
+    mobilenetv2_checkpoint_int8.tflite       dynamic-range int8 weights
+    mobilenetv2_checkpoint.onnx              float32   (requires tf2onnx)
+    mobilenetv2_checkpoint_float16.onnx      float16   (requires onnxconverter-common)
+    mobilenetv2_checkpoint_int8.onnx         dynamic int8 (requires onnxruntime)
+
+Serve a converted model with INFERENCE_BACKEND=tflite|onnx and BACKEND_MODEL_PATH=<file>,
+and check it with benchmarks/compare_backends.py before deploying.
+"""
+import argparse
+import os
+
+VARIANTS = ('float32', 'float16', 'int8')
+FORMATS = ('tflite', 'onnx')
+
+
+def output_path(model_path, output_dir, variant, extension):
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    suffix = '' if variant == 'float32' else f'_{variant}'
+    return os.path.join(output_dir, f'{stem}{suffix}.{extension}')
+
+
+def convert_tflite(model, variant, path):
+    """Convert a Keras model to TFLite with the given weight quantization"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant == 'float16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == 'int8':
+        # Dynamic-range quantization: int8 weights, float activations, no calibration data
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    return path
+
+
+def convert_onnx(model, variant, path, float32_path):
+    """Convert a Keras model to ONNX; float16/int8 variants are derived from the float32 export"""
+    if variant == 'float32':
+        import tensorflow as tf
+        import tf2onnx
+
+        spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name='input'),)
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=path)
+        return path
+
+    if not os.path.exists(float32_path):
+        raise RuntimeError(f"{float32_path} is required to build the {variant} ONNX variant")
+
+    if variant == 'float16':
+        import onnx
+        from onnxconverter_common import float16
+
+        onnx_model = float16.convert_float_to_float16(onnx.load(float32_path), keep_io_types=True)
+        onnx.save(onnx_model, path)
+    else:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(float32_path, path, weight_type=QuantType.QInt8)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='mobilenetv2_checkpoint.h5', help='Keras .h5 checkpoint')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument('--output-dir', default='.', help='Where to write converted models')
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    print(f"Loading {args.model}...")
+    model = tf.keras.models.load_model(args.model)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # float32 first so the derived ONNX variants can reuse it
+    variants = sorted(args.variants, key=VARIANTS.index)
+    for fmt in args.formats:
+        for variant in variants:
+            path = output_path(args.model, args.output_dir, variant, fmt)
+            try:
+                if fmt == 'tflite':
+                    convert_tflite(model, variant, path)
+                else:
+                    convert_onnx(model, variant, path, output_path(args.model, args.output_dir, 'float32', 'onnx'))
+                size_mb = os.path.getsize(path) / (1024 * 1024)
+                print(f"  {fmt:<7}{variant:<9}{size_mb:>8.2f} MB  {path}")
+            except Exception as e:
+                print(f"  {fmt:<7}{variant:<9} FAILED: {e}")
+
+
+if __name__ == '__main__':
+    main()
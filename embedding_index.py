@@ -0,0 +1,360 @@
+# embedding_index.py
+"""
+Nearest-neighbour index over penultimate-layer embeddings of scored images.
+
+Usage:
+    python embedding_index.py info [--index .embedding_index/<model>]
+
+Rows are kept in fixed-width numpy.memmap files inside one directory:
+    vectors.f16        (capacity, dim) float16, L2-normalized embeddings
+    projected.f32      (capacity, 64) float32 random projections for approximate search
+    probabilities.f32  (capacity, num_classes) model output of each image
+    keys.S32           (capacity,) image content hash (prediction_cache.cache_key)
+    meta.json          dimensions, row count and capacity
+
+Search returns cosine similarities. Exact search scans the float16 vectors
+in blocks (converted to float32 per block, so memory stays bounded);
+approximate search scans the 20x smaller projections first and re-ranks
+the best candidates exactly. Projections are stored as float32 because the
+float16 -> float32 conversion, not the dot products, dominates scan time.
+Files grow by doubling capacity.
+
+add() only buffers rows in memory. They are written (memmaps flushed,
+meta.json replaced) once flush_rows are pending or flush_seconds after the
+first pending row, so a scored request does not pay for disk I/O. Keys that
+are already indexed are skipped, and the index stops growing at max_entries.
+
+Writers from several processes (gunicorn workers) serialize on a lock file;
+readers pick up rows added by other processes on their next search.
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process servers only
+    fcntl = None
+
+META_FILE = 'meta.json'
+LOCK_FILE = 'index.lock'
+INITIAL_CAPACITY = 1024
+# Values converted to float32 per scan block (~16 MB)
+SEARCH_BLOCK_VALUES = 4 * 1024 * 1024
+
+
+def _key_hash(key):
+    """64-bit hash of an image key, for the duplicate check"""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+
+def normalize(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    def __init__(self, path, dim, num_classes=2, projection_dim=64, seed=0, exact_threshold=2_000,
+                 candidates=64, max_entries=1_000_000, flush_rows=64, flush_seconds=2.0):
+        """
+        Open (or create) the index in directory path.
+        Searches over more than exact_threshold rows are approximate unless exact=True
+        is passed, re-ranking `candidates` rows per requested neighbour.
+        Added rows are written in batches of flush_rows, or flush_seconds after they were added.
+        """
+        self.path = path
+        self.exact_threshold = exact_threshold
+        self.candidates = candidates
+        self.max_entries = max_entries
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._arrays = {}
+        self._meta_mtime = None
+
+        # Rows waiting to be written, and hashes of every indexed or pending key
+        self._pending = []  # (vector, key, probabilities)
+        self._pending_keys = set()
+        self._key_hashes = np.empty(0, dtype=np.uint64)  # sorted
+        self._hashed_rows = 0
+        self._flush_timer = None
+        self.skipped_duplicates = 0
+        self.dropped_full = 0
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['dim'] != dim or meta['num_classes'] != num_classes:
+                raise ValueError(f"Index {path} holds {meta['dim']}-d embeddings for {meta['num_classes']} "
+                                 f"classes, expected {dim}-d for {num_classes}")
+        else:
+            meta = {'dim': dim, 'num_classes': num_classes, 'projection_dim': projection_dim, 'seed': seed,
+                    'count': 0, 'capacity': 0}
+        self.meta = meta
+        self.projection = (np.random.default_rng(meta['seed'])
+                           .standard_normal((dim, meta['projection_dim'])).astype(np.float32)
+                           / np.sqrt(meta['projection_dim']))
+
+        self.searches = 0
+        self.search_seconds = 0.0
+        self._refresh()
+        atexit.register(self.flush)
+
+    # Files
+
+    def _layout(self):
+        return {
+            'vectors': ('vectors.f16', np.float16, (self.meta['dim'],)),
+            'projected': ('projected.f32', np.float32, (self.meta['projection_dim'],)),
+            'probabilities': ('probabilities.f32', np.float32, (self.meta['num_classes'],)),
+            'keys': ('keys.S32', 'S32', ())
+        }
+
+    def _open_arrays(self):
+        self._arrays = {}
+        if not self.meta['capacity']:
+            return
+        for name, (filename, dtype, shape) in self._layout().items():
+            self._arrays[name] = np.memmap(os.path.join(self.path, filename), dtype=dtype, mode='r+',
+                                           shape=(self.meta['capacity'],) + shape)
+
+    def _refresh(self):
+        """Reload the row count (and remap the files if they grew) after another process wrote"""
+        meta_path = os.path.join(self.path, META_FILE)
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._meta_mtime:
+            return
+        with open(meta_path) as f:
+            meta = json.load(f)
+        grown = meta['capacity'] != self.meta['capacity'] or not self._arrays
+        self.meta, self._meta_mtime = meta, mtime
+        if grown:
+            self._open_arrays()
+        self._hash_new_keys()
+
+    def _hash_new_keys(self):
+        """Add the keys of rows written since the last call (by any process) to the sorted key hashes"""
+        count = self.meta['count']
+        if count <= self._hashed_rows or not self._arrays:
+            return
+        new = np.sort(np.array([_key_hash(key) for key in self._arrays['keys'][self._hashed_rows:count]],
+                               dtype=np.uint64))
+        # Linear-time merge into the sorted hashes
+        self._key_hashes = np.insert(self._key_hashes, np.searchsorted(self._key_hashes, new), new)
+        self._hashed_rows = count
+
+    def _is_indexed(self, key):
+        h = np.uint64(_key_hash(key))
+        i = np.searchsorted(self._key_hashes, h)
+        return i < len(self._key_hashes) and self._key_hashes[i] == h
+
+    def _grow(self, needed):
+        capacity = max(INITIAL_CAPACITY, self.meta['capacity'])
+        while capacity < needed:
+            capacity *= 2
+        for array in self._arrays.values():
+            array.flush()
+        self._arrays = {}
+        for filename, dtype, shape in self._layout().values():
+            row_bytes = np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64))
+            with open(os.path.join(self.path, filename), 'ab') as f:
+                f.truncate(capacity * row_bytes)
+        self.meta['capacity'] = capacity
+        self._open_arrays()
+
+    def _write_meta(self):
+        meta_path = os.path.join(self.path, META_FILE)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+        self._meta_mtime = os.stat(meta_path).st_mtime_ns
+
+    # Writing
+
+    def add(self, embeddings, keys, probabilities):
+        """
+        Queue a batch of embeddings with their image keys and model outputs.
+        Keys already in the index are skipped; returns the number of rows queued.
+        """
+        vectors = normalize(embeddings)
+        probabilities = np.atleast_2d(np.asarray(probabilities, dtype=np.float32))
+        queued = 0
+        with self._lock:
+            self._refresh()
+            for vector, key, row in zip(vectors, keys, probabilities):
+                key = key.encode() if isinstance(key, str) else key
+                if key in self._pending_keys or self._is_indexed(key):
+                    self.skipped_duplicates += 1
+                    continue
+                if self.meta['count'] + len(self._pending) >= self.max_entries:
+                    self.dropped_full += 1
+                    continue
+                self._pending.append((vector, key, row))
+                self._pending_keys.add(key)
+                queued += 1
+
+            flush_now = len(self._pending) >= self.flush_rows
+            if self._pending and not flush_now and self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_seconds, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        if flush_now:
+            self.flush()
+        return queued
+
+    def flush(self):
+        """Write the pending rows to the files and publish them to other processes"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+
+            with open(os.path.join(self.path, LOCK_FILE), 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._refresh()
+                # Another process may have indexed the same keys meanwhile
+                pending = [p for p in pending if not self._is_indexed(p[1])]
+                room = max(0, self.max_entries - self.meta['count'])
+                self.dropped_full += max(0, len(pending) - room)
+                pending = pending[:room]
+                self._pending_keys.clear()
+                if not pending:
+                    return
+
+                vectors = np.stack([vector for vector, _, _ in pending])
+                start = self.meta['count']
+                end = start + len(pending)
+                if end > self.meta['capacity']:
+                    self._grow(end)
+
+                arrays = self._arrays
+                arrays['vectors'][start:end] = vectors
+                arrays['projected'][start:end] = vectors @ self.projection
+                arrays['probabilities'][start:end] = np.stack([row for _, _, row in pending])
+                arrays['keys'][start:end] = [key for _, key, _ in pending]
+                for array in arrays.values():
+                    array.flush()
+
+                # The row count is published last, so readers never see half-written rows
+                self.meta['count'] = end
+                self._write_meta()
+                self._hash_new_keys()
+
+    # Reading
+
+    def __len__(self):
+        return self.meta['count']
+
+    def entry(self, row):
+        """(key, probabilities) of one row"""
+        return self._arrays['keys'][row].decode(), np.array(self._arrays['probabilities'][row])
+
+    def _scan(self, matrix, queries, count):
+        """queries @ matrix[:count].T, converting rows to float32 one block at a time"""
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        block_rows = max(1024, SEARCH_BLOCK_VALUES // matrix.shape[1])
+        for start in range(0, count, block_rows):
+            block = np.asarray(matrix[start:min(start + block_rows, count)], dtype=np.float32)
+            scores[:, start:start + len(block)] = (block @ queries.T).T
+        return scores
+
+    @staticmethod
+    def _top_k(scores, k):
+        """Column indices of the k best scores per row, best first"""
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+        order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+        return np.take_along_axis(candidates, order, axis=1)
+
+    def search(self, embeddings, k=5, exact=None):
+        """
+        k nearest rows for each query embedding.
+        Returns (similarities, rows), both (num_queries, min(k, len(index))).
+        """
+        queries = normalize(embeddings)
+        start = time.perf_counter()
+        with self._lock:
+            self._refresh()
+            count, arrays = self.meta['count'], self._arrays
+        k = min(k, count)
+        if k == 0:
+            return np.empty((len(queries), 0), np.float32), np.empty((len(queries), 0), np.int64)
+
+        if exact or (exact is None and count <= self.exact_threshold):
+            scores = self._scan(arrays['vectors'], queries, count)
+            rows = self._top_k(scores, k)
+            similarities = np.take_along_axis(scores, rows, axis=1)
+        else:
+            coarse = self._scan(arrays['projected'], queries @ self.projection, count)
+            candidates = self._top_k(coarse, min(count, k * self.candidates))
+            similarities, rows = [], []
+            for query, candidate_rows in zip(queries, candidates):
+                candidate_rows = np.sort(candidate_rows)
+                exact_scores = np.asarray(arrays['vectors'][candidate_rows], dtype=np.float32) @ query
+                best = self._top_k(exact_scores[None], k)[0]
+                similarities.append(exact_scores[best])
+                rows.append(candidate_rows[best])
+            similarities, rows = np.array(similarities), np.array(rows)
+
+        with self._lock:
+            self.searches += len(queries)
+            self.search_seconds += time.perf_counter() - start
+        return similarities, rows
+
+    def disk_bytes(self):
+        return sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path))
+
+    def stats(self):
+        return {
+            'entries': len(self),
+            'dim': self.meta['dim'],
+            'capacity': self.meta['capacity'],
+            'disk_mb': self.disk_bytes() / 2 ** 20,
+            'max_entries': self.max_entries,
+            'pending': len(self._pending),
+            'skipped_duplicates': self.skipped_duplicates,
+            'dropped_full': self.dropped_full,
+            'searches': self.searches,
+            'avg_search_ms': self.search_seconds / self.searches * 1000.0 if self.searches else 0.0
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('info',))
+    parser.add_argument('--index', required=True, help='Index directory')
+    args = parser.parse_args()
+
+    meta_path = os.path.join(args.index, META_FILE)
+    if not os.path.exists(meta_path):
+        print(f"No index at {args.index}")
+        return 1
+    with open(meta_path) as f:
+        meta = json.load(f)
+    index = EmbeddingIndex(args.index, meta['dim'], meta['num_classes'])
+    for key, value in index.stats().items():
+        print(f"{key:<14}{value}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
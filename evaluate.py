@@ -0,0 +1,269 @@
+# evaluate.py
+"""
+Accuracy, calibration and latency report over a labeled image folder.
+
+Usage:
+    python evaluate.py [--images TestImages] [--backend keras] [--model mobilenetv2_checkpoint.h5]
+        [--batch-size 32] [--store .tensor_store] [--tta] [--output report.json]
+        [--baseline previous.json --max-accuracy-drop 0.01 --max-auc-drop 0.01]
+
+Images are scored through the serving code path (preprocess_image() + the
+backend, one image at a time like /predict), with folder names as labels
+(TestImages/Benign, TestImages/Malignant). Reports accuracy, sensitivity and
+specificity for the Malignant class, ROC-AUC, the confusion matrix and
+expected calibration error, plus per-image latency and batched throughput.
+
+With --baseline, the run fails (exit code 1) if accuracy or ROC-AUC dropped
+by more than the allowed margin, so quantization, resizing or batching
+changes can be gated on "no accuracy regression beyond X".
+
+With --store, preprocessed images are read from a tensor_store.py store
+(built or refreshed first), so repeated runs skip JPEG decoding; latency
+then excludes decode time.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from inference_backends import BACKENDS, load_backend
+from postprocessing import CLASS_NAMES
+from preprocessing import Preprocessor, preprocess_image
+from score_offline import iter_directory
+from tensor_store import TensorStore
+from tta import predict_tta
+
+POSITIVE_CLASS = 'Malignant'
+
+
+def roc_auc(labels, scores):
+    """ROC-AUC via the rank-sum (Mann-Whitney U) statistic, with tied scores sharing their mean rank"""
+    labels = np.asarray(labels, dtype=bool)
+    positives, negatives = labels.sum(), (~labels).sum()
+    if positives == 0 or negatives == 0:
+        return None
+
+    order = np.argsort(scores, kind='mergesort')
+    sorted_scores = np.asarray(scores)[order]
+    ranks = np.empty(len(scores), dtype=np.float64)
+    i = 0
+    while i < len(sorted_scores):
+        j = i
+        while j + 1 < len(sorted_scores) and sorted_scores[j + 1] == sorted_scores[i]:
+            j += 1
+        ranks[order[i:j + 1]] = (i + j) / 2 + 1
+        i = j + 1
+    return float((ranks[labels].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def expected_calibration_error(probabilities, labels, bins=10):
+    """ECE over equal-width bins of the predicted-class confidence; also returns the reliability table"""
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == labels
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    ece, table = 0.0, []
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (confidence > low) & (confidence <= high)
+        if not in_bin.any():
+            continue
+        gap = abs(correct[in_bin].mean() - confidence[in_bin].mean())
+        ece += in_bin.mean() * gap
+        table.append({'bin': f'{low:.1f}-{high:.1f}', 'count': int(in_bin.sum()),
+                      'accuracy': float(correct[in_bin].mean()), 'confidence': float(confidence[in_bin].mean())})
+    return float(ece), table
+
+
+def classification_report(probabilities, labels):
+    num_classes = probabilities.shape[1]
+    predicted = probabilities.argmax(axis=1)
+    confusion = np.zeros((num_classes, num_classes), dtype=int)
+    np.add.at(confusion, (labels, predicted), 1)
+
+    positive = CLASS_NAMES.index(POSITIVE_CLASS)
+    tp = confusion[positive, positive]
+    fn = confusion[positive].sum() - tp
+    fp = confusion[:, positive].sum() - tp
+    tn = confusion.sum() - tp - fn - fp
+    ece, reliability = expected_calibration_error(probabilities, labels)
+
+    return {
+        'images': int(len(labels)),
+        'accuracy': float((predicted == labels).mean()),
+        'sensitivity': float(tp / (tp + fn)) if tp + fn else None,
+        'specificity': float(tn / (tn + fp)) if tn + fp else None,
+        'roc_auc': roc_auc(labels == positive, probabilities[:, positive]),
+        'ece': ece,
+        'confusion_matrix': {'labels': CLASS_NAMES[:num_classes], 'rows_true_cols_predicted': confusion.tolist()},
+        'reliability': reliability
+    }
+
+
+def percentiles(values_ms):
+    values = np.asarray(values_ms)
+    return {'mean': float(values.mean()), 'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)), 'p99': float(np.percentile(values, 99))}
+
+
+def score_images(items, backend, use_tta):
+    """Serving path, one image at a time: returns (probabilities, preprocess ms, inference ms) per image"""
+    probabilities, preprocess_ms, inference_ms = [], [], []
+    for path, _ in items:
+        start = time.perf_counter()
+        with Image.open(path) as image:
+            array = preprocess_image(image)
+        middle = time.perf_counter()
+        row = predict_tta(backend.predict, array)[0] if use_tta else backend.predict(array)[0]
+        end = time.perf_counter()
+        probabilities.append(row)
+        preprocess_ms.append((middle - start) * 1000.0)
+        inference_ms.append((end - middle) * 1000.0)
+    return probabilities, preprocess_ms, inference_ms
+
+
+def score_store(store, ids, backend, use_tta):
+    """
+    Same as score_images() but reading preprocessed images from a tensor store.
+    Images come back in storage order, so the ids are returned alongside.
+    """
+    scored_ids, probabilities, preprocess_ms, inference_ms = [], [], [], []
+    for batch_ids, _, batch in store.float_batches(1, ids):
+        scored_ids.extend(batch_ids)
+        middle = time.perf_counter()
+        row = predict_tta(backend.predict, batch)[0] if use_tta else backend.predict(batch)[0]
+        probabilities.append(row)
+        preprocess_ms.append(0.0)
+        inference_ms.append((time.perf_counter() - middle) * 1000.0)
+    return scored_ids, probabilities, preprocess_ms, inference_ms
+
+
+def batched_throughput(items, store, ids, backend, batch_size):
+    """Images per second scoring in batches of batch_size (decode included unless using the store)"""
+    start = time.perf_counter()
+    if store is not None:
+        for _, _, batch in store.float_batches(batch_size, ids):
+            backend.predict(batch)
+    else:
+        preprocessor = Preprocessor(capacity=batch_size)
+        for offset in range(0, len(items), batch_size):
+            images = [Image.open(path) for path, _ in items[offset:offset + batch_size]]
+            batch, _, _ = preprocessor.preprocess_batch(images)
+            backend.predict(batch)
+            for image in images:
+                image.close()
+    return len(items) / (time.perf_counter() - start)
+
+
+def check_regression(report, baseline, max_accuracy_drop, max_auc_drop):
+    """Return a list of regressions of report against a baseline report"""
+    failures = []
+    drop = baseline['metrics']['accuracy'] - report['metrics']['accuracy']
+    if drop > max_accuracy_drop:
+        failures.append(f"accuracy dropped by {drop:.4f} (allowed {max_accuracy_drop})")
+    if baseline['metrics']['roc_auc'] is not None and report['metrics']['roc_auc'] is not None:
+        drop = baseline['metrics']['roc_auc'] - report['metrics']['roc_auc']
+        if drop > max_auc_drop:
+            failures.append(f"ROC-AUC dropped by {drop:.4f} (allowed {max_auc_drop})")
+    return failures
+
+
+def print_report(report):
+    m = report['metrics']
+
+    def fmt(value):
+        return 'n/a' if value is None else f'{value:.4f}'
+
+    print(f"\nImages:       {m['images']}")
+    print(f"Accuracy:     {fmt(m['accuracy'])}")
+    print(f"Sensitivity:  {fmt(m['sensitivity'])}  ({POSITIVE_CLASS} recall)")
+    print(f"Specificity:  {fmt(m['specificity'])}")
+    print(f"ROC-AUC:      {fmt(m['roc_auc'])}")
+    print(f"ECE:          {fmt(m['ece'])}")
+    labels = m['confusion_matrix']['labels']
+    print("\nConfusion matrix (rows = true, columns = predicted)")
+    print(' ' * 12 + ''.join(f'{name:>12}' for name in labels))
+    for name, row in zip(labels, m['confusion_matrix']['rows_true_cols_predicted']):
+        print(f'{name:<12}' + ''.join(f'{count:>12}' for count in row))
+
+    latency = report['latency_ms']
+    print(f"\n{'latency ms':<14}{'mean':>8}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for stage in ('preprocess', 'inference', 'total'):
+        values = latency[stage]
+        print(f"{stage:<14}{values['mean']:>8.2f}{values['p50']:>8.2f}{values['p95']:>8.2f}{values['p99']:>8.2f}")
+    print(f"\nThroughput: {report['throughput_images_per_s']:.1f} images/s at batch size {report['batch_size']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', default='TestImages', help='Folder with one subfolder per class')
+    parser.add_argument('--backend', default='keras', choices=BACKENDS)
+    parser.add_argument('--model', default='mobilenetv2_checkpoint.h5', help='Model file for the backend')
+    parser.add_argument('--threads', type=int, default=None, help='Inference threads')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batch size for the throughput pass')
+    parser.add_argument('--store', default=None, help='Read preprocessed images from this tensor store')
+    parser.add_argument('--tta', action='store_true', help='Score with test-time augmentation')
+    parser.add_argument('--output', default=None, help='Write the report as JSON')
+    parser.add_argument('--baseline', default=None, help='Report JSON from a previous run to compare against')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.0)
+    parser.add_argument('--max-auc-drop', type=float, default=0.0)
+    args = parser.parse_args()
+
+    items = [(path, label) for path, label in iter_directory(args.images) if label in CLASS_NAMES]
+    if not items:
+        print(f"No images in {', '.join(CLASS_NAMES)} subfolders of {args.images}")
+        return 1
+
+    print(f"Loading {args.backend} model from {args.model}...")
+    backend = load_backend(args.backend, args.model, num_threads=args.threads)
+    backend.warmup()
+
+    store = ids = None
+    if args.store:
+        store = TensorStore(args.store)
+        updated, removed, failed = store.build(items)
+        print(f"Tensor store: {updated} images decoded, {removed} removed, {len(failed)} failed")
+        ids = [os.path.relpath(path) for path, _ in items if os.path.relpath(path) in store.entries]
+        ids, probabilities, preprocess_ms, inference_ms = score_store(store, ids, backend, args.tta)
+        labels = np.array([CLASS_NAMES.index(store.entries[i]['label']) for i in ids])
+    else:
+        labels = np.array([CLASS_NAMES.index(label) for _, label in items])
+        probabilities, preprocess_ms, inference_ms = score_images(items, backend, args.tta)
+
+    total_ms = np.add(preprocess_ms, inference_ms)
+    report = {
+        'model': os.path.abspath(args.model),
+        'backend': backend.name,
+        'images_dir': os.path.abspath(args.images),
+        'tta': args.tta,
+        'tensor_store': args.store,
+        'machine': {'platform': platform.platform(), 'processor': platform.processor(), 'cpus': os.cpu_count()},
+        'metrics': classification_report(np.asarray(probabilities, dtype=np.float64), labels),
+        'latency_ms': {'preprocess': percentiles(preprocess_ms), 'inference': percentiles(inference_ms),
+                       'total': percentiles(total_ms)},
+        'throughput_images_per_s': batched_throughput(items, store, ids, backend, args.batch_size),
+        'batch_size': args.batch_size
+    }
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = check_regression(report, baseline, args.max_accuracy_drop, args.max_auc_drop)
+        if failures:
+            print("\nREGRESSION against " + args.baseline + ":\n  " + "\n  ".join(failures))
+            return 1
+        print(f"\nNo regression against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,141 +1,1127 @@
 # flask_api.py
-from flask import Flask, request, jsonify
-import tensorflow as tf
+from flask import Flask, request, jsonify, g
 import numpy as np
 from PIL import Image
 import io
 import base64
+import gzip
+import hashlib
+import json
 import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from admission import AdmissionController, ImageRejected, Overloaded, inspect_image
+from embedding_index import EmbeddingIndex
+from gradcam import GradCAM, overlay, to_png
+from job_queue import JobQueue, QueueFull
+from metrics import SIZE_BUCKETS, MetricsRegistry
+from model_registry import ModelBudgetExceeded, ModelNotAvailable, ModelRegistry, parse_model_spec
+from postprocessing import CLASS_NAMES, format_prediction
+from preprocessing import Preprocessor, preprocess_image
+from prediction_cache import PredictionCache, cache_key
+from tiling import AGGREGATIONS, predict_tiled
+from tta import DEFAULT_VIEWS, TTA_MODES, in_band, predict_tta
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+
+class GzipRequestMiddleware:
+    """Decompress request bodies sent with Content-Encoding: gzip (bounded by max_bytes after decompression)"""
+
+    def __init__(self, wsgi_app, max_bytes):
+        self.wsgi_app = wsgi_app
+        self.max_bytes = max_bytes
+
+    def __call__(self, environ, start_response):
+        if environ.get('HTTP_CONTENT_ENCODING', '').lower() == 'gzip':
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            if not length or length > self.max_bytes:
+                return self._reject(start_response, '413 Request Entity Too Large', 'Request body too large')
+            try:
+                compressed = environ['wsgi.input'].read(length)
+                with gzip.GzipFile(fileobj=io.BytesIO(compressed)) as f:
+                    body = f.read(self.max_bytes + 1)
+            except (OSError, EOFError, ValueError):
+                return self._reject(start_response, '400 Bad Request', 'Invalid gzip request body')
+            if len(body) > self.max_bytes:
+                return self._reject(start_response, '413 Request Entity Too Large', 'Request body too large')
+            environ['wsgi.input'] = io.BytesIO(body)
+            environ['CONTENT_LENGTH'] = str(len(body))
+            del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+
+    @staticmethod
+    def _reject(start_response, status, message):
+        body = json.dumps({'error': message}).encode()
+        start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+        return [body]
+
+
+app.wsgi_app = GzipRequestMiddleware(app.wsgi_app, app.config['MAX_CONTENT_LENGTH'])
+
 # Configuration
 MODEL_PATH = 'mobilenetv2_checkpoint.h5'  # Updated to match your checkpoint name
 
-# Binary classification class names (based on your training code)
-CLASS_NAMES = [
-    'Benign',
-    'Malignant'
-]
+# Inference backend: keras (MODEL_PATH), or tflite/onnx models exported by convert_model.py
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
+BACKEND_MODEL_PATH = os.environ.get('BACKEND_MODEL_PATH', MODEL_PATH)
+INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', 0)) or None  # intra-op threads
+INFERENCE_INTER_OP_THREADS = int(os.environ.get('INFERENCE_INTER_OP_THREADS', 0)) or None
 
-# Detailed explanation for each class
-CLASS_DESCRIPTIONS = {
-    'Benign': 'Non-cancerous skin lesion (nv - Melanocytic nevus, vasc - Vascular lesion, df - Dermatofibroma)',
-    'Malignant': 'Potentially cancerous lesion (mel - Melanoma, bkl - Benign keratosis-like, bcc - Basal cell carcinoma, akiec - Actinic keratosis)'
-}
+# Keras backend: batch sizes the forward pass is compiled for, traced at startup when MODEL_WARMUP=1
+BATCH_BUCKETS = tuple(int(b) for b in os.environ.get('BATCH_BUCKETS', '1,4,8,16,32').split(',') if b.strip())
+MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1') == '1'
 
-# Load the trained model
-try:
-    model = tf.keras.models.load_model(MODEL_PATH)
-    print(f"Model loaded successfully from {MODEL_PATH}")
-    print(f"Model input shape: {model.input_shape}")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+# Load the model in a background thread so the server can bind and answer /health immediately
+MODEL_BACKGROUND_LOAD = os.environ.get('MODEL_BACKGROUND_LOAD', '1') == '1'
 
+# Model registry: name of the model served by default, memory budget for resident
+# models (0 = unlimited) and the directory /models/load may read model files from
+DEFAULT_MODEL_NAME = 'default'
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0))
+MODEL_DIR = os.path.abspath(os.environ.get('MODEL_DIR', '.'))
 
-def preprocess_image(image, target_size=(224, 224)):
-    """
-    Preprocess the image for model prediction
-    Matches the preprocessing used in training with MobileNetV2
-    """
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
+# Micro-batching: flush when BATCH_MAX_SIZE images are queued or BATCH_MAX_WAIT_MS has passed
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 16))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 5))
+
+# /predict_batch: images per model call and maximum images per request
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 32))
+BATCH_MAX_IMAGES = int(os.environ.get('BATCH_MAX_IMAGES', 1000))
+
+# Prediction cache keyed by image content hash + model identity (CACHE_DB_PATH='' keeps it in memory only)
+CACHE_ENABLED = os.environ.get('CACHE_ENABLED', '1') == '1'
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
+CACHE_MAX_MB = float(os.environ.get('CACHE_MAX_MB', 64))
+CACHE_DB_PATH = os.environ.get('CACHE_DB_PATH', '')
+
+# Admission control: images are validated from their header before decoding, at most
+# ADMISSION_MAX_CONCURRENT requests decode/score at once, ADMISSION_MAX_QUEUE more wait up to
+# ADMISSION_QUEUE_TIMEOUT_MS for a slot (then 503), and requests beyond that get 429
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 32))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 64))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_MS', 2000))
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 40_000_000))
+MAX_IMAGE_SIDE = int(os.environ.get('MAX_IMAGE_SIDE', 10_000))
+ALLOWED_IMAGE_FORMATS = tuple(f.strip().upper() for f in os.environ.get('ALLOWED_IMAGE_FORMATS',
+                                                                         'JPEG,PNG,BMP,GIF').split(','))
+
+# Test-time augmentation on /predict: off, always, or adaptive (only when the base
+# confidence falls inside TTA_CONFIDENCE_BAND, e.g. the GUI's UNCERTAIN band below 0.8)
+TTA_MODE = os.environ.get('TTA_MODE', 'off')
+TTA_CONFIDENCE_BAND = tuple(float(x) for x in os.environ.get('TTA_CONFIDENCE_BAND', '0.5,0.8').split(','))
+TTA_VIEWS = tuple(v.strip() for v in os.environ.get('TTA_VIEWS', ','.join(DEFAULT_VIEWS)).split(',') if v.strip())
+
+# Tiled inference (/predict?tiles=N): images are tiled at up to TILING_MAX_SIDE px on the long side
+# with TILING_OVERLAP between neighbouring 224x224 tiles, at most TILING_MAX_TILES tiles per image;
+# TILING_AGGREGATE=max reports the most suspicious tile, mean averages all tiles
+TILING_MAX_TILES = int(os.environ.get('TILING_MAX_TILES', 64))
+TILING_OVERLAP = float(os.environ.get('TILING_OVERLAP', 0.5))
+TILING_MAX_SIDE = int(os.environ.get('TILING_MAX_SIDE', 2048))
+TILING_AGGREGATE = os.environ.get('TILING_AGGREGATE', 'max')
+
+# Embedding index (keras backend): penultimate-layer embeddings of images scored by /predict are kept
+# in a memory-mapped float16 index per model version under EMBEDDING_INDEX_DIR and searched by /similar.
+# With NEAR_DUPLICATE_MODE=1 (or /predict?near_duplicate=1) an image whose nearest indexed neighbour
+# has cosine similarity >= NEAR_DUPLICATE_THRESHOLD gets that neighbour's result
+EMBEDDING_INDEX_ENABLED = os.environ.get('EMBEDDING_INDEX_ENABLED', '0') == '1'
+EMBEDDING_INDEX_DIR = os.environ.get('EMBEDDING_INDEX_DIR', '.embedding_index')
+EMBEDDING_INDEX_MAX_ENTRIES = int(os.environ.get('EMBEDDING_INDEX_MAX_ENTRIES', 1_000_000))
+NEAR_DUPLICATE_MODE = os.environ.get('NEAR_DUPLICATE_MODE', '0') == '1'
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.97))
+
+# Grad-CAM explanations (keras backend) on /explain and /predict?explain=1: overlays are blended
+# at EXPLAIN_OVERLAY_ALPHA and explanations are cached by image content hash
+EXPLAIN_OVERLAY_ALPHA = float(os.environ.get('EXPLAIN_OVERLAY_ALPHA', 0.45))
+EXPLAIN_CACHE_MAX_ENTRIES = int(os.environ.get('EXPLAIN_CACHE_MAX_ENTRIES', 1000))
+EXPLAIN_CACHE_MAX_MB = float(os.environ.get('EXPLAIN_CACHE_MAX_MB', 64))
+
+# Asynchronous jobs: SQLite queue file, worker threads per process, maximum queued images
+# (further submissions get 429) and how long finished jobs are kept for polling
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH', 'jobs.db')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_MAX_QUEUED_IMAGES = int(os.environ.get('JOB_MAX_QUEUED_IMAGES', 5000))
+JOB_RETENTION_HOURS = float(os.environ.get('JOB_RETENTION_HOURS', 24))
+
+# Per-stage timing and request metrics on /metrics (METRICS_ENABLED=0 turns instrumentation into no-ops)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+# Metrics
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
+REQUESTS = metrics.counter('skin_api_requests_total', 'Requests by endpoint and outcome', ('endpoint', 'outcome'))
+REQUEST_DURATION = metrics.histogram('skin_api_request_duration_seconds', 'Request latency', ('endpoint',))
+STAGE_DURATION = metrics.histogram('skin_api_stage_duration_seconds', 'Time spent per request stage', ('stage',))
+PAYLOAD_SIZE = metrics.histogram('skin_api_request_payload_bytes', 'Request body size', ('endpoint',),
+                                 buckets=SIZE_BUCKETS)
+IN_FLIGHT = metrics.gauge('skin_api_in_flight_requests', 'Requests currently being processed', ('endpoint',))
+metrics.set_stage_histogram(STAGE_DURATION)
+SHED = metrics.counter('skin_api_shed_total', 'Requests rejected by admission control', ('reason',))
+ADMISSION_WAIT = metrics.histogram('skin_api_admission_wait_seconds', 'Time admitted requests waited for a slot')
+NEAR_DUPLICATES = metrics.counter('skin_api_near_duplicates_total',
+                                  'Predictions answered from a near-duplicate in the embedding index')
+TILES = metrics.counter('skin_api_tiles_total', 'Tiles scored by tiled inference')
+JOB_QUEUE_DEPTH = metrics.gauge('skin_api_job_queue_images', 'Images waiting in the job queue')
+JOB_WORKERS_BUSY = metrics.gauge('skin_api_job_workers_busy', 'Job workers currently running a job')
+JOB_WORKER_UTILIZATION = metrics.gauge('skin_api_job_worker_utilization',
+                                       'Fraction of time job workers spent running jobs')
+JOB_WAIT = metrics.gauge('skin_api_job_wait_seconds', 'Average time recent jobs waited in the queue')
+
+def backend_options(kind):
+    """Backend settings shared by every model version"""
+    options = {'num_threads': INFERENCE_THREADS, 'inter_op_threads': INFERENCE_INTER_OP_THREADS}
+    if kind == 'keras':
+        options['buckets'] = BATCH_BUCKETS
+    return options
+
+
+# Every loaded model version gets its own micro-batching scheduler in front of it
+registry = ModelRegistry(memory_budget_bytes=int(MODEL_MEMORY_BUDGET_MB * 1024 * 1024),
+                         backend_options=backend_options,
+                         batch_max_size=BATCH_MAX_SIZE,
+                         batch_max_wait_ms=BATCH_MAX_WAIT_MS,
+                         warmup=MODEL_WARMUP)
+
+
+def start_model_loading():
+    """Load the default model in a background thread, or synchronously when MODEL_BACKGROUND_LOAD=0"""
+    registry.load(DEFAULT_MODEL_NAME, BACKEND_MODEL_PATH, kind=INFERENCE_BACKEND,
+                  background=MODEL_BACKGROUND_LOAD)
+
+
+def model_status(name=DEFAULT_MODEL_NAME):
+    """State of a model for health checks: 'loading', 'ready' or 'failed'"""
+    entry = registry.status(name)
+    if entry is None:
+        return {'state': 'loading', 'error': None, 'load_seconds': None, 'version': None, 'backend': None}
+    return {
+        'state': 'ready' if registry.get(name) else entry.state,
+        'error': entry.error,
+        'load_seconds': entry.load_seconds,
+        'version': entry.version,
+        'backend': entry.kind
+    }
 
-    # Resize image to match training target size
-    image = image.resize(target_size)
 
-    # Convert to numpy array
-    img_array = np.array(image)
+def wait_until_loaded(timeout=None):
+    """Block until the default model has finished loading; returns True if it is ready"""
+    entry = registry.status(DEFAULT_MODEL_NAME)
+    if entry is not None:
+        entry.loaded.wait(timeout)
+    return registry.get(DEFAULT_MODEL_NAME) is not None
 
-    # Normalize pixel values (rescale=1./255 as in training)
-    img_array = img_array.astype('float32') / 255.0
 
-    # Add batch dimension
-    img_array = np.expand_dims(img_array, axis=0)
+def model_unavailable(error):
+    """503 (or 404 for unknown models) response when the requested model can't serve"""
+    if error.status_code == 503 and model_status()['state'] == 'loading':
+        return jsonify({'error': 'Model is still loading, retry shortly'}), 503, {'Retry-After': '5'}
+    return jsonify({'error': str(error)}), error.status_code
 
-    return img_array
 
+# Decodes JPEGs near the model input size and fills per-thread float32 batch buffers
+preprocessor = Preprocessor(capacity=BATCH_CHUNK_SIZE)
 
-def predict_skin_cancer(image):
-    """Make prediction on the preprocessed image"""
-    if model is None:
-        return None, "Model not loaded"
+# Results of already-scored images, keyed per model version
+prediction_cache = PredictionCache(max_entries=CACHE_MAX_ENTRIES,
+                                   max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+                                   db_path=CACHE_DB_PATH or None) if CACHE_ENABLED else None
+
+
+# Caps concurrent decode + inference work on /predict and /predict_batch
+admission = AdmissionController(max_concurrent=ADMISSION_MAX_CONCURRENT, max_queue=ADMISSION_MAX_QUEUE,
+                                queue_timeout=ADMISSION_QUEUE_TIMEOUT_MS / 1000.0)
+
+# Embedding indexes by model fingerprint, opened on first use
+embedding_indexes = {}
+embedding_lock = threading.Lock()
+
+# Grad-CAM sub-models by model fingerprint, built on first use, and their cached explanations
+explainers = {}
+explainer_lock = threading.Lock()
+explanation_cache = PredictionCache(max_entries=EXPLAIN_CACHE_MAX_ENTRIES,
+                                    max_bytes=int(EXPLAIN_CACHE_MAX_MB * 1024 * 1024))
+
+# Shadow scoring runs off the request thread
+shadow_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='shadow')
+shadow_stats = {}
+shadow_lock = threading.Lock()
+
+
+def embedding_index_for(version):
+    """Embedding index of a model version, or None if disabled or the backend has no embeddings"""
+    if not EMBEDDING_INDEX_ENABLED or not version.supports_embeddings:
+        return None
+    with embedding_lock:
+        index = embedding_indexes.get(version.model_id)
+        if index is None:
+            folder = hashlib.blake2b(version.model_id.encode(), digest_size=8).hexdigest()
+            index = EmbeddingIndex(os.path.join(EMBEDDING_INDEX_DIR, folder), version.backend.embedding_dim,
+                                   num_classes=len(CLASS_NAMES), max_entries=EMBEDDING_INDEX_MAX_ENTRIES)
+            embedding_indexes[version.model_id] = index
+        return index
+
+
+def predict_skin_cancer(image, model_version=None, tta=None, image_key=None, near_duplicate=None):
+    """
+    Make prediction on the preprocessed image (default model unless a version is given).
+    tta: 'off', 'always' or 'adaptive' (defaults to TTA_MODE). Augmented views are scored
+    as one extra batch and averaged with the base prediction.
+    With the embedding index enabled, the image's embedding is stored under image_key;
+    near_duplicate (defaults to NEAR_DUPLICATE_MODE) first looks for a very close indexed
+    image and returns its stored result instead.
+    """
+    if model_version is None:
+        try:
+            with registry.use() as version:
+                return predict_skin_cancer(image, version, tta, image_key, near_duplicate)
+        except ModelNotAvailable as e:
+            return None, str(e)
+
+    tta = tta or TTA_MODE
+    near_duplicate = NEAR_DUPLICATE_MODE if near_duplicate is None else near_duplicate
+    index = embedding_index_for(model_version) if image_key else None
 
     try:
-        # Preprocess image
-        processed_image = preprocess_image(image)
+        # Preprocess image into this thread's buffer (PIL decodes the pixels here)
+        with metrics.stage('preprocess'):
+            processed_image = preprocess_image(image, out=preprocessor.buffer(1))
 
-        # Make prediction
-        predictions = model.predict(processed_image)
+        if index is None:
+            # Make prediction (batched with concurrent requests)
+            with metrics.stage('inference'):
+                probabilities = model_version.batcher.predict(processed_image)
+        else:
+            # One forward pass gives both the embedding and the prediction
+            with metrics.stage('inference'):
+                embeddings, outputs = model_version.embed(processed_image)
+            probabilities = outputs[0]
 
-        # Get the predicted class and confidence
-        predicted_class_idx = np.argmax(predictions[0])
-        confidence = float(predictions[0][predicted_class_idx])
+            if near_duplicate:
+                with metrics.stage('similarity_search'):
+                    similarities, rows = index.search(embeddings, k=1)
+                if rows.size and similarities[0, 0] >= NEAR_DUPLICATE_THRESHOLD:
+                    NEAR_DUPLICATES.inc()
+                    key, stored = index.entry(rows[0, 0])
+                    result = format_prediction(stored)
+                    result['near_duplicate'] = {'key': key, 'similarity': float(similarities[0, 0])}
+                    return result, None
 
-        # Get all class probabilities with descriptions
-        class_probabilities = []
-        for i, prob in enumerate(predictions[0]):
-            class_name = CLASS_NAMES[i] if i < len(CLASS_NAMES) else f'Class {i}'
-            class_probabilities.append({
-                'class': class_name,
-                'probability': float(prob),
-                'description': CLASS_DESCRIPTIONS.get(class_name, 'No description available')
-            })
+            with metrics.stage('index'):
+                index.add(embeddings, [image_key], outputs)
 
-        # Sort by probability
-        class_probabilities.sort(key=lambda x: x['probability'], reverse=True)
+        if tta == 'off':
+            return format_prediction(probabilities), None
 
-        predicted_class = CLASS_NAMES[predicted_class_idx] if predicted_class_idx < len(
-            CLASS_NAMES) else f'Class {predicted_class_idx}'
+        base_confidence = float(np.max(probabilities))
+        applied = tta == 'always' or in_band(base_confidence, TTA_CONFIDENCE_BAND)
+        if applied:
+            with metrics.stage('tta'):
+                probabilities = predict_tta(model_version.predict, processed_image, TTA_VIEWS,
+                                            base_probabilities=probabilities[None])[0]
 
-        return {
-            'predicted_class': predicted_class,
-            'confidence': confidence,
-            'all_probabilities': class_probabilities
-        }, None
+        result = format_prediction(probabilities)
+        result['tta'] = {
+            'mode': tta,
+            'applied': applied,
+            'views': len(TTA_VIEWS) if applied else 1,
+            'base_confidence': base_confidence
+        }
+        return result, None
 
     except Exception as e:
         return None, str(e)
 
 
+def predict_skin_cancer_tiled(image, model_version, max_tiles=TILING_MAX_TILES, aggregate=TILING_AGGREGATE):
+    """
+    Score overlapping 224x224 tiles of a high-resolution image in batched forward passes.
+    The prediction is the aggregated tile result plus a 'tiling' section with the
+    per-tile probability grid (rows x cols x classes) and tiles/second.
+    """
+    try:
+        with metrics.stage('tiling'):
+            tiled = predict_tiled(image, model_version.predict, max_tiles=max_tiles, overlap=TILING_OVERLAP,
+                                  max_side=TILING_MAX_SIDE, chunk_size=BATCH_CHUNK_SIZE, aggregate=aggregate,
+                                  positive_index=CLASS_NAMES.index('Malignant'))
+        TILES.inc(tiled['tiles'])
+
+        result = format_prediction(tiled['probabilities'])
+        result['tiling'] = {
+            'classes': CLASS_NAMES,
+            'grid': np.round(tiled['grid'], 4).tolist(),
+            **{key: value for key, value in tiled.items() if key not in ('probabilities', 'grid')}
+        }
+        return result, None
+
+    except Exception as e:
+        return None, str(e)
+
+
+def explainer_for(version):
+    """Grad-CAM for a model version, or None if its backend has no Keras model"""
+    if version.model is None:
+        return None
+    with explainer_lock:
+        explainer = explainers.get(version.model_id)
+        if explainer is None:
+            explainer = explainers[version.model_id] = GradCAM(version.model)
+        return explainer
+
+
+def explain_skin_cancer_batch(images, model_version, class_index=None, include_overlay=True,
+                              chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Predictions with Grad-CAM explanations for a list of images.
+    Each chunk takes one forward and one backward pass; the prediction comes from
+    the same forward pass. Returns (result, error) tuples in input order.
+    """
+    explainer = explainer_for(model_version)
+    outcomes = [None] * len(images)
+    chunk_size = max(1, int(chunk_size))
+    for start in range(0, len(images), chunk_size):
+        chunk = images[start:start + chunk_size]
+        batch, ok_indices, errors = preprocessor.preprocess_batch(chunk)
+
+        for i, error in errors.items():
+            outcomes[start + i] = (None, f'Error processing image: {error}')
+        if not ok_indices:
+            continue
+
+        try:
+            heatmaps, probabilities, targets = explainer.compute(batch, class_index)
+        except Exception as e:
+            for i in ok_indices:
+                outcomes[start + i] = (None, str(e))
+            continue
+
+        for row, i in enumerate(ok_indices):
+            result = format_prediction(probabilities[row])
+            result['explanation'] = {
+                'method': 'grad-cam',
+                'class': CLASS_NAMES[targets[row]],
+                'heatmap': np.uint8(heatmaps[row] * 255).tolist()
+            }
+            if include_overlay:
+                pixels = np.uint8(np.clip(batch[row] * 255.0, 0, 255))
+                png = to_png(overlay(pixels, heatmaps[row], EXPLAIN_OVERLAY_ALPHA))
+                result['explanation']['overlay_png'] = base64.b64encode(png).decode('ascii')
+            outcomes[start + i] = (result, None)
+
+    return outcomes
+
+
+def predict_skin_cancer_batch(images, chunk_size=BATCH_CHUNK_SIZE, model_version=None):
+    """
+    Make predictions for a list of images.
+    Returns a list of (result, error) tuples in input order; an image that
+    fails preprocessing or inference only fails its own entry.
+    """
+    if model_version is None:
+        try:
+            with registry.use() as version:
+                return predict_skin_cancer_batch(images, chunk_size, version)
+        except ModelNotAvailable as e:
+            return [(None, str(e))] * len(images)
+
+    outcomes = [None] * len(images)
+
+    # Preprocess and run the model one chunk at a time so the batch buffer stays bounded
+    chunk_size = max(1, int(chunk_size))
+    for start in range(0, len(images), chunk_size):
+        chunk = images[start:start + chunk_size]
+        batch, ok_indices, errors = preprocessor.preprocess_batch(chunk)
+
+        for i, error in errors.items():
+            outcomes[start + i] = (None, f'Error processing image: {error}')
+        if not ok_indices:
+            continue
+
+        try:
+            predictions = model_version.predict(batch)
+        except Exception as e:
+            for i in ok_indices:
+                outcomes[start + i] = (None, str(e))
+            continue
+
+        for i, probabilities in zip(ok_indices, predictions):
+            outcomes[start + i] = (format_prediction(probabilities), None)
+
+    return outcomes
+
+
+def read_image_payload():
+    """
+    Return the raw image bytes of a /predict request, or None if missing.
+    Accepts a raw image body (Content-Type image/*), a multipart part
+    named 'image', or JSON {"image": "base64"}.
+    """
+    if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+        with metrics.stage('parse'):
+            return request.get_data(cache=False) or None
+
+    if request.mimetype == 'multipart/form-data':
+        with metrics.stage('parse'):
+            file = request.files.get('image')
+            return file.read() if file else None
+
+    with metrics.stage('parse'):
+        data = request.get_json(silent=True)
+    if not data or 'image' not in data:
+        return None
+    with metrics.stage('base64_decode'):
+        return base64.b64decode(data['image'])
+
+
+def open_image(image_data):
+    """
+    Open image bytes with PIL; BytesIO shares the bytes buffer instead of copying it.
+    Only the header is read here: unsupported formats and oversized dimensions
+    raise ImageRejected before any pixel is decoded.
+    """
+    with metrics.stage('open'):
+        try:
+            image = Image.open(io.BytesIO(image_data))
+        except Image.DecompressionBombError as e:
+            raise ImageRejected(str(e), 413)
+        return inspect_image(image, ALLOWED_IMAGE_FORMATS, MAX_IMAGE_PIXELS, MAX_IMAGE_SIDE)
+
+
+@contextmanager
+def admitted():
+    """Hold an admission slot; raises Overloaded (counted per reason) when the request is shed"""
+    try:
+        with admission.admit() as waited:
+            ADMISSION_WAIT.observe(waited)
+            yield
+    except Overloaded as e:
+        SHED.inc(reason=e.reason)
+        raise
+
+
+def overloaded(error):
+    g.outcome = 'shed'
+    return jsonify({'error': str(error)}), error.status_code, {'Retry-After': str(error.retry_after)}
+
+
+def score_shadow(shadow_spec, primary, image_data, primary_result):
+    """Score an image on a shadow model and record whether it agrees with the primary"""
+    key = f'{primary.name}:{primary.version} vs {shadow_spec}'
+    try:
+        with registry.use(shadow_spec) as shadow:
+            result, error = predict_skin_cancer(open_image(image_data), shadow)
+    except ModelNotAvailable as e:
+        result, error = None, str(e)
+
+    with shadow_lock:
+        entry = shadow_stats.setdefault(key, {'requests': 0, 'agreements': 0, 'errors': 0, 'confidence_delta': 0.0})
+        entry['requests'] += 1
+        if error:
+            entry['errors'] += 1
+        else:
+            entry['agreements'] += result['predicted_class'] == primary_result['predicted_class']
+            entry['confidence_delta'] += abs(result['confidence'] - primary_result['confidence'])
+
+
+def resolve_model_path(path):
+    """Model files loaded through the API must live under MODEL_DIR"""
+    full_path = os.path.abspath(os.path.join(MODEL_DIR, path))
+    if os.path.commonpath([full_path, MODEL_DIR]) != MODEL_DIR:
+        raise ValueError(f'Model path must be inside {MODEL_DIR}')
+    if not os.path.isfile(full_path):
+        raise ValueError(f'Model file not found: {path}')
+    return full_path
+
+
+def run_job(items, model_spec):
+    """Job worker: score the items of one queued job"""
+    if not model_spec:
+        wait_until_loaded()
+    with registry.use(model_spec) as version:
+        return f'{version.name}:{version.version}', score_items(items, version)
+
+
+# Worker threads must not be started before gunicorn forks: serve.py starts them in each worker
+# (post_fork), the development server below; their first pass requeues jobs left over from a restart
+job_queue = JobQueue(run_job, db_path=JOB_DB_PATH, num_workers=JOB_WORKERS,
+                     max_queued_images=JOB_MAX_QUEUED_IMAGES,
+                     retention_seconds=JOB_RETENTION_HOURS * 3600)
+
+
+@app.before_request
+def start_request_metrics():
+    if not metrics.enabled:
+        return
+    g.request_start = time.perf_counter()
+    IN_FLIGHT.inc(endpoint=request.endpoint)
+    if request.content_length:
+        PAYLOAD_SIZE.observe(request.content_length, endpoint=request.endpoint)
+
+
+@app.after_request
+def record_request_metrics(response):
+    if metrics.enabled and 'request_start' in g:
+        if g.get('outcome') == 'shed':
+            outcome = 'shed'
+        elif response.status_code < 400:
+            outcome = g.get('outcome', 'success')
+        else:
+            outcome = 'client_error' if response.status_code < 500 else 'server_error'
+        REQUESTS.inc(endpoint=request.endpoint, outcome=outcome)
+        REQUEST_DURATION.observe(time.perf_counter() - g.request_start, endpoint=request.endpoint)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if metrics.enabled and 'request_start' in g:
+        IN_FLIGHT.dec(endpoint=request.endpoint)
+
+
 @app.route('/predict', methods=['POST'])
 def predict():
+    """
+    Score one image. Optional query parameters:
+    model=name[:version] to select a model, shadow=name[:version] to also
+    score the image on a second model in the background for comparison,
+    tta=off|always|adaptive to override TTA_MODE,
+    tiles=N to score up to N overlapping tiles of a high-resolution image
+    (capped at TILING_MAX_TILES) with tile_aggregate=max|mean,
+    near_duplicate=1|0 to override NEAR_DUPLICATE_MODE,
+    explain=1 to add a Grad-CAM explanation (see /explain; ignored by tflite/onnx backends).
+    """
+    try:
+        with registry.use(request.args.get('model')) as version:
+            return predict_with(version)
+    except ModelNotAvailable as e:
+        return model_unavailable(e)
+
+
+def predict_with(version):
+    tta = request.args.get('tta', TTA_MODE)
+    if tta not in TTA_MODES:
+        return jsonify({'error': f"tta must be one of {', '.join(TTA_MODES)}"}), 400
+
+    try:
+        tiles = min(int(request.args.get('tiles', 0)), TILING_MAX_TILES)
+    except ValueError:
+        return jsonify({'error': 'tiles must be an integer'}), 400
+    aggregate = request.args.get('tile_aggregate', TILING_AGGREGATE)
+    if aggregate not in AGGREGATIONS:
+        return jsonify({'error': f"tile_aggregate must be one of {', '.join(AGGREGATIONS)}"}), 400
+    if tiles > 0 and 'tta' in request.args and tta != 'off':
+        return jsonify({'error': 'tta and tiles cannot be combined'}), 400
+    near_duplicate = request.args.get('near_duplicate')
+    if near_duplicate is not None:
+        near_duplicate = near_duplicate.lower() in ('1', 'true', 'yes')
+
+    # Backends without a Keras model answer explain=1 with a plain prediction
+    explain = request.args.get('explain', '0').lower() in ('1', 'true', 'yes') and version.model is not None
+    if explain:
+        if tiles > 0 or ('tta' in request.args and tta != 'off'):
+            return jsonify({'error': 'explain cannot be combined with tta or tiles'}), 400
+        try:
+            class_index, include_overlay = explain_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
     try:
         # Check if image data is provided
-        data = request.get_json()
-        if not data or 'image' not in data:
+        image_data = read_image_payload()
+        if not image_data:
             return jsonify({'error': 'No image data provided'}), 400
 
-        # Decode base64 image
-        image_data = base64.b64decode(data['image'])
-        image = Image.open(io.BytesIO(image_data))
+        # Return the cached result if this exact image was already scored (with the same TTA/tiling mode)
+        if explain:
+            cache, model_id = explanation_cache, explanation_variant(version, class_index, include_overlay)
+        elif tiles > 0:
+            cache, model_id = prediction_cache, f'{version.model_id}:tiles={tiles}:{aggregate}'
+        else:
+            cache = prediction_cache
+            model_id = version.model_id if tta == 'off' else f'{version.model_id}:tta={tta}'
+        key = cache_key(image_data, model_id) if cache else None
+        result = cache.get(key) if key else None
+        if result is not None:
+            g.outcome = 'cached'
+        else:
+            image = open_image(image_data)
 
-        # Make prediction
-        result, error = predict_skin_cancer(image)
+            # Make prediction
+            with admitted():
+                if explain:
+                    with metrics.stage('explain'):
+                        result, error = explain_skin_cancer_batch([image], version, class_index, include_overlay)[0]
+                elif tiles > 0:
+                    result, error = predict_skin_cancer_tiled(image, version, tiles, aggregate)
+                else:
+                    result, error = predict_skin_cancer(image, version, tta,
+                                                        image_key=cache_key(image_data, version.model_id),
+                                                        near_duplicate=near_duplicate)
 
+            if error:
+                return jsonify({'error': error}), 500
+
+            if key:
+                cache.put(key, result)
+
+        shadow = request.args.get('shadow')
+        if shadow:
+            shadow_executor.submit(score_shadow, shadow, version, image_data, result)
+
+        with metrics.stage('response'):
+            response = {
+                'success': True,
+                'prediction': result,
+                'model': f'{version.name}:{version.version}'
+            }
+            if g.get('outcome') == 'cached':
+                response['cached'] = True
+            return jsonify(response)
+
+    except ImageRejected as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Overloaded as e:
+        return overloaded(e)
+    except Exception as e:
+        return jsonify({'error': f'Error processing image: {str(e)}'}), 500
+
+
+def explain_options():
+    """(class index or None for the predicted class, include overlay) from the query string"""
+    name = request.args.get('class')
+    if name is not None and name not in CLASS_NAMES:
+        raise ValueError(f"class must be one of {', '.join(CLASS_NAMES)}")
+    return (CLASS_NAMES.index(name) if name else None), request.args.get('overlay', '1') != '0'
+
+
+def explanation_variant(version, class_index, include_overlay):
+    """Model identity for explanation cache keys"""
+    return f'{version.model_id}:gradcam:{class_index}:{int(include_overlay)}'
+
+
+@app.route('/explain', methods=['POST'])
+def explain():
+    """
+    Predictions with Grad-CAM heatmaps, one forward and backward pass per chunk of images.
+    Accepts the bodies of /predict or /predict_batch. Optional query parameters:
+    model=name[:version], class=Benign|Malignant (default: the predicted class),
+    overlay=0 to return only the uint8 heatmap grid without the PNG overlay.
+    """
+    try:
+        with registry.use(request.args.get('model')) as version:
+            return explain_with(version)
+    except ModelNotAvailable as e:
+        return model_unavailable(e)
+
+
+def explain_with(version):
+    if version.model is None:
+        return jsonify({'error': f'The {version.kind} backend does not support explanations'}), 501
+    try:
+        class_index, include_overlay = explain_options()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        items = read_batch_items()
+        if not items:
+            image_data = read_image_payload()
+            if image_data:
+                items = [('image', image_data, None)]
+        if not items:
+            return jsonify({'error': 'No image data provided'}), 400
+        if len(items) > BATCH_MAX_IMAGES:
+            return jsonify({'error': f'Too many images (max {BATCH_MAX_IMAGES})'}), 400
+
+        with admitted():
+            results = explain_items(items, version, class_index, include_overlay)
+
+        return jsonify({
+            'success': True,
+            'model': f'{version.name}:{version.version}',
+            'count': len(results),
+            'failed': sum(1 for r in results if not r['success']),
+            'results': results
+        })
+
+    except Overloaded as e:
+        return overloaded(e)
+    except Exception as e:
+        return jsonify({'error': f'Error explaining images: {str(e)}'}), 500
+
+
+def explain_items(items, version, class_index=None, include_overlay=True):
+    """Explain (name, raw bytes, error) items; one result dict per item, cached by image content hash"""
+    variant = explanation_variant(version, class_index, include_overlay)
+    results = [None] * len(items)
+    images, positions, keys = [], [], {}
+    for i, (name, image_data, error) in enumerate(items):
+        if error is None:
+            keys[i] = cache_key(image_data, variant)
+            cached = explanation_cache.get(keys[i])
+            if cached is not None:
+                results[i] = {'index': i, 'name': name, 'success': True, 'prediction': cached, 'cached': True}
+                continue
+            try:
+                images.append(open_image(image_data))
+                positions.append(i)
+                continue
+            except Exception as e:
+                error = f'Error processing image: {str(e)}'
+        results[i] = {'index': i, 'name': name, 'success': False, 'error': error}
+
+    with metrics.stage('explain'):
+        outcomes = explain_skin_cancer_batch(images, version, class_index, include_overlay)
+    for i, (result, error) in zip(positions, outcomes):
+        name = items[i][0]
         if error:
-            return jsonify({'error': error}), 500
+            results[i] = {'index': i, 'name': name, 'success': False, 'error': error}
+        else:
+            results[i] = {'index': i, 'name': name, 'success': True, 'prediction': result}
+            explanation_cache.put(keys[i], result)
+    return results
+
+
+@app.route('/similar', methods=['POST'])
+def similar():
+    """
+    Most similar previously scored images by embedding (cosine similarity).
+    Accepts the same bodies as /predict. Optional 'k' (default 5), 'model' and
+    'exact' (1 forces an exact scan on large indexes) query parameters.
+    The query image itself is not added to the index.
+    """
+    try:
+        with registry.use(request.args.get('model')) as version:
+            return similar_with(version)
+    except ModelNotAvailable as e:
+        return model_unavailable(e)
+
+
+def similar_with(version):
+    if not EMBEDDING_INDEX_ENABLED:
+        return jsonify({'error': 'Embedding index is disabled (EMBEDDING_INDEX_ENABLED=0)'}), 404
+    index = embedding_index_for(version)
+    if index is None:
+        return jsonify({'error': f'The {version.kind} backend does not expose embeddings'}), 501
+
+    k = max(1, request.args.get('k', 5, type=int))
+    exact = request.args.get('exact')
+    exact = None if exact is None else exact == '1'
+    try:
+        image_data = read_image_payload()
+        if not image_data:
+            return jsonify({'error': 'No image data provided'}), 400
+        image = open_image(image_data)
+
+        with admitted():
+            with metrics.stage('preprocess'):
+                processed_image = preprocess_image(image, out=preprocessor.buffer(1))
+            with metrics.stage('inference'):
+                embeddings, outputs = version.embed(processed_image)
+            with metrics.stage('similarity_search'):
+                similarities, rows = index.search(embeddings, k=k, exact=exact)
 
+        neighbours = []
+        for similarity, row in zip(similarities[0], rows[0]):
+            key, probabilities = index.entry(row)
+            neighbours.append({'key': key, 'similarity': float(similarity),
+                               'prediction': format_prediction(probabilities)})
         return jsonify({
             'success': True,
-            'prediction': result
+            'model': f'{version.name}:{version.version}',
+            'key': cache_key(image_data, version.model_id),
+            'prediction': format_prediction(outputs[0]),
+            'index_size': len(index),
+            'neighbours': neighbours
         })
 
+    except ImageRejected as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except Overloaded as e:
+        return overloaded(e)
     except Exception as e:
         return jsonify({'error': f'Error processing image: {str(e)}'}), 500
 
 
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """
+    Score many images in one request.
+    Accepts multipart file parts named 'images' and/or a JSON body
+    {"images": ["base64", ...]}. Optional 'chunk_size' and 'model' query parameters.
+    """
+    try:
+        with registry.use(request.args.get('model')) as version:
+            return predict_batch_with(version)
+    except ModelNotAvailable as e:
+        return model_unavailable(e)
+
+
+def read_batch_items():
+    """
+    Collect (name, raw bytes, error) for every image of a batch request:
+    multipart parts named 'images' and/or JSON {"images": ["base64", ...]}.
+    """
+    items = []
+    for file in request.files.getlist('images'):
+        items.append((file.filename, file.read(), None))
+
+    data = request.get_json(silent=True)
+    if data and isinstance(data.get('images'), list):
+        for i, encoded in enumerate(data['images']):
+            try:
+                items.append((f'images[{i}]', base64.b64decode(encoded), None))
+            except Exception as e:
+                items.append((f'images[{i}]', None, f'Invalid base64 data: {str(e)}'))
+    return items
+
+
+def score_items(items, version, chunk_size=BATCH_CHUNK_SIZE):
+    """Score (name, raw bytes, error) items on a model version; one result dict per item"""
+    # Decode images; cached items and items that fail here are not scored
+    results = [None] * len(items)
+    images, positions, keys = [], [], {}
+    for i, (name, image_data, error) in enumerate(items):
+        if error is None and prediction_cache:
+            keys[i] = cache_key(image_data, version.model_id)
+            cached = prediction_cache.get(keys[i])
+            if cached is not None:
+                results[i] = {'index': i, 'name': name, 'success': True, 'prediction': cached, 'cached': True}
+                continue
+        if error is None:
+            try:
+                images.append(open_image(image_data))
+                positions.append(i)
+                continue
+            except Exception as e:
+                error = f'Error processing image: {str(e)}'
+        results[i] = {'index': i, 'name': name, 'success': False, 'error': error}
+
+    for i, (result, error) in zip(positions, predict_skin_cancer_batch(images, chunk_size, version)):
+        name = items[i][0]
+        if error:
+            results[i] = {'index': i, 'name': name, 'success': False, 'error': error}
+        else:
+            results[i] = {'index': i, 'name': name, 'success': True, 'prediction': result}
+            if i in keys:
+                prediction_cache.put(keys[i], result)
+    return results
+
+
+def predict_batch_with(version):
+    try:
+        items = read_batch_items()
+        if not items:
+            return jsonify({'error': 'No image data provided'}), 400
+        if len(items) > BATCH_MAX_IMAGES:
+            return jsonify({'error': f'Too many images (max {BATCH_MAX_IMAGES})'}), 400
+
+        # Capped at the preprocessor buffer size, so a request cannot allocate oversized batches
+        chunk_size = min(max(1, request.args.get('chunk_size', BATCH_CHUNK_SIZE, type=int)), BATCH_CHUNK_SIZE)
+        with admitted():
+            results = score_items(items, version, chunk_size)
+
+        return jsonify({
+            'success': True,
+            'model': f'{version.name}:{version.version}',
+            'count': len(results),
+            'failed': sum(1 for r in results if not r['success']),
+            'results': results
+        })
+
+    except Overloaded as e:
+        return overloaded(e)
+    except Exception as e:
+        return jsonify({'error': f'Error processing batch: {str(e)}'}), 500
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue images for asynchronous scoring and return a job id immediately.
+    Accepts the same bodies as /predict_batch, or a single image as for /predict.
+    Optional 'model' and 'callback_url' (http://localhost/... only) query parameters;
+    the finished job is POSTed to callback_url as JSON.
+    """
+    try:
+        items = read_batch_items()
+        if not items:
+            image_data = read_image_payload()
+            if image_data:
+                items = [('image', image_data, None)]
+    except Exception as e:
+        return jsonify({'error': f'Invalid request body: {str(e)}'}), 400
+
+    if not items:
+        return jsonify({'error': 'No image data provided'}), 400
+    if len(items) > BATCH_MAX_IMAGES:
+        return jsonify({'error': f'Too many images (max {BATCH_MAX_IMAGES})'}), 400
+
+    model = request.args.get('model')
+    name, _ = parse_model_spec(model)
+    if name and registry.status(name) is None:
+        return jsonify({'error': f"Unknown model '{model}'"}), 404
+
+    try:
+        job_id = job_queue.submit(items, model=model, callback_url=request.args.get('callback_url'))
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429, {'Retry-After': '10'}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'job_id': job_id, 'status': 'queued', 'count': len(items)}), 202, \
+        {'Location': f'/jobs/{job_id}'}
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status of a job: queued (with queue_position), running, done (with results) or failed"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
+
 @app.route('/health', methods=['GET'])
 def health():
+    """Liveness: the process is up and serving, whatever the model state"""
+    status = model_status()
     return jsonify({
         'status': 'healthy',
-        'model_loaded': model is not None
+        'model_loaded': status['state'] == 'ready',
+        'model_state': status['state'],
+        'model_error': status['error'],
+        'model_load_seconds': status['load_seconds'],
+        'model_version': status['version'],
+        'backend': status['backend']
     })
 
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness: 200 only once the model can serve predictions"""
+    state = model_status()['state']
+    status_code = 200 if state == 'ready' else 503
+    return jsonify({
+        'ready': status_code == 200,
+        'model_state': state
+    }), status_code
+
+
+def process_stats():
+    """CPU time and memory of this server process (used by benchmarks/load_test.py)"""
+    stats = {
+        'pid': os.getpid(),
+        'cpu_seconds': time.process_time()
+    }
+    try:
+        import resource
+        # ru_maxrss is in kilobytes on Linux
+        stats['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        stats['rss_mb'] = psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    return stats
+
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    active = registry.get(DEFAULT_MODEL_NAME)
+    index = embedding_index_for(active) if active else None
+    return jsonify({
+        'process': process_stats(),
+        'batching': active.batcher.stats() if active else {},
+        'cache': prediction_cache.stats() if prediction_cache else {'enabled': False},
+        'explanation_cache': explanation_cache.stats(),
+        'jobs': job_queue.stats(),
+        'admission': admission.stats(),
+        'embedding_index': index.stats() if index is not None else {'enabled': EMBEDDING_INDEX_ENABLED}
+    })
+
+
+@app.route('/models', methods=['GET'])
+def list_models():
+    models = registry.list()
+    with shadow_lock:
+        models['shadow'] = {}
+        for key, entry in shadow_stats.items():
+            scored = entry['requests'] - entry['errors']
+            models['shadow'][key] = dict(entry,
+                                         agreement_rate=entry['agreements'] / scored if scored else None,
+                                         mean_confidence_delta=entry['confidence_delta'] / scored if scored else None)
+    return jsonify(models)
+
+
+@app.route('/models/load', methods=['POST'])
+def load_model_version():
+    """
+    Load a model version in the background and swap it in once warmed up.
+    Body: {"path": "...", "name": "default", "version": "...", "backend": "keras", "activate": true}
+    """
+    data = request.get_json(silent=True) or {}
+    if not data.get('path'):
+        return jsonify({'error': 'No model path provided'}), 400
+
+    try:
+        path = resolve_model_path(data['path'])
+        entry = registry.load(data.get('name', DEFAULT_MODEL_NAME), path,
+                              kind=data.get('backend', INFERENCE_BACKEND),
+                              version=data.get('version'),
+                              activate=data.get('activate', True))
+    except ModelBudgetExceeded as e:
+        return jsonify({'error': str(e)}), 507
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409 if 'already' in str(e) else 400
+
+    return jsonify(entry.info()), 202
+
+
+@app.route('/models/<name>/activate', methods=['POST'])
+def activate_model_version(name):
+    """Make a loaded version active. Body: {"version": "..."}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        registry.activate(name, data.get('version'))
+    except ModelNotAvailable as e:
+        return jsonify({'error': str(e)}), e.status_code
+    return jsonify(registry.get(name).info())
+
+
+@app.route('/models/<name>/<version>', methods=['DELETE'])
+def unload_model_version(name, version):
+    """Unload an inactive version once its in-flight requests have finished"""
+    try:
+        registry.unload(name, version)
+    except ModelNotAvailable as e:
+        return jsonify({'error': str(e)}), e.status_code
+    return jsonify({'success': True})
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    if metrics.enabled:
+        jobs = job_queue.stats()
+        JOB_QUEUE_DEPTH.set(jobs['queued_images'])
+        JOB_WORKERS_BUSY.set(jobs['busy_workers'])
+        JOB_WORKER_UTILIZATION.set(jobs['worker_utilization'])
+        JOB_WAIT.set(jobs['avg_wait_seconds'])
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+start_model_loading()
+
+
 if __name__ == '__main__':
     print("Starting Flask API server...")
-    print("Model loaded:", model is not None)
-    app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
+    print("Model state:", model_status()['state'])
+    print("Development server only - use serve.py for production")
+    job_queue.start()
+    # The reloader would start a second process and load the model twice
+    app.run(debug=True, use_reloader=False, host='127.0.0.1', port=5000)
\ No newline at end of file
@@ -0,0 +1,127 @@
+# gradcam.py
+"""
+Grad-CAM explanations for the Keras model.
+
+GradCAM builds one sub-model that returns both the last MobileNetV2 conv
+activations and the model output, so a whole batch is explained with a
+single forward pass and one GradientTape backward pass: the target class
+scores of all images are summed and differentiated together (each image's
+score only depends on its own activations, so per-image gradients come out
+of the one pass).
+
+Works for a flat functional model and for the usual transfer-learning
+layout where MobileNetV2 is nested as one layer of the outer model (the
+outer layers are then applied around the nested base).
+
+Heatmaps are returned as float32 in [0, 1] at the conv resolution (7x7 for
+224x224 inputs); overlay() and to_png() turn them into compact uint8 / PNG
+images for the API and the GUI.
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+
+def _is_feature_map(layer):
+    try:
+        return len(layer.output.shape) == 4
+    except (AttributeError, ValueError, TypeError):
+        return False
+
+
+def find_conv_layer(model):
+    """
+    Locate the last 4-D (conv feature map) layer.
+    Returns (nested base layer or None, index of the base in model.layers, conv layer name).
+    """
+    for index in range(len(model.layers) - 1, -1, -1):
+        layer = model.layers[index]
+        if hasattr(layer, 'layers') and layer.layers:
+            for inner in reversed(layer.layers):
+                if _is_feature_map(inner):
+                    return layer, index, inner.name
+        elif _is_feature_map(layer):
+            return None, None, layer.name
+    raise ValueError('Model has no convolutional feature map to explain')
+
+
+class GradCAM:
+    def __init__(self, model, layer_name=None):
+        import tensorflow as tf
+
+        self.model = model
+        base, base_index, conv_name = find_conv_layer(model)
+        self.layer_name = layer_name or conv_name
+
+        if base is None:
+            grad_model = tf.keras.Model(model.inputs, [model.get_layer(self.layer_name).output, model.outputs[0]])
+
+            def forward(x):
+                conv, probabilities = grad_model(x, training=False)
+                return conv, probabilities
+        else:
+            # Nested base: expose its conv output, then run the outer layers around it
+            inner = tf.keras.Model(base.inputs, [base.get_layer(self.layer_name).output, base.output])
+            before = [layer for layer in model.layers[:base_index]
+                      if not isinstance(layer, tf.keras.layers.InputLayer)]
+            after = model.layers[base_index + 1:]
+
+            def forward(x):
+                for layer in before:
+                    x = layer(x, training=False)
+                conv, x = inner(x, training=False)
+                for layer in after:
+                    x = layer(x, training=False)
+                return conv, x
+
+        def compute(batch, class_indices):
+            with tf.GradientTape() as tape:
+                conv, probabilities = forward(batch)
+                # -1 means "explain the predicted class"
+                predicted = tf.argmax(probabilities, axis=1, output_type=tf.int32)
+                targets = tf.where(class_indices < 0, predicted, class_indices)
+                scores = tf.gather(probabilities, targets, axis=1, batch_dims=1)
+            gradients = tape.gradient(scores, conv)
+
+            weights = tf.reduce_mean(gradients, axis=(1, 2))
+            cams = tf.nn.relu(tf.einsum('bhwc,bc->bhw', conv, weights))
+            cams = cams / (tf.reduce_max(cams, axis=(1, 2), keepdims=True) + 1e-8)
+            return cams, probabilities, targets
+
+        self._compute = tf.function(compute, reduce_retracing=True)
+
+    def compute(self, batch, class_indices=None):
+        """
+        Grad-CAM for a float32 (n, 224, 224, 3) batch scaled to [0, 1].
+        class_indices: class to explain per image (default: the predicted class).
+        Returns (heatmaps (n, h, w) in [0, 1], probabilities (n, classes), explained class indices).
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        if class_indices is None:
+            class_indices = np.full(len(batch), -1, dtype=np.int32)
+        class_indices = np.broadcast_to(np.asarray(class_indices, dtype=np.int32), (len(batch),))
+        cams, probabilities, targets = self._compute(batch, class_indices)
+        return cams.numpy(), probabilities.numpy(), targets.numpy()
+
+
+def colorize(heatmap, size):
+    """Jet-colormapped uint8 RGB image of a [0, 1] heatmap, bilinearly upsampled to size (width, height)"""
+    levels = Image.fromarray(np.uint8(np.clip(heatmap, 0.0, 1.0) * 255)).resize(size, Image.BILINEAR)
+    x = np.asarray(levels, dtype=np.float32)[..., None] / 255.0
+    rgb = np.clip(1.5 - np.abs(4.0 * x - np.array([3.0, 2.0, 1.0], dtype=np.float32)), 0.0, 1.0)
+    return np.uint8(rgb * 255)
+
+
+def overlay(image, heatmap, alpha=0.45):
+    """Blend a heatmap over a uint8 (H, W, 3) image"""
+    image = np.asarray(image, dtype=np.float32)
+    colors = colorize(heatmap, (image.shape[1], image.shape[0])).astype(np.float32)
+    return np.uint8(np.clip((1.0 - alpha) * image + alpha * colors, 0, 255))
+
+
+def to_png(array):
+    """Encode a uint8 image array as PNG bytes"""
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format='PNG')
+    return buffer.getvalue()
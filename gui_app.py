@@ -3,10 +3,95 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 import requests
-import base64
-import io
 import threading
-import json
+import mimetypes
+import hashlib
+import os
+import csv
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from api_client import SkinCancerAPIClient
+
+# Size of the image preview in the left panel
+DISPLAY_SIZE = (300, 300)
+
+# Previews and analysis results kept in memory for re-selected images
+THUMBNAIL_CACHE_SIZE = 32
+RESULT_CACHE_SIZE = 256
+
+# Batch mode: requests in flight at once (also the size of the HTTP connection pool)
+BATCH_CONCURRENCY = 4
+
+# GUI_DOWNSCALE_UPLOADS=1 resizes images to the model input size before upload (much smaller
+# requests); off by default so the server's resize, TTA and tiling paths see the original file
+DOWNSCALE_UPLOADS = os.environ.get('GUI_DOWNSCALE_UPLOADS', '0') == '1'
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used cache"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+
+def load_preview(file_path, size=DISPLAY_SIZE):
+    """
+    Decode a small preview of an image (runs off the Tk thread).
+    JPEG draft mode lets the decoder downscale while decoding, so large files
+    are never decoded at full resolution just to show a thumbnail.
+    Returns (thumbnail, file size in bytes, original dimensions).
+    """
+    file_size = os.stat(file_path).st_size
+    with Image.open(file_path) as image:
+        dimensions = image.size
+        if image.format == 'JPEG':
+            image.draft('RGB', size)
+        thumbnail = image.convert('RGB') if image.mode not in ('RGB', 'RGBA', 'L') else image.copy()
+    thumbnail.thumbnail(size, Image.Resampling.LANCZOS)
+    return thumbnail, file_size, dimensions
+
+
+def file_digest(data):
+    """Content hash identifying an image file for the result cache"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def assess_risk(predicted_class, confidence):
+    """Return (risk level, recommendation, severity) with severity 'danger', 'warning' or 'success'"""
+    if predicted_class.lower() == 'malignant':
+        if confidence >= 0.8:
+            return "HIGH RISK", "⚠️ URGENT: Consult a dermatologist immediately", 'danger'
+        elif confidence >= 0.6:
+            return "MODERATE RISK", "⚠️ Recommended: Schedule dermatologist consultation", 'warning'
+        else:
+            return "LOW-MODERATE RISK", "Consider dermatologist consultation for confirmation", 'warning'
+    else:  # Benign
+        if confidence >= 0.8:
+            return "LOW RISK", "✓ Likely benign, but monitor for changes", 'success'
+        elif confidence >= 0.6:
+            return "UNCERTAIN", "Consider professional evaluation for peace of mind", 'warning'
+        else:
+            return "UNCERTAIN", "Professional evaluation recommended", 'warning'
 
 
 class SkinCancerDetectionGUI:
@@ -19,9 +104,20 @@ class SkinCancerDetectionGUI:
         # API Configuration
         self.api_url = "http://127.0.0.1:5000"
 
+        # Keep-alive connections shared by all requests (sized for batch mode), retries on 503
+        self.client = SkinCancerAPIClient(self.api_url, pool_maxsize=BATCH_CONCURRENCY,
+                                          downscale=DOWNSCALE_UPLOADS)
+
         # Variables
-        self.current_image = None
         self.current_image_path = None
+        self.load_generation = 0  # ignores previews of images that were replaced while loading
+        self.current_thumbnail = None
+        self.current_overlay = None  # Grad-CAM overlay of the current image, once analyzed
+        self.show_heatmap = tk.BooleanVar(value=False)  # opt-in: explain=1 adds a Grad-CAM gradient pass
+
+        # Caches: previews by (path, size, mtime), predictions by file content hash
+        self.thumbnail_cache = LRUCache(THUMBNAIL_CACHE_SIZE)
+        self.result_cache = LRUCache(RESULT_CACHE_SIZE)
 
         # Configure style
         self.style = ttk.Style()
@@ -69,7 +165,14 @@ class SkinCancerDetectionGUI:
                                     command=self.upload_image, font=("Arial", 12, "bold"),
                                     bg=self.secondary_color, fg="white", relief="flat",
                                     padx=20, pady=10, cursor="hand2")
-        self.upload_btn.pack(pady=(0, 15))
+        self.upload_btn.pack(pady=(0, 5))
+
+        # Batch mode
+        self.batch_btn = tk.Button(left_frame, text="🗂️ Analyze Multiple Images",
+                                   command=self.open_batch_window, font=("Arial", 10),
+                                   bg=self.primary_color, fg="white", relief="flat",
+                                   padx=10, pady=5, cursor="hand2")
+        self.batch_btn.pack(pady=(0, 15))
 
         # Image display area
         self.image_frame = tk.Frame(left_frame, bg="white", relief="sunken", bd=2)
@@ -85,6 +188,12 @@ class SkinCancerDetectionGUI:
                                         bg=self.bg_color, fg="#7f8c8d")
         self.file_info_label.pack(pady=(10, 0))
 
+        # Grad-CAM overlay: where the model looked
+        self.heatmap_check = tk.Checkbutton(left_frame, text="Show attention heatmap (Grad-CAM)",
+                                            variable=self.show_heatmap, command=self._refresh_image,
+                                            font=("Arial", 9), bg=self.bg_color)
+        self.heatmap_check.pack(pady=(5, 0))
+
         # Right panel - Analysis and results
         right_frame = ttk.LabelFrame(main_frame, text="Analysis & Results", padding="15")
         right_frame.grid(row=2, column=1, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(10, 0))
@@ -147,23 +256,27 @@ class SkinCancerDetectionGUI:
 
         def check():
             try:
-                response = requests.get(f"{self.api_url}/health", timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('model_loaded', False):
-                        self.api_status_label.config(text="🟢 API Status: Connected & Model Loaded",
-                                                     fg=self.success_color)
-                    else:
-                        self.api_status_label.config(text="🟡 API Status: Connected but Model Not Loaded",
-                                                     fg=self.warning_color)
+                data = self.client.health()
+                if data.get('model_loaded', False):
+                    self._set_api_status("🟢 API Status: Connected & Model Loaded", self.success_color)
+                elif data.get('model_state') == 'loading':
+                    self._set_api_status("🟡 API Status: Connected, Model Loading...", self.warning_color)
+                    # Check again once the model had time to load
+                    self.root.after(2000, self.check_api_connection)
                 else:
-                    self.api_status_label.config(text="🔴 API Status: Connection Error", fg=self.danger_color)
+                    self._set_api_status("🟡 API Status: Connected but Model Not Loaded", self.warning_color)
+            except requests.exceptions.HTTPError:
+                self._set_api_status("🔴 API Status: Connection Error", self.danger_color)
             except Exception as e:
-                self.api_status_label.config(text="🔴 API Status: Server Unavailable", fg=self.danger_color)
+                self._set_api_status("🔴 API Status: Server Unavailable", self.danger_color)
 
         # Run check in background thread
         threading.Thread(target=check, daemon=True).start()
 
+    def _set_api_status(self, text, color):
+        """Update the API status label from any thread (Tk widgets are only touched on the main thread)"""
+        self.root.after(0, lambda: self.api_status_label.config(text=text, fg=color))
+
     def upload_image(self):
         """Handle image upload"""
         file_types = [
@@ -179,80 +292,150 @@ class SkinCancerDetectionGUI:
         )
 
         if file_path:
-            try:
-                # Load and display image
-                image = Image.open(file_path)
-                self.current_image = image
-                self.current_image_path = file_path
+            self.current_image_path = None
+            self.analyze_btn.config(state="disabled")
+            self.status_label.config(text="Loading image...")
+            self.load_generation += 1
 
-                # Display image in GUI
-                self.display_image(image)
+            # Decode, thumbnail and stat in a background thread
+            threading.Thread(target=self._load_image, args=(file_path, self.load_generation), daemon=True).start()
 
-                # Update file info
-                file_size = len(open(file_path, 'rb').read())
-                file_size_mb = file_size / (1024 * 1024)
-                self.file_info_label.config(
-                    text=f"File: {file_path.split('/')[-1]} | Size: {file_size_mb:.2f} MB | Dimensions: {image.size}")
+    def _load_image(self, file_path, generation):
+        """Load the preview (runs in background thread)"""
+        try:
+            stat = os.stat(file_path)
+            key = (file_path, stat.st_size, stat.st_mtime_ns)
+            preview = self.thumbnail_cache.get(key)
+            if preview is None:
+                preview = load_preview(file_path)
+                self.thumbnail_cache.put(key, preview)
+            self.root.after(0, lambda: self._show_loaded_image(file_path, preview, generation))
+        except Exception as e:
+            # Bind the message now: `e` is cleared when the except block ends, before the callback runs
+            message = str(e)
+            self.root.after(0, lambda: self._show_load_error(message, generation))
 
-                # Enable analyze button
-                self.analyze_btn.config(state="normal")
-                self.status_label.config(text="Image loaded successfully. Ready to analyze.")
+    def _show_loaded_image(self, file_path, preview, generation):
+        """Show a loaded preview (runs on the Tk thread)"""
+        if generation != self.load_generation:
+            return
+        thumbnail, file_size, dimensions = preview
+        self.current_image_path = file_path
+        self.current_thumbnail = thumbnail
+        self.current_overlay = None
 
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load image: {str(e)}")
+        # Display image in GUI
+        self.display_image(thumbnail)
 
-    def display_image(self, image):
-        """Display image in the GUI"""
-        # Calculate display size (maintain aspect ratio)
-        display_size = (300, 300)
-        image_copy = image.copy()
-        image_copy.thumbnail(display_size, Image.Resampling.LANCZOS)
+        # Update file info
+        file_size_mb = file_size / (1024 * 1024)
+        self.file_info_label.config(
+            text=f"File: {os.path.basename(file_path)} | Size: {file_size_mb:.2f} MB | Dimensions: {dimensions}")
+
+        # Enable analyze button
+        self.analyze_btn.config(state="normal")
+        self.status_label.config(text="Image loaded successfully. Ready to analyze.")
 
+    def _show_load_error(self, error_message, generation):
+        if generation != self.load_generation:
+            return
+        self.status_label.config(text="Ready to analyze")
+        messagebox.showerror("Error", f"Failed to load image: {error_message}")
+
+    def display_image(self, thumbnail):
+        """Display an already thumbnailed image in the GUI"""
         # Convert to PhotoImage
-        photo = ImageTk.PhotoImage(image_copy)
+        photo = ImageTk.PhotoImage(thumbnail)
 
         # Update label
         self.image_label.config(image=photo, text="")
         self.image_label.image = photo  # Keep a reference
 
+    def _refresh_image(self):
+        """Show the Grad-CAM overlay or the plain preview, depending on the checkbox"""
+        if self.show_heatmap.get() and self.current_overlay is not None:
+            self.display_image(self.current_overlay)
+        elif self.current_thumbnail is not None:
+            self.display_image(self.current_thumbnail)
+
     def analyze_image(self):
         """Send image to API for analysis"""
-        if not self.current_image:
+        if not self.current_image_path:
             messagebox.showwarning("Warning", "Please select an image first.")
             return
 
-        # Start analysis in background thread
-        threading.Thread(target=self._perform_analysis, daemon=True).start()
+        # Start analysis in background thread (Tk variables are read here, on the Tk thread)
+        threading.Thread(target=self._perform_analysis, args=(self.current_image_path, self.show_heatmap.get()),
+                         daemon=True).start()
 
-    def _perform_analysis(self):
+    def _perform_analysis(self, file_path, explain=False):
         """Perform the actual analysis (runs in background thread)"""
         try:
             # Update UI
             self.root.after(0, self._update_ui_analyzing)
 
-            # Convert image to base64
-            buffered = io.BytesIO()
-            self.current_image.save(buffered, format="JPEG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
+            with open(file_path, 'rb') as f:
+                image_bytes = f.read()
 
-            # Send to API
-            payload = {"image": img_str}
-            response = requests.post(f"{self.api_url}/predict", json=payload, timeout=30)
+            # An image with the same content was already scored by this server
+            cached = self.result_cache.get((self.api_url, file_digest(image_bytes), explain)) is not None
 
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success'):
-                    self.root.after(0, lambda: self._display_results(result['prediction']))
-                else:
-                    self.root.after(0, lambda: self._display_error(result.get('error', 'Unknown error')))
-            else:
-                error_msg = response.json().get('error', 'Server error') if response.content else 'Server unavailable'
-                self.root.after(0, lambda: self._display_error(error_msg))
+            prediction, error = self.predict_file(file_path, image_bytes, explain=explain)
+            if error:
+                self.root.after(0, lambda: self._display_error(error))
+                return
+
+            # Decode the overlay here rather than on the Tk thread
+            overlay = self.client.overlay_image(prediction)
+            if overlay is not None:
+                overlay = overlay.convert('RGB').resize(DISPLAY_SIZE, Image.BILINEAR)
+            self.root.after(0, lambda: self._display_results(prediction, cached=cached, overlay=overlay,
+                                                             file_path=file_path))
 
         except requests.exceptions.RequestException as e:
-            self.root.after(0, lambda: self._display_error(f"Connection error: {str(e)}"))
+            message = f"Connection error: {str(e)}"
+            self.root.after(0, lambda: self._display_error(message))
         except Exception as e:
-            self.root.after(0, lambda: self._display_error(f"Analysis error: {str(e)}"))
+            message = f"Analysis error: {str(e)}"
+            self.root.after(0, lambda: self._display_error(message))
+
+    def predict_file(self, file_path, image_bytes=None, explain=False):
+        """
+        Score one image file (safe to call from worker threads).
+        Returns (prediction, error); results are cached by file content.
+        explain=True also requests the Grad-CAM explanation.
+        Raises requests exceptions on connection errors.
+        """
+        if image_bytes is None:
+            with open(file_path, 'rb') as f:
+                image_bytes = f.read()
+        cache_key = (self.api_url, file_digest(image_bytes), explain)
+        prediction = self.result_cache.get(cache_key)
+        if prediction is not None:
+            return prediction, None
+
+        content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        prediction, error = self.client.predict_bytes(image_bytes, content_type, explain=explain)
+        if prediction is not None:
+            self.result_cache.put(cache_key, prediction)
+        return prediction, error
+
+    def open_batch_window(self):
+        """Select several images or a folder and analyze them all"""
+        file_paths = filedialog.askopenfilenames(
+            title="Select images (Cancel to choose a folder instead)",
+            filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp *.gif"), ("All files", "*.*")])
+        if not file_paths:
+            folder = filedialog.askdirectory(title="Select a folder of images")
+            if not folder:
+                return
+            file_paths = [os.path.join(dirpath, name)
+                          for dirpath, _, names in sorted(os.walk(folder))
+                          for name in sorted(names) if name.lower().endswith(IMAGE_EXTENSIONS)]
+        if not file_paths:
+            messagebox.showinfo("Batch Analysis", "No images found.")
+            return
+        BatchAnalysisWindow(self, list(file_paths))
 
     def _update_ui_analyzing(self):
         """Update UI to show analysis in progress"""
@@ -266,11 +449,17 @@ class SkinCancerDetectionGUI:
         self.main_prediction_label.config(text="")
         self.confidence_label.config(text="")
 
-    def _display_results(self, prediction):
+    def _display_results(self, prediction, cached=False, overlay=None, file_path=None):
         """Display analysis results"""
+        # Show the heatmap only if the analyzed image is still the one on screen
+        if overlay is not None and file_path == self.current_image_path:
+            self.current_overlay = overlay
+            self._refresh_image()
+
         self.progress.stop()
         self.analyze_btn.config(state="normal")
-        self.status_label.config(text="Analysis completed successfully.")
+        self.status_label.config(text="Analysis completed successfully." +
+                                 (" (cached result)" if cached else ""))
 
         # Main prediction
         predicted_class = prediction['predicted_class']
@@ -279,32 +468,8 @@ class SkinCancerDetectionGUI:
         self.main_prediction_label.config(text=f"Prediction: {predicted_class}")
 
         # Set confidence color and risk level based on prediction
-        if predicted_class.lower() == 'malignant':
-            if confidence >= 0.8:
-                confidence_color = self.danger_color
-                risk_level = "HIGH RISK"
-                recommendation = "⚠️ URGENT: Consult a dermatologist immediately"
-            elif confidence >= 0.6:
-                confidence_color = self.warning_color
-                risk_level = "MODERATE RISK"
-                recommendation = "⚠️ Recommended: Schedule dermatologist consultation"
-            else:
-                confidence_color = self.warning_color
-                risk_level = "LOW-MODERATE RISK"
-                recommendation = "Consider dermatologist consultation for confirmation"
-        else:  # Benign
-            if confidence >= 0.8:
-                confidence_color = self.success_color
-                risk_level = "LOW RISK"
-                recommendation = "✓ Likely benign, but monitor for changes"
-            elif confidence >= 0.6:
-                confidence_color = self.warning_color
-                risk_level = "UNCERTAIN"
-                recommendation = "Consider professional evaluation for peace of mind"
-            else:
-                confidence_color = self.warning_color
-                risk_level = "UNCERTAIN"
-                recommendation = "Professional evaluation recommended"
+        risk_level, recommendation, severity = assess_risk(predicted_class, confidence)
+        confidence_color = self.severity_color(severity)
 
         self.confidence_label.config(text=f"Confidence: {confidence:.1%} | Risk Level: {risk_level}",
                                      fg=confidence_color)
@@ -357,6 +522,10 @@ class SkinCancerDetectionGUI:
                                       wraplength=450, justify="left")
                 desc_label.grid(row=i + 4, column=0, sticky="ew", padx=(20, 0), pady=(0, 5))
 
+    def severity_color(self, severity):
+        return {'danger': self.danger_color, 'warning': self.warning_color,
+                'success': self.success_color}[severity]
+
     def _display_error(self, error_message):
         """Display error message"""
         self.progress.stop()
@@ -366,6 +535,150 @@ class SkinCancerDetectionGUI:
         messagebox.showerror("Analysis Error", f"Failed to analyze image:\n{error_message}")
 
 
+class BatchAnalysisWindow:
+    """
+    Scores a list of images with BATCH_CONCURRENCY requests in flight over the
+    GUI's pooled session, filling a sortable results table as they finish.
+    """
+
+    COLUMNS = (('file', "File", 260), ('prediction', "Prediction", 100), ('confidence', "Confidence", 90),
+               ('risk', "Risk Level", 140), ('status', "Status", 160))
+
+    def __init__(self, gui, file_paths):
+        self.gui = gui
+        self.file_paths = file_paths
+        self.results = {}  # file path -> (prediction, error)
+        self.rows = {}  # file path -> tree item id
+        self.sort_reverse = {}
+        self.cancelled = False
+        self.done = 0
+        self.start_time = time.perf_counter()
+
+        self.window = tk.Toplevel(gui.root)
+        self.window.title(f"Batch Analysis - {len(file_paths)} images")
+        self.window.geometry("820x520")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.window.columnconfigure(0, weight=1)
+        self.window.rowconfigure(1, weight=1)
+
+        top = ttk.Frame(self.window, padding="10")
+        top.grid(row=0, column=0, sticky="ew")
+        top.columnconfigure(0, weight=1)
+        self.progress = ttk.Progressbar(top, mode='determinate', maximum=len(file_paths))
+        self.progress.grid(row=0, column=0, sticky="ew")
+        self.progress_label = tk.Label(top, text=f"0 / {len(file_paths)}", font=("Arial", 10))
+        self.progress_label.grid(row=0, column=1, padx=(10, 0))
+        self.cancel_btn = ttk.Button(top, text="Cancel", command=self.cancel)
+        self.cancel_btn.grid(row=0, column=2, padx=(10, 0))
+        self.export_btn = ttk.Button(top, text="Export CSV", command=self.export_csv, state="disabled")
+        self.export_btn.grid(row=0, column=3, padx=(10, 0))
+
+        table = ttk.Frame(self.window, padding=(10, 0, 10, 10))
+        table.grid(row=1, column=0, sticky="nsew")
+        table.columnconfigure(0, weight=1)
+        table.rowconfigure(0, weight=1)
+        self.tree = ttk.Treeview(table, columns=[c for c, _, _ in self.COLUMNS], show='headings')
+        for column, heading, width in self.COLUMNS:
+            self.tree.heading(column, text=heading, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, anchor="w")
+        scrollbar = ttk.Scrollbar(table, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        for severity in ('danger', 'warning', 'success'):
+            self.tree.tag_configure(severity, foreground=gui.severity_color(severity))
+
+        for path in file_paths:
+            self.rows[path] = self.tree.insert('', 'end', values=(os.path.basename(path), '', '', '', 'Queued'))
+
+        # The executor bounds the number of requests in flight; the rest stay queued
+        self.executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='batch')
+        for path in file_paths:
+            self.executor.submit(self._analyze, path)
+
+    def _analyze(self, path):
+        """Score one image (runs in a worker thread)"""
+        if self.cancelled:
+            return
+        try:
+            prediction, error = self.gui.predict_file(path)
+        except requests.exceptions.RequestException as e:
+            prediction, error = None, f"Connection error: {str(e)}"
+        except Exception as e:
+            prediction, error = None, str(e)
+        self.gui.root.after(0, lambda: self._show_result(path, prediction, error))
+
+    def _show_result(self, path, prediction, error):
+        """Fill in one table row (runs on the Tk thread)"""
+        if not self.window.winfo_exists():
+            return
+        self.results[path] = (prediction, error)
+        self.done += 1
+        name = os.path.basename(path)
+        if error:
+            self.tree.item(self.rows[path], values=(name, '', '', '', f"Error: {error}"), tags=('danger',))
+        else:
+            risk_level, _, severity = assess_risk(prediction['predicted_class'], prediction['confidence'])
+            self.tree.item(self.rows[path], values=(name, prediction['predicted_class'],
+                                                    f"{prediction['confidence']:.1%}", risk_level, "Done"),
+                           tags=(severity,))
+
+        elapsed = time.perf_counter() - self.start_time
+        self.progress['value'] = self.done
+        self.progress_label.config(text=f"{self.done} / {len(self.file_paths)} | {self.done / elapsed:.1f} images/s")
+        if self.done == len(self.file_paths):
+            self.cancel_btn.config(state="disabled")
+        self.export_btn.config(state="normal")
+
+    def sort_by(self, column):
+        """Sort the table by a column; clicking the same heading again reverses the order"""
+        reverse = self.sort_reverse.get(column, False)
+        index = [c for c, _, _ in self.COLUMNS].index(column)
+
+        def key(item):
+            value = self.tree.item(item, 'values')[index]
+            if column == 'confidence':
+                return float(value.rstrip('%')) if value else -1.0
+            return str(value)
+
+        for position, item in enumerate(sorted(self.tree.get_children(''), key=key, reverse=reverse)):
+            self.tree.move(item, '', position)
+        self.sort_reverse[column] = not reverse
+
+    def export_csv(self):
+        file_path = filedialog.asksaveasfilename(parent=self.window, defaultextension=".csv",
+                                                 filetypes=[("CSV files", "*.csv")], title="Export results")
+        if not file_path:
+            return
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['path', 'predicted_class', 'confidence', 'risk_level', 'error'])
+            for path in self.file_paths:
+                if path not in self.results:
+                    continue
+                prediction, error = self.results[path]
+                if error:
+                    writer.writerow([path, '', '', '', error])
+                else:
+                    risk_level, _, _ = assess_risk(prediction['predicted_class'], prediction['confidence'])
+                    writer.writerow([path, prediction['predicted_class'], f"{prediction['confidence']:.4f}",
+                                     risk_level, ''])
+        messagebox.showinfo("Export", f"Saved {len(self.results)} results to {file_path}", parent=self.window)
+
+    def cancel(self):
+        """Stop sending queued images; requests already in flight still finish"""
+        self.cancelled = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.cancel_btn.config(state="disabled")
+        for path, item in self.rows.items():
+            if path not in self.results:
+                self.tree.set(item, 'status', "Cancelled")
+
+    def close(self):
+        self.cancel()
+        self.window.destroy()
+
+
 def main():
     root = tk.Tk()
     app = SkinCancerDetectionGUI(root)
@@ -0,0 +1,249 @@
+# inference_backends.py
+"""
+Pluggable inference backends behind predict_skin_cancer().
+
+Every backend takes a float32 batch of shape (N, 224, 224, 3) scaled to
+[0, 1] and returns an (N, num_classes) array of probabilities.
+
+    keras   tf.keras model loaded from the .h5 checkpoint (reference), called
+            through tf.function graphs traced for fixed batch-size buckets
+    tflite  TFLite model (XNNPACK CPU delegate), see convert_model.py
+    onnx    ONNX Runtime CPU session, see convert_model.py
+"""
+import os
+import threading
+
+import numpy as np
+
+BACKENDS = ('keras', 'tflite', 'onnx')
+
+# Batch sizes the Keras forward pass is compiled for; batches are padded up to the next bucket
+DEFAULT_BUCKETS = (1, 4, 8, 16, 32)
+
+
+def configure_tensorflow_threads(intra_op_threads=None, inter_op_threads=None):
+    """
+    Set TensorFlow's CPU thread pools. Only effective before the TF runtime
+    has been initialized, i.e. before the first model is loaded.
+    """
+    import tensorflow as tf
+
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        print(f"Could not set TensorFlow thread counts: {e}")
+
+
+class KerasBackend:
+    name = 'keras'
+
+    def __init__(self, model_path, num_threads=None, inter_op_threads=None, buckets=DEFAULT_BUCKETS):
+        import tensorflow as tf
+
+        configure_tensorflow_threads(num_threads, inter_op_threads)
+
+        self.model_path = model_path
+        self.model = tf.keras.models.load_model(model_path)
+        self._embedder = None
+        self._embed_forward = {}
+        self._embedder_lock = threading.Lock()
+        self.buckets = tuple(sorted(set(int(b) for b in buckets or ())))
+
+        # One compiled forward pass per bucket, so calls never retrace or go through model.predict()
+        input_shape = tuple(self.model.input_shape[1:])
+        self._forward = {}
+        for size in self.buckets:
+            signature = [tf.TensorSpec((size,) + input_shape, tf.float32)]
+            self._forward[size] = tf.function(self._call, input_signature=signature)
+
+    def _call(self, batch):
+        return self.model(batch, training=False)
+
+    @property
+    def input_shape(self):
+        return tuple(self.model.input_shape)
+
+    def weights_bytes(self):
+        """Memory held by the model weights"""
+        # Variable.dtype is a tf.DType in Keras 2 and a plain string in Keras 3
+        return sum(int(np.prod(w.shape)) * np.dtype(getattr(w.dtype, 'name', w.dtype)).itemsize
+                   for w in self.model.weights)
+
+    def _bucket_for(self, n):
+        for size in self.buckets:
+            if size >= n:
+                return size
+        return None
+
+    def _pad_to_bucket(self, batch):
+        """Zero-pad a batch up to the smallest bucket that holds it; returns (batch, bucket size)"""
+        n = batch.shape[0]
+        size = self._bucket_for(n)
+        if size != n:
+            padded = np.zeros((size,) + batch.shape[1:], dtype=np.float32)
+            padded[:n] = batch
+            batch = padded
+        return batch, size
+
+    def _predict_bucketed(self, batch):
+        padded, size = self._pad_to_bucket(batch)
+        return self._forward[size](padded).numpy()[:batch.shape[0]]
+
+    def predict(self, batch):
+        if not self.buckets:
+            return self.model.predict(batch, verbose=0)
+
+        batch = np.asarray(batch, dtype=np.float32)
+        largest = self.buckets[-1]
+        if batch.shape[0] <= largest:
+            return self._predict_bucketed(batch)
+
+        # Larger batches run as full chunks of the largest bucket
+        return np.concatenate([self._predict_bucketed(batch[i:i + largest])
+                               for i in range(0, batch.shape[0], largest)])
+
+    def _build_embedder(self):
+        import tensorflow as tf
+
+        with self._embedder_lock:
+            if self._embedder is not None:
+                return
+            head = self.model.layers[-1]
+            embedder = tf.keras.Model(self.model.inputs, [head.input, self.model.outputs[0]])
+            # Compiled per bucket like the plain forward pass; each traces on first use
+            input_shape = tuple(self.model.input_shape[1:])
+            for size in self.buckets:
+                signature = [tf.TensorSpec((size,) + input_shape, tf.float32)]
+                self._embed_forward[size] = tf.function(lambda x, m=embedder: m(x, training=False),
+                                                        input_signature=signature)
+            self._embedder = embedder
+
+    def _embed_bucketed(self, batch):
+        padded, size = self._pad_to_bucket(batch)
+        embeddings, probabilities = self._embed_forward[size](padded)
+        n = batch.shape[0]
+        return embeddings.numpy().reshape(size, -1)[:n], probabilities.numpy()[:n]
+
+    def embed(self, batch):
+        """
+        (embeddings, probabilities) from one forward pass. The embedding is the
+        input of the final classification layer (pooled MobileNetV2 features).
+        """
+        if self._embedder is None:
+            self._build_embedder()
+
+        batch = np.asarray(batch, dtype=np.float32)
+        if not self.buckets:
+            embeddings, probabilities = self._embedder(batch, training=False)
+            return np.asarray(embeddings).reshape(len(batch), -1), np.asarray(probabilities)
+
+        largest = self.buckets[-1]
+        chunks = [self._embed_bucketed(batch[i:i + largest]) for i in range(0, batch.shape[0], largest)]
+        return np.concatenate([e for e, _ in chunks]), np.concatenate([p for _, p in chunks])
+
+    @property
+    def embedding_dim(self):
+        return int(np.prod(self.model.layers[-1].input.shape[1:]))
+
+    def warmup(self):
+        """Trace every bucket up front so the first real request doesn't pay tracing cost"""
+        input_shape = tuple(self.model.input_shape[1:])
+        for size in self.buckets:
+            self._forward[size](np.zeros((size,) + input_shape, dtype=np.float32))
+        if not self.buckets:
+            self.model.predict(np.zeros((1,) + input_shape, dtype=np.float32), verbose=0)
+
+
+class TFLiteBackend:
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None, **kwargs):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.model_path = model_path
+        self.model = None
+        # XNNPACK is applied by default to float32/float16/dynamic-range models on CPU
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # The interpreter is not thread-safe
+        self._lock = threading.Lock()
+
+    @property
+    def input_shape(self):
+        return (None,) + tuple(int(d) for d in self._input['shape'][1:])
+
+    def weights_bytes(self):
+        return os.path.getsize(self.model_path)
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input['index'], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self._input['index'], batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output['index']).copy()
+
+    def warmup(self):
+        self.predict(np.zeros((1,) + self.input_shape[1:], dtype=np.float32))
+
+
+class OnnxBackend:
+    name = 'onnx'
+
+    def __init__(self, model_path, num_threads=None, inter_op_threads=None, **kwargs):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+
+        self.model_path = model_path
+        self.model = None
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        self._input = self.session.get_inputs()[0]
+
+    @property
+    def input_shape(self):
+        return (None,) + tuple(self._input.shape[1:])
+
+    def weights_bytes(self):
+        return os.path.getsize(self.model_path)
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input.name: batch})[0]
+
+    def warmup(self):
+        shape = tuple(d if isinstance(d, int) else 224 for d in self.input_shape[1:])
+        self.predict(np.zeros((1,) + shape, dtype=np.float32))
+
+
+def load_backend(kind, model_path, num_threads=None, **kwargs):
+    """
+    Create the inference backend named by kind ('keras', 'tflite' or 'onnx').
+    Extra keyword arguments (inter_op_threads, buckets) go to the backend.
+    """
+    backends = {
+        'keras': KerasBackend,
+        'tflite': TFLiteBackend,
+        'onnx': OnnxBackend
+    }
+    if kind not in backends:
+        raise ValueError(f"Unknown inference backend '{kind}' (expected one of {', '.join(BACKENDS)})")
+    return backends[kind](model_path, num_threads=num_threads, **kwargs)
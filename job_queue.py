@@ -0,0 +1,363 @@
+# job_queue.py
+"""
+Asynchronous scoring jobs backed by a local SQLite queue.
+
+Clients submit one or many images and get a job id back immediately; a pool
+of worker threads claims queued jobs in submission order and runs them
+through a processing function. The queue lives in a SQLite file, so jobs
+survive restarts and several server processes (gunicorn workers) can share
+it without an external broker: a job is claimed inside an IMMEDIATE
+transaction, and jobs left 'running' by a process that died are requeued.
+Each worker process registers a random boot token, so a job is recognized
+as orphaned even when the restarted server got the same PID (PID 1 in a
+container).
+
+Back-pressure: submit() raises QueueFull once the number of queued images
+reaches max_queued_images, so callers can answer 429 instead of letting the
+backlog grow without bound.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from collections import deque
+
+# Callbacks are only delivered to the local machine
+CALLBACK_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+
+class QueueFull(Exception):
+    """The queue is at its configured depth; retry later"""
+
+
+def validate_callback_url(url):
+    """Raise ValueError unless url is an http(s) URL on this machine"""
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme not in ('http', 'https') or parsed.hostname not in CALLBACK_HOSTS:
+        raise ValueError(f"Callback URL must be http(s) on {', '.join(CALLBACK_HOSTS)}")
+    return url
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    process_fn(items, model) -> (model_label, results) scores one job, where
+    items is a list of (name, image bytes or None, error or None) and results
+    is a JSON-serializable list with one entry per item.
+    """
+
+    def __init__(self, process_fn, db_path='jobs.db', num_workers=2, max_queued_images=5000,
+                 retention_seconds=24 * 3600, callback_timeout=5.0, poll_interval=0.5):
+        self.process_fn = process_fn
+        self.db_path = db_path
+        self.num_workers = max(1, int(num_workers))
+        self.max_queued_images = max(1, int(max_queued_images))
+        self.retention_seconds = retention_seconds
+        self.callback_timeout = callback_timeout
+        self.poll_interval = poll_interval
+
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._token = None  # this process's boot token, set by start()
+        self._threads = []
+        self._started_at = time.time()
+
+        # Per-process counters
+        self._busy = 0
+        self._busy_seconds = 0.0
+        self._waits = deque(maxlen=1000)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.callbacks_failed = 0
+
+        db = self._connect()
+        db.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, status TEXT NOT NULL, model TEXT, callback_url TEXT,
+                total INTEGER NOT NULL, owner INTEGER, created_at REAL NOT NULL,
+                started_at REAL, finished_at REAL, results TEXT, error TEXT, callback_status TEXT);
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT NOT NULL, idx INTEGER NOT NULL, name TEXT, data BLOB, error TEXT,
+                PRIMARY KEY (job_id, idx));
+            CREATE TABLE IF NOT EXISTS workers (
+                token TEXT PRIMARY KEY, pid INTEGER NOT NULL, started_at REAL NOT NULL);
+        ''')
+        if 'owner_token' not in [row[1] for row in db.execute('PRAGMA table_info(jobs)')]:
+            # Queue files created before boot tokens were recorded
+            try:
+                db.execute('ALTER TABLE jobs ADD COLUMN owner_token TEXT')
+            except sqlite3.OperationalError:
+                pass  # added by another process meanwhile
+        db.commit()
+
+    def _connect(self):
+        # One connection per thread and process; connections must not cross a fork
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def start(self):
+        """Start the worker threads in this process (idempotent, safe to call after fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._started_at = time.time()
+            self._token = uuid.uuid4().hex
+            self._connect().execute('INSERT INTO workers (token, pid, started_at) VALUES (?, ?, ?)',
+                                    (self._token, self._pid, self._started_at))
+            self._busy = 0
+            self._busy_seconds = 0.0
+            self._threads = [threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+                             for i in range(self.num_workers)]
+            for thread in self._threads:
+                thread.start()
+
+    # Submitting and polling
+
+    def queued_images(self):
+        row = self._connect().execute("SELECT COALESCE(SUM(total), 0) FROM jobs WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def submit(self, items, model=None, callback_url=None):
+        """Queue a job and return its id; raises QueueFull when the queue is at capacity"""
+        if callback_url:
+            validate_callback_url(callback_url)
+        self.start()
+
+        job_id = uuid.uuid4().hex
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if self.queued_images() + len(items) > self.max_queued_images:
+                db.execute('ROLLBACK')
+                with self._lock:
+                    self.rejected += 1
+                raise QueueFull(f'Job queue is full ({self.max_queued_images} queued images)')
+            db.execute('INSERT INTO jobs (id, status, model, callback_url, total, created_at) '
+                       "VALUES (?, 'queued', ?, ?, ?, ?)",
+                       (job_id, model, callback_url, len(items), time.time()))
+            db.executemany('INSERT INTO job_items (job_id, idx, name, data, error) VALUES (?, ?, ?, ?, ?)',
+                           [(job_id, i, name, data, error) for i, (name, data, error) in enumerate(items)])
+            db.execute('COMMIT')
+        except sqlite3.Error:
+            db.execute('ROLLBACK')
+            raise
+
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        """Job status (and results once finished) as a dict, or None for an unknown id"""
+        db = self._connect()
+        row = db.execute('SELECT id, status, model, total, created_at, started_at, finished_at, results, error, '
+                         'callback_status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job_id, status, model, total, created_at, started_at, finished_at, results, error, callback_status = row
+        job = {
+            'job_id': job_id,
+            'status': status,
+            'model': model,
+            'count': total,
+            'created_at': created_at,
+            'wait_seconds': (started_at or time.time()) - created_at,
+            'run_seconds': finished_at - started_at if finished_at and started_at else None
+        }
+        if status == 'queued':
+            job['queue_position'] = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (created_at,)).fetchone()[0]
+        if results is not None:
+            job['results'] = json.loads(results)
+            job['failed'] = sum(1 for r in job['results'] if not r['success'])
+        if error:
+            job['error'] = error
+        if callback_status:
+            job['callback_status'] = callback_status
+        return job
+
+    # Workers
+
+    def _claim(self):
+        """Atomically move the oldest queued job to 'running'; returns (id, model, callback, items) or None"""
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute("SELECT id, model, callback_url, created_at FROM jobs WHERE status = 'queued' "
+                             'ORDER BY created_at LIMIT 1').fetchone()
+            if row is None:
+                db.execute('COMMIT')
+                return None
+            job_id, model, callback_url, created_at = row
+            now = time.time()
+            db.execute("UPDATE jobs SET status = 'running', owner = ?, owner_token = ?, started_at = ? "
+                       'WHERE id = ?', (os.getpid(), self._token, now, job_id))
+            db.execute('COMMIT')
+        except sqlite3.Error:
+            db.execute('ROLLBACK')
+            raise
+
+        items = db.execute('SELECT name, data, error FROM job_items WHERE job_id = ? ORDER BY idx',
+                           (job_id,)).fetchall()
+        with self._lock:
+            self._waits.append(now - created_at)
+        return job_id, model, callback_url, items
+
+    def _finish(self, job_id, model, results, error):
+        db = self._connect()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute('UPDATE jobs SET status = ?, model = ?, results = ?, error = ?, finished_at = ? WHERE id = ?',
+                       ('failed' if error else 'done', model, json.dumps(results) if results is not None else None,
+                        error, time.time(), job_id))
+            # The image bytes are no longer needed once the job has run
+            db.execute('DELETE FROM job_items WHERE job_id = ?', (job_id,))
+            db.execute('COMMIT')
+        except sqlite3.Error:
+            db.execute('ROLLBACK')
+            raise
+
+    def _worker(self):
+        last_maintenance = 0.0
+        while True:
+            if time.monotonic() - last_maintenance > 60:
+                self._maintenance()
+                last_maintenance = time.monotonic()
+
+            try:
+                claimed = self._claim()
+            except sqlite3.Error as e:
+                print(f"Job queue error: {e}")
+                claimed = None
+            if claimed is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            job_id, model, callback_url, items = claimed
+            with self._lock:
+                self._busy += 1
+            start = time.perf_counter()
+            try:
+                model, results = self.process_fn(items, model)
+                error = None
+            except Exception as e:
+                results, error = None, str(e)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._busy_seconds += time.perf_counter() - start
+
+            try:
+                self._finish(job_id, model, results, error)
+            except sqlite3.Error as e:
+                print(f"Job queue error finishing {job_id}: {e}")
+                continue
+            with self._lock:
+                if error:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+            if callback_url:
+                self._send_callback(job_id, callback_url)
+
+    def _send_callback(self, job_id, url, attempts=3):
+        """POST the finished job to its callback URL, retrying with backoff"""
+        body = json.dumps(self.get(job_id)).encode()
+        status = None
+        for attempt in range(attempts):
+            try:
+                request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+                with urllib.request.urlopen(request, timeout=self.callback_timeout) as response:
+                    status = f'delivered ({response.status})'
+                    break
+            except Exception as e:
+                status = f'failed: {e}'
+                if attempt < attempts - 1:
+                    time.sleep(0.5 * 2 ** attempt)
+
+        if status.startswith('failed'):
+            with self._lock:
+                self.callbacks_failed += 1
+        self._connect().execute('UPDATE jobs SET callback_status = ? WHERE id = ?', (status, job_id))
+
+    @staticmethod
+    def _owner_alive(db, owner, token):
+        """Whether the process that claimed a job still runs; its PID alone may have been reused"""
+        if not _pid_alive(owner):
+            return False
+        if token is None:
+            return True  # claimed before boot tokens were recorded
+        row = db.execute('SELECT started_at FROM workers WHERE token = ?', (token,)).fetchone()
+        if row is None:
+            return False
+        # A process started later with the same PID means the owner has been replaced
+        return db.execute('SELECT 1 FROM workers WHERE pid = ? AND started_at > ?', (owner, row[0])).fetchone() is None
+
+    def _maintenance(self):
+        """Requeue jobs orphaned by a dead process and purge expired finished jobs"""
+        db = self._connect()
+        try:
+            running = db.execute("SELECT id, owner, owner_token FROM jobs WHERE status = 'running'").fetchall()
+            for job_id, owner, token in running:
+                if owner and not self._owner_alive(db, owner, token):
+                    db.execute("UPDATE jobs SET status = 'queued', owner = NULL, owner_token = NULL, "
+                               "started_at = NULL WHERE id = ? AND status = 'running'", (job_id,))
+                    print(f"Requeued job {job_id} from stopped process {owner}")
+            for token, pid in db.execute('SELECT token, pid FROM workers').fetchall():
+                if not self._owner_alive(db, pid, token):
+                    db.execute('DELETE FROM workers WHERE token = ?', (token,))
+            if self.retention_seconds:
+                cutoff = time.time() - self.retention_seconds
+                db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,))
+        except sqlite3.Error as e:
+            print(f"Job queue maintenance error: {e}")
+
+    def stats(self):
+        """Queue depth, wait time and worker utilization"""
+        counts = dict(self._connect().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        queued_images = self.queued_images()
+        with self._lock:
+            uptime = max(time.time() - self._started_at, 1e-9)
+            waits = list(self._waits)
+            return {
+                'queued_jobs': counts.get('queued', 0),
+                'queued_images': queued_images,
+                'max_queued_images': self.max_queued_images,
+                'running_jobs': counts.get('running', 0),
+                'workers': self.num_workers if self._pid == os.getpid() else 0,
+                'busy_workers': self._busy,
+                'worker_utilization': self._busy_seconds / (uptime * self.num_workers),
+                'avg_wait_seconds': sum(waits) / len(waits) if waits else 0.0,
+                'max_wait_seconds': max(waits) if waits else 0.0,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'callbacks_failed': self.callbacks_failed
+            }
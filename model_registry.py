@@ -0,0 +1,323 @@
+# model_registry.py
+"""
+Registry of named, versioned models for hot reload without downtime.
+
+Each name (e.g. 'default', 'candidate') has at most one active version.
+Loading a new version happens in the background: the backend is loaded and
+warmed up, then swapped in atomically. Requests hold a reference to the
+version they started on, so in-flight requests finish on the old version,
+which is released once its last request completes.
+"""
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from batching import MicroBatcher
+from inference_backends import load_backend
+from prediction_cache import model_fingerprint
+
+
+class ModelNotAvailable(Exception):
+    """Requested model is unknown, still loading or failed to load"""
+
+    def __init__(self, message, status_code=503):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ModelBudgetExceeded(Exception):
+    """Loading the model would exceed the memory budget"""
+
+
+def parse_model_spec(spec):
+    """'name' or 'name:version' -> (name, version or None)"""
+    if not spec:
+        return None, None
+    name, _, version = spec.partition(':')
+    return name, version or None
+
+
+class ModelVersion:
+    def __init__(self, name, version, kind, path):
+        self.name = name
+        self.version = version
+        self.kind = kind
+        self.path = path
+        self.model_id = model_fingerprint(path)
+
+        self.state = 'loading'  # loading -> ready -> retired, or failed
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.memory_bytes = 0
+
+        self.backend = None
+        self.batcher = None
+        self.embed_batcher = None  # backends with embeddings only
+        self.in_flight = 0
+        self._drained = threading.Condition()
+        self.loaded = threading.Event()  # set once loading has finished (ready or failed)
+
+    @property
+    def model(self):
+        """The Keras model, or None for the tflite/onnx backends"""
+        return self.backend.model if self.backend else None
+
+    def predict(self, batch):
+        return self.backend.predict(batch)
+
+    @property
+    def supports_embeddings(self):
+        """Only the keras backend exposes penultimate-layer embeddings"""
+        return hasattr(self.backend, 'embed')
+
+    def embed_rows(self, batch):
+        # The batcher fans results out row by row, so each row carries [embedding | probabilities]
+        embeddings, probabilities = self.backend.embed(batch)
+        return np.concatenate([embeddings, probabilities], axis=1)
+
+    def embed(self, image):
+        """
+        (embeddings (1, dim), probabilities (1, classes)) for one preprocessed image,
+        batched with concurrent requests
+        """
+        row = self.embed_batcher.predict(image)
+        dim = self.backend.embedding_dim
+        return row[None, :dim], row[None, dim:]
+
+    def info(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'backend': self.kind,
+            'path': self.path,
+            'state': self.state,
+            'error': self.error,
+            'load_seconds': self.load_seconds,
+            'memory_mb': self.memory_bytes / (1024 * 1024),
+            'in_flight': self.in_flight
+        }
+
+
+class ModelRegistry:
+    def __init__(self, memory_budget_bytes=0, backend_options=None, batch_max_size=16, batch_max_wait_ms=5.0,
+                 warmup=True):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.backend_options = backend_options or (lambda kind: {})
+        self.batch_max_size = batch_max_size
+        self.batch_max_wait_ms = batch_max_wait_ms
+        self.warmup = warmup
+
+        self._versions = {}  # (name, version) -> ModelVersion
+        self._active = {}  # name -> ModelVersion
+        self._lock = threading.Lock()
+
+    # Memory accounting
+
+    def memory_used(self):
+        """Estimated bytes held by every resident version (loading, ready or draining)"""
+        with self._lock:
+            return sum(self._estimate(v) for v in self._versions.values() if self._resident(v))
+
+    @staticmethod
+    def _resident(version):
+        return version.state in ('loading', 'ready') or version.backend is not None
+
+    @staticmethod
+    def _estimate(version):
+        if version.memory_bytes:
+            return version.memory_bytes
+        try:
+            return os.path.getsize(version.path)
+        except OSError:
+            return 0
+
+    # Loading and swapping
+
+    def load(self, name, path, kind='keras', version=None, activate=True, background=True):
+        """
+        Load a model version and (by default) make it the active version of `name`
+        once it is warmed up. Returns the ModelVersion immediately when background=True.
+        """
+        if version is None:
+            version = hashlib.blake2b(model_fingerprint(path).encode(), digest_size=4).hexdigest()
+
+        entry = ModelVersion(name, version, kind, path)
+        with self._lock:
+            existing = self._versions.get((name, version))
+            if existing is not None and existing.state in ('loading', 'ready'):
+                raise ValueError(f"Model {name}:{version} is already {existing.state}")
+
+            if self.memory_budget_bytes:
+                used = sum(self._estimate(v) for v in self._versions.values() if self._resident(v))
+                needed = self._estimate(entry)
+                if used + needed > self.memory_budget_bytes:
+                    raise ModelBudgetExceeded(
+                        f"Loading {name}:{version} needs ~{needed / 2 ** 20:.0f} MB but only "
+                        f"{(self.memory_budget_bytes - used) / 2 ** 20:.0f} MB of the budget is free")
+
+            self._versions[(name, version)] = entry
+
+        if background:
+            threading.Thread(target=self._load, args=(entry, activate), name=f'load-{name}-{version}',
+                             daemon=True).start()
+        else:
+            self._load(entry, activate)
+        return entry
+
+    def _load(self, entry, activate):
+        start = time.perf_counter()
+        try:
+            try:
+                backend = load_backend(entry.kind, entry.path, **self.backend_options(entry.kind))
+                print(f"Model {entry.name}:{entry.version} loaded from {entry.path} ({backend.name} backend)")
+                print(f"Model input shape: {backend.input_shape}")
+                if self.warmup:
+                    backend.warmup()
+                    print(f"Model {entry.name}:{entry.version} warm-up completed")
+
+                try:
+                    memory_bytes = backend.weights_bytes()
+                except Exception as e:
+                    # Only an estimate for the memory budget; the file size is used instead
+                    print(f"Could not measure weights of {entry.name}:{entry.version}: {e}")
+                    memory_bytes = 0
+            except Exception as e:
+                print(f"Error loading model {entry.name}:{entry.version}: {e}")
+                entry.state = 'failed'
+                entry.error = str(e)
+                return
+            finally:
+                entry.load_seconds = time.perf_counter() - start
+
+            with self._lock:
+                # The version may have been unloaded while it was loading
+                if self._versions.get((entry.name, entry.version)) is not entry or entry.state != 'loading':
+                    print(f"Model {entry.name}:{entry.version} was unloaded while loading, discarded")
+                    return
+                entry.backend = backend
+                entry.memory_bytes = memory_bytes
+                entry.batcher = MicroBatcher(entry.predict, max_batch_size=self.batch_max_size,
+                                             max_wait_ms=self.batch_max_wait_ms)
+                if entry.supports_embeddings:
+                    # Its worker thread only starts once the embedding index is used
+                    entry.embed_batcher = MicroBatcher(entry.embed_rows, max_batch_size=self.batch_max_size,
+                                                       max_wait_ms=self.batch_max_wait_ms)
+                entry.loaded_at = time.time()
+                entry.state = 'ready'
+                activate = activate or entry.name not in self._active
+
+            if activate:
+                try:
+                    self.activate(entry.name, entry.version)
+                except ModelNotAvailable as e:
+                    print(f"Could not activate model {entry.name}:{entry.version}: {e}")
+        finally:
+            entry.loaded.set()
+
+    def activate(self, name, version):
+        """Atomically make name:version the active version; the previous one is retired"""
+        with self._lock:
+            entry = self._versions.get((name, version))
+            if entry is None or entry.state != 'ready':
+                state = entry.state if entry else 'unknown'
+                raise ModelNotAvailable(f"Model {name}:{version} is {state}", 404 if entry is None else 409)
+            previous = self._active.get(name)
+            self._active[name] = entry
+
+        if previous is not None and previous is not entry:
+            self.retire(previous)
+        print(f"Model {name}:{version} is now active")
+
+    def retire(self, entry):
+        """Release a version once its in-flight requests have finished"""
+        with self._lock:
+            if self._active.get(entry.name) is entry:
+                raise ModelNotAvailable(f"Model {entry.name}:{entry.version} is active", 409)
+            entry.state = 'retired'
+
+        def release():
+            with entry._drained:
+                entry._drained.wait_for(lambda: entry.in_flight == 0)
+            for batcher in (entry.batcher, entry.embed_batcher):
+                if batcher is not None:
+                    batcher.close()
+            entry.backend = None
+            print(f"Model {entry.name}:{entry.version} released")
+
+        threading.Thread(target=release, name=f'retire-{entry.name}-{entry.version}', daemon=True).start()
+
+    def unload(self, name, version):
+        """Remove an inactive version from the registry"""
+        with self._lock:
+            entry = self._versions.get((name, version))
+        if entry is None:
+            raise ModelNotAvailable(f"Unknown model {name}:{version}", 404)
+        if entry.state == 'loading':
+            raise ModelNotAvailable(f"Model {name}:{version} is still loading", 409)
+        if entry.state != 'retired':
+            self.retire(entry)
+        with self._lock:
+            self._versions.pop((name, version), None)
+
+    # Lookup
+
+    def get(self, name='default', version=None):
+        """Return the active (or a specific) version of `name`, or None"""
+        with self._lock:
+            if version is None:
+                return self._active.get(name)
+            return self._versions.get((name, version))
+
+    def status(self, name='default'):
+        """
+        Version of `name` to report in health checks: the active version, else
+        its most recently registered version, or None if nothing was registered.
+        """
+        with self._lock:
+            active = self._active.get(name)
+            if active is not None:
+                return active
+            candidates = [v for (n, _), v in self._versions.items() if n == name]
+        return candidates[-1] if candidates else None
+
+    @contextmanager
+    def use(self, spec=None, default_name='default'):
+        """
+        Acquire a ready model version for the duration of a request.
+        spec is 'name' or 'name:version'; defaults to the active default model.
+        """
+        name, version = parse_model_spec(spec)
+        name = name or default_name
+        entry = self.get(name, version)
+
+        if entry is None:
+            if self.status(name) is None and spec:
+                raise ModelNotAvailable(f"Unknown model '{spec}'", 404)
+            raise ModelNotAvailable(f"Model '{name}' is not loaded")
+
+        with entry._drained:
+            if entry.state != 'ready':
+                raise ModelNotAvailable(f"Model {entry.name}:{entry.version} is {entry.state}")
+            entry.in_flight += 1
+        try:
+            yield entry
+        finally:
+            with entry._drained:
+                entry.in_flight -= 1
+                entry._drained.notify_all()
+
+    def list(self):
+        with self._lock:
+            versions = list(self._versions.values())
+            active = {name: entry.version for name, entry in self._active.items()}
+        return {
+            'active': active,
+            'versions': [v.info() for v in versions],
+            'memory_used_mb': sum(self._estimate(v) for v in versions if self._resident(v)) / (1024 * 1024),
+            'memory_budget_mb': self.memory_budget_bytes / (1024 * 1024) if self.memory_budget_bytes else None
+        }
@@ -0,0 +1,43 @@
+# postprocessing.py
+import numpy as np
+
+# Binary classification class names (based on your training code)
+CLASS_NAMES = [
+    'Benign',
+    'Malignant'
+]
+
+# Detailed explanation for each class
+CLASS_DESCRIPTIONS = {
+    'Benign': 'Non-cancerous skin lesion (nv - Melanocytic nevus, vasc - Vascular lesion, df - Dermatofibroma)',
+    'Malignant': 'Potentially cancerous lesion (mel - Melanoma, bkl - Benign keratosis-like, bcc - Basal cell carcinoma, akiec - Actinic keratosis)'
+}
+
+
+def format_prediction(probabilities):
+    """Build the prediction response from one row of model output"""
+    # Get the predicted class and confidence
+    predicted_class_idx = int(np.argmax(probabilities))
+    confidence = float(probabilities[predicted_class_idx])
+
+    # Get all class probabilities with descriptions
+    class_probabilities = []
+    for i, prob in enumerate(probabilities):
+        class_name = CLASS_NAMES[i] if i < len(CLASS_NAMES) else f'Class {i}'
+        class_probabilities.append({
+            'class': class_name,
+            'probability': float(prob),
+            'description': CLASS_DESCRIPTIONS.get(class_name, 'No description available')
+        })
+
+    # Sort by probability
+    class_probabilities.sort(key=lambda x: x['probability'], reverse=True)
+
+    predicted_class = CLASS_NAMES[predicted_class_idx] if predicted_class_idx < len(
+        CLASS_NAMES) else f'Class {predicted_class_idx}'
+
+    return {
+        'predicted_class': predicted_class,
+        'confidence': confidence,
+        'all_probabilities': class_probabilities
+    }
@@ -0,0 +1,175 @@
+# prediction_cache.py
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def model_fingerprint(model_path):
+    """Identify a model file by path, size and modification time"""
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return f'{model_path}:missing'
+    return f'{os.path.abspath(model_path)}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+def cache_key(image_data, model_id):
+    """Fast content hash of the raw image bytes combined with the model identity"""
+    digest = hashlib.blake2b(image_data, digest_size=16)
+    digest.update(model_id.encode())
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    LRU cache of prediction results keyed by cache_key().
+
+    Bounded both by entry count and by the approximate memory of the stored
+    results. With db_path set, entries are mirrored to a SQLite file and the
+    most recently used ones are reloaded on startup. Cache hits never write to
+    the database: their recency is kept in memory and written along with the
+    next put() (and at exit).
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, db_path=None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.db_path = db_path
+
+        self._entries = OrderedDict()  # key -> serialized result
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        self._db_pid = None
+        self._touched = {}  # key -> time of its latest hit not yet written to the database
+        if db_path:
+            self._load_db()
+            atexit.register(self.flush)
+
+    def _load_db(self):
+        # A short-lived connection: the cache is created at import, before gunicorn forks its workers
+        db = sqlite3.connect(self.db_path)
+        try:
+            db.execute('CREATE TABLE IF NOT EXISTS predictions '
+                       '(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)')
+            db.commit()
+
+            # Reload the most recently used entries that fit within the limits
+            rows = db.execute('SELECT key, value FROM predictions ORDER BY last_used DESC LIMIT ?',
+                              (self.max_entries,)).fetchall()
+            for key, value in reversed(rows):
+                self._insert(key, value)
+            self._delete(db, self._evict())
+            db.commit()
+        finally:
+            db.close()
+
+    def _connection(self):
+        """This process's SQLite connection (callers hold self._lock); connections must not cross a fork"""
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _insert(self, key, value):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(key) + len(old)
+        self._entries[key] = value
+        self._bytes += len(key) + len(value)
+
+    def _evict(self):
+        evicted = []
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, value = self._entries.popitem(last=False)
+            self._bytes -= len(key) + len(value)
+            self._touched.pop(key, None)
+            evicted.append((key,))
+        self.evictions += len(evicted)
+        return evicted
+
+    @staticmethod
+    def _delete(db, evicted):
+        if evicted:
+            db.executemany('DELETE FROM predictions WHERE key = ?', evicted)
+
+    def get(self, key):
+        """Return the cached result for key, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if self.db_path:
+                self._touched[key] = time.time()
+
+        # Return a fresh copy so callers cannot mutate the cached entry
+        return json.loads(value)
+
+    def put(self, key, result):
+        """Store a result for key, evicting least recently used entries if needed"""
+        value = json.dumps(result)
+        with self._lock:
+            self._insert(key, value)
+            evicted = self._evict()
+            if self.db_path:
+                db = self._connection()
+                db.execute('INSERT OR REPLACE INTO predictions (key, value, last_used) VALUES (?, ?, ?)',
+                           (key, value, time.time()))
+                self._touched.pop(key, None)
+                self._delete(db, evicted)
+                self._write_touched(db)
+                db.commit()
+
+    def _write_touched(self, db):
+        if self._touched:
+            db.executemany('UPDATE predictions SET last_used = ? WHERE key = ?',
+                           [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def flush(self):
+        """Write the recency of cache hits since the last put() to the database"""
+        if not self.db_path:
+            return
+        with self._lock:
+            if self._touched:
+                db = self._connection()
+                self._write_touched(db)
+                db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._touched.clear()
+            self._bytes = 0
+            if self.db_path:
+                db = self._connection()
+                db.execute('DELETE FROM predictions')
+                db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'persistent': bool(self.db_path)
+            }
@@ -0,0 +1,135 @@
+# preprocessing.py
+import threading
+
+import numpy as np
+
+# Model input size used in training (MobileNetV2)
+TARGET_SIZE = (224, 224)
+
+# Documented tolerance of the draft-mode path against preprocess_image_reference().
+# JPEG draft decoding downscales in the DCT domain before the final resize, so pixel
+# values differ slightly; use_draft=False is bit-identical to the reference.
+DRAFT_MEAN_ABS_TOLERANCE = 0.02
+DRAFT_MAX_ABS_TOLERANCE = 0.25
+
+
+def preprocess_image_reference(image, target_size=TARGET_SIZE):
+    """
+    Original preprocessing path, kept as the numerical reference.
+    Matches the preprocessing used in training with MobileNetV2
+    """
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Resize image to match training target size
+    image = image.resize(target_size)
+
+    # Convert to numpy array
+    img_array = np.array(image)
+
+    # Normalize pixel values (rescale=1./255 as in training)
+    img_array = img_array.astype('float32') / 255.0
+
+    # Add batch dimension
+    img_array = np.expand_dims(img_array, axis=0)
+
+    return img_array
+
+
+def load_image_array(image, target_size=TARGET_SIZE, use_draft=True):
+    """
+    Decode and resize a PIL image to a uint8 (H, W, 3) array of target_size.
+    For JPEGs that have not been decoded yet, draft mode lets the decoder
+    downscale by 1/2, 1/4 or 1/8 while decoding, so large files are never
+    decoded at full resolution.
+    """
+    if use_draft and image.format == 'JPEG':
+        # draft() keeps the decoded size >= target_size and is a no-op once loaded
+        image.draft('RGB', target_size)
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    if image.size != tuple(target_size):
+        image = image.resize(target_size)
+
+    return np.asarray(image)
+
+
+class Preprocessor:
+    """
+    Batch preprocessing engine.
+
+    Images are decoded straight to the target size and written into a
+    preallocated float32 batch buffer, which is then scaled in place.
+    Each thread gets its own buffer, so the returned batch is only valid
+    until the next call from the same thread.
+    """
+
+    def __init__(self, target_size=TARGET_SIZE, use_draft=True, capacity=32):
+        self.target_size = tuple(target_size)
+        self.use_draft = use_draft
+        self.capacity = max(1, int(capacity))
+        self._local = threading.local()
+
+    def buffer(self, n):
+        """
+        Return this thread's (n, H, W, 3) float32 buffer. Batches larger than
+        capacity get a temporary array, so one oversized request cannot pin
+        memory on the thread for good.
+        """
+        width, height = self.target_size
+        if n > self.capacity:
+            return np.empty((n, height, width, 3), dtype=np.float32)
+        buf = getattr(self._local, 'buffer', None)
+        if buf is None:
+            buf = self._local.buffer = np.empty((self.capacity, height, width, 3), dtype=np.float32)
+        return buf[:n]
+
+    def preprocess_into(self, images, out):
+        """
+        Preprocess images into rows of `out`.
+        Successful images are written compactly from row 0; returns
+        (ok_indices, errors) where errors maps input index to message.
+        """
+        ok_indices = []
+        errors = {}
+        for i, image in enumerate(images):
+            row = len(ok_indices)
+            try:
+                # uint8 -> float32 cast happens on assignment, no temporary array
+                out[row] = load_image_array(image, self.target_size, self.use_draft)
+            except Exception as e:
+                errors[i] = str(e)
+                continue
+            ok_indices.append(i)
+
+        # Rescale all rows at once (rescale=1./255 as in training)
+        filled = out[:len(ok_indices)]
+        np.divide(filled, 255.0, out=filled)
+
+        return ok_indices, errors
+
+    def preprocess_batch(self, images):
+        """
+        Preprocess N images into this thread's batch buffer.
+        Returns (batch, ok_indices, errors); batch row k holds images[ok_indices[k]].
+        """
+        out = self.buffer(len(images))
+        ok_indices, errors = self.preprocess_into(images, out)
+        return out[:len(ok_indices)], ok_indices, errors
+
+
+def preprocess_image(image, target_size=TARGET_SIZE, out=None, use_draft=True):
+    """
+    Preprocess a single image for model prediction.
+    Returns a (1, H, W, 3) float32 array, written into `out` when given.
+    """
+    if out is None:
+        width, height = target_size
+        out = np.empty((1, height, width, 3), dtype=np.float32)
+
+    out[0] = load_image_array(image, target_size, use_draft)
+    np.divide(out, 255.0, out=out)
+
+    return out
@@ -0,0 +1,314 @@
+# score_offline.py
+"""
+Offline bulk scoring of image archives.
+
+Usage:
+    python score_offline.py INPUT --output results.jsonl
+        [--batch-size 64] [--workers 4] [--prefetch 4]
+        [--backend keras] [--model mobilenetv2_checkpoint.h5] [--no-resume]
+
+INPUT is either a directory tree (e.g. TestImages/, the parent folder name is
+recorded as the label) or a CSV manifest with a 'path' column and optional
+'label' column; relative manifest paths are resolved against the manifest.
+
+The output format follows the extension: .csv, .jsonl, or .parquet (written
+as a directory of part files, requires pyarrow). Results are appended and
+flushed after every batch, so an interrupted run restarts where it stopped:
+paths already present in the output are skipped unless --no-resume is given.
+
+Pipeline: paths are streamed (never listed up front), decoded and resized to
+224x224 uint8 in a process pool, and handed to the model in large batches
+through a bounded prefetch queue, so decoding and inference overlap while
+memory stays bounded at about (prefetch + workers) batches.
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from inference_backends import BACKENDS, load_backend
+from postprocessing import CLASS_NAMES, format_prediction
+from preprocessing import TARGET_SIZE, load_image_array
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
+
+_DONE = object()
+
+
+def iter_directory(root):
+    """Yield (path, label) for every image under root, label = parent folder name"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(dirpath, filename), os.path.basename(dirpath)
+
+
+def iter_manifest(manifest_path):
+    """Yield (path, label) from a CSV manifest with 'path' and optional 'label' columns"""
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline='') as f:
+        for row in csv.DictReader(f):
+            path = row['path']
+            if not os.path.isabs(path):
+                path = os.path.join(base, path)
+            yield path, row.get('label', '')
+
+
+def decode_batch(items):
+    """
+    Decode and resize a batch of images (runs in a worker process).
+    Returns (ok_items, uint8 array of shape (n, H, W, 3), failed_items_with_errors).
+    """
+    width, height = TARGET_SIZE
+    pixels = np.empty((len(items), height, width, 3), dtype=np.uint8)
+    ok, failed = [], []
+    for path, label in items:
+        try:
+            with Image.open(path) as image:
+                pixels[len(ok)] = load_image_array(image, TARGET_SIZE)
+            ok.append((path, label))
+        except Exception as e:
+            failed.append((path, label, str(e)))
+    return ok, pixels[:len(ok)], failed
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def start_decoding(items, executor, batch_size, prefetch):
+    """
+    Feed batches of paths to the process pool from a background thread,
+    keeping at most `prefetch` decoded batches waiting for the model.
+    Returns the queue the decoded batches arrive on, in input order.
+    """
+    decoded = queue.Queue(maxsize=prefetch)
+
+    def feed():
+        pending = deque()
+        try:
+            for batch in batched(items, batch_size):
+                pending.append(executor.submit(decode_batch, batch))
+                if len(pending) >= prefetch:
+                    decoded.put(pending.popleft().result())
+            while pending:
+                decoded.put(pending.popleft().result())
+        except Exception as e:
+            decoded.put(e)
+        decoded.put(_DONE)
+
+    threading.Thread(target=feed, name='decode-feeder', daemon=True).start()
+    return decoded
+
+
+class CsvResultWriter:
+    def __init__(self, path, fields):
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=fields)
+        if not exists:
+            self.writer.writeheader()
+
+    @staticmethod
+    def done_paths(path):
+        if not os.path.exists(path):
+            return set()
+        with open(path, newline='') as f:
+            return {row['path'] for row in csv.DictReader(f)}
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlResultWriter:
+    def __init__(self, path, fields):
+        self.file = open(path, 'a')
+
+    @staticmethod
+    def done_paths(path):
+        done = set()
+        if not os.path.exists(path):
+            return done
+        with open(path) as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)['path'])
+                except (ValueError, KeyError):
+                    # A partially written last line from an interrupted run
+                    continue
+        return done
+
+    def write(self, rows):
+        self.file.write(''.join(json.dumps(row) + '\n' for row in rows))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetResultWriter:
+    """Writes one part file per flush into a directory, so appends never rewrite earlier parts"""
+
+    def __init__(self, path, fields):
+        import pyarrow  # noqa: F401
+
+        self.path = path
+        self.fields = fields
+        os.makedirs(path, exist_ok=True)
+        self.part = len([f for f in os.listdir(path) if f.endswith('.parquet')])
+
+    @staticmethod
+    def done_paths(path):
+        if not os.path.isdir(path):
+            return set()
+        import pyarrow.parquet as pq
+
+        done = set()
+        for filename in os.listdir(path):
+            if filename.endswith('.parquet'):
+                done.update(pq.read_table(os.path.join(path, filename), columns=['path']).column('path').to_pylist())
+        return done
+
+    def write(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(rows)
+        part_path = os.path.join(self.path, f'part-{self.part:05d}.parquet')
+        pq.write_table(table, part_path + '.tmp')
+        os.replace(part_path + '.tmp', part_path)
+        self.part += 1
+
+    def close(self):
+        pass
+
+
+WRITERS = {
+    '.csv': CsvResultWriter,
+    '.jsonl': JsonlResultWriter,
+    '.parquet': ParquetResultWriter
+}
+
+
+def result_rows(items, probabilities):
+    rows = []
+    for (path, label), probs in zip(items, probabilities):
+        prediction = format_prediction(probs)
+        row = {
+            'path': path,
+            'label': label,
+            'predicted_class': prediction['predicted_class'],
+            'confidence': prediction['confidence'],
+            'error': ''
+        }
+        for entry in prediction['all_probabilities']:
+            row[f"prob_{entry['class']}"] = entry['probability']
+        rows.append(row)
+    return rows
+
+
+def error_rows(failed):
+    rows = []
+    for path, label, error in failed:
+        row = {'path': path, 'label': label, 'predicted_class': '', 'confidence': None, 'error': error}
+        row.update({f'prob_{name}': None for name in CLASS_NAMES})
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Image directory or CSV manifest')
+    parser.add_argument('--output', required=True, help='results.csv, results.jsonl or results.parquet')
+    parser.add_argument('--batch-size', type=int, default=64, help='Images per model call')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Decode processes')
+    parser.add_argument('--prefetch', type=int, default=4, help='Decoded batches queued ahead of the model')
+    parser.add_argument('--backend', default='keras', choices=BACKENDS)
+    parser.add_argument('--model', default='mobilenetv2_checkpoint.h5', help='Model file for the backend')
+    parser.add_argument('--threads', type=int, default=None, help='Inference threads')
+    parser.add_argument('--no-resume', action='store_true', help='Score every image even if already in the output')
+    args = parser.parse_args()
+
+    extension = os.path.splitext(args.output)[1].lower()
+    if extension not in WRITERS:
+        parser.error(f"Unsupported output format '{extension}' (use .csv, .jsonl or .parquet)")
+    writer_class = WRITERS[extension]
+
+    if args.no_resume and os.path.exists(args.output):
+        parser.error(f"{args.output} already exists; remove it or drop --no-resume")
+
+    done = set() if args.no_resume else writer_class.done_paths(args.output)
+    if done:
+        print(f"Resuming: {len(done)} images already scored in {args.output}")
+
+    items = iter_manifest(args.input) if os.path.isfile(args.input) else iter_directory(args.input)
+    items = (item for item in items if item[0] not in done)
+
+    print(f"Loading {args.backend} model from {args.model}...")
+    backend = load_backend(args.backend, args.model, num_threads=args.threads)
+
+    fields = ['path', 'label', 'predicted_class', 'confidence'] + [f'prob_{name}' for name in CLASS_NAMES] + ['error']
+    writer = writer_class(args.output, fields)
+
+    width, height = TARGET_SIZE
+    buffer = np.empty((args.batch_size, height, width, 3), dtype=np.float32)
+    scored = failed_count = 0
+    start = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            decoded = start_decoding(items, executor, args.batch_size, args.prefetch)
+            while True:
+                result = decoded.get()
+                if result is _DONE:
+                    break
+                if isinstance(result, Exception):
+                    raise result
+
+                ok_items, pixels, failed = result
+                rows = error_rows(failed)
+                if ok_items:
+                    batch = buffer[:len(ok_items)]
+                    batch[...] = pixels
+                    np.divide(batch, 255.0, out=batch)
+                    rows.extend(result_rows(ok_items, backend.predict(batch)))
+                writer.write(rows)
+
+                scored += len(ok_items)
+                failed_count += len(failed)
+                elapsed = time.perf_counter() - start
+                print(f"\rScored {scored} images ({failed_count} failed), {scored / elapsed:.1f} images/s",
+                      end='', flush=True)
+    except KeyboardInterrupt:
+        print("\nInterrupted - rerun the same command to resume")
+        return 1
+    finally:
+        writer.close()
+
+    print(f"\nDone: {scored} images scored, {failed_count} failed in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# serve.py
+"""
+Production server for flask_api.py.
+
+Usage:
+    python serve.py [--host 127.0.0.1] [--port 5000] [--workers 2] [--threads 8]
+                    [--timeout 60] [--graceful-timeout 30] [--no-preload]
+
+Runs the Flask app under gunicorn instead of the Werkzeug development server:
+    * the model is loaded once in the master process before workers are forked
+      (preload), so its weights are shared copy-on-write between workers
+    * each worker serves requests on a thread pool, which lets the
+      micro-batcher group concurrent requests into one model call
+    * SIGTERM stops accepting connections and lets in-flight requests finish
+      for up to --graceful-timeout seconds before workers exit
+
+TensorFlow is not guaranteed to be fork-safe once its runtime has started;
+if workers hang after start-up, use --no-preload to load the model in each
+worker instead (memory then grows linearly with the worker count).
+
+On platforms without gunicorn (Windows), falls back to a single waitress
+process with --threads threads.
+"""
+import argparse
+import os
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker {worker.pid} started")
+    import flask_api
+
+    # Job workers are per process; starting them here picks up jobs persisted before a restart
+    flask_api.job_queue.start()
+
+
+def worker_int(worker):
+    # SIGINT/SIGQUIT stop the worker immediately; only SIGTERM drains for graceful_timeout
+    worker.log.info(f"Worker {worker.pid} interrupted, exiting without draining in-flight requests")
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class FlaskApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import flask_api
+
+            # With preload this runs in the master: finish loading before workers are forked
+            if self.cfg.preload_app:
+                flask_api.wait_until_loaded()
+            return flask_api.app
+
+    options = {
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': 5,
+        'preload_app': not args.no_preload,
+        'post_fork': post_fork,
+        'worker_int': worker_int,
+    }
+    print(f"Starting gunicorn on http://{args.host}:{args.port} "
+          f"({args.workers} workers x {args.threads} threads, preload={not args.no_preload})")
+    FlaskApplication(options).run()
+
+
+def run_waitress(args):
+    from waitress import serve
+    from flask_api import app, job_queue
+
+    job_queue.start()
+    print(f"Starting waitress on http://{args.host}:{args.port} ({args.threads} threads)")
+    serve(app, host=args.host, port=args.port, threads=args.threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WORKERS', 2)),
+                        help='Worker processes')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('THREADS', 8)),
+                        help='Request threads per worker')
+    parser.add_argument('--timeout', type=int, default=60, help='Seconds before a stuck worker is restarted')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Seconds to drain in-flight requests on shutdown')
+    parser.add_argument('--no-preload', action='store_true', help='Load the model in each worker')
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        run_waitress(args)
+    else:
+        run_gunicorn(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,11 @@ import sys
 import os
 import threading
 import time
+import json
+import urllib.request
+import urllib.error
+
+API_URL = "http://127.0.0.1:5000"
 
 
 def install_requirements():
@@ -34,10 +39,31 @@ def start_flask_server():
     os.system("python flask_api.py")
 
 
+def wait_for_server(timeout=300):
+    """Poll the API readiness endpoint until the model is loaded"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{API_URL}/ready", timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except urllib.error.HTTPError as e:
+            # 503 while loading; stop waiting if loading failed
+            if json.loads(e.read() or b'{}').get('model_state') == 'failed':
+                print("Model failed to load - check the server output")
+                return False
+        except (urllib.error.URLError, OSError):
+            pass  # Server not listening yet
+        time.sleep(0.5)
+    return False
+
+
 def start_gui():
     """Start the Tkinter GUI"""
+    print("Waiting for the API server to be ready...")
+    if not wait_for_server():
+        print("API server is not ready; starting the GUI anyway")
     print("Starting GUI application...")
-    time.sleep(3)  # Wait for Flask server to start
     os.system("python gui_app.py")
 
 
@@ -47,7 +73,7 @@ def main():
     print("=" * 60)
 
     # Check if model file exists
-    model_path = "skin_cancer_model.h5"
+    model_path = "mobilenetv2_checkpoint.h5"
     if not os.path.exists(model_path):
         print(f"\n⚠️  WARNING: Model file '{model_path}' not found!")
         print("Please make sure your trained model file is in the same directory")
@@ -65,7 +91,7 @@ def main():
     print("=" * 60)
     print("\nInstructions:")
     print("1. Flask API server will start first")
-    print("2. GUI application will start after 3 seconds")
+    print("2. GUI application will start once the server has loaded the model")
     print("3. Keep both windows open for the application to work")
     print("4. Use Ctrl+C in the terminal to stop the server")
     print("\nStarting in 3 seconds...")
@@ -0,0 +1,252 @@
+# tensor_store.py
+"""
+Memory-mapped store of preprocessed images for repeated evaluation runs.
+
+Usage:
+    python tensor_store.py build INPUT [--store .tensor_store] [--workers 4] [--batch-size 64]
+    python tensor_store.py info [--store .tensor_store]
+    python tensor_store.py verify [--store .tensor_store]
+
+INPUT is an image directory tree (parent folder name = label) or a CSV
+manifest, as for score_offline.py. Each image is decoded and resized once,
+the same way the server does, and stored as 224x224x3 uint8 in one
+numpy.memmap file (4x smaller than float32); readers scale to float32 /255
+on the fly. index.json maps image ids to rows, labels and source hashes.
+
+Rebuilding is incremental: unchanged files (same size and mtime) are
+skipped, files whose content hash changed are re-decoded into their row,
+new files are appended and rows of deleted files are reused.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from preprocessing import TARGET_SIZE
+from score_offline import batched, decode_batch, iter_directory, iter_manifest
+
+PIXELS_FILE = 'pixels.u8'
+INDEX_FILE = 'index.json'
+
+
+def file_hash(path):
+    """Content hash of a source image file"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TensorStore:
+    """
+    uint8 image tensors in a memory-mapped file plus a JSON index.
+    entries maps image id (path relative to where the store was built) ->
+    {'row', 'label', 'path', 'hash', 'size', 'mtime_ns'}.
+    """
+
+    def __init__(self, path, target_size=TARGET_SIZE):
+        self.path = path
+        width, height = target_size
+        self.image_shape = (height, width, 3)
+        self.entries = {}
+        self.free_rows = []
+        self.capacity = 0
+        self._pixels = None
+
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+            if tuple(index['shape']) != self.image_shape:
+                raise ValueError(f"Store {path} holds {index['shape']} images, expected {self.image_shape}")
+            self.entries = index['entries']
+            self.free_rows = index['free_rows']
+            self.capacity = index['capacity']
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def pixels(self):
+        """(capacity, H, W, 3) uint8 memmap, opened read-only on first access"""
+        if self._pixels is None and self.capacity:
+            self._pixels = np.memmap(os.path.join(self.path, PIXELS_FILE), dtype=np.uint8, mode='r',
+                                     shape=(self.capacity,) + self.image_shape)
+        return self._pixels
+
+    def disk_bytes(self):
+        return sum(os.path.getsize(os.path.join(self.path, name))
+                   for name in (PIXELS_FILE, INDEX_FILE) if os.path.exists(os.path.join(self.path, name)))
+
+    def _save_index(self):
+        index = {'shape': list(self.image_shape), 'capacity': self.capacity,
+                 'free_rows': self.free_rows, 'entries': self.entries}
+        tmp_path = os.path.join(self.path, INDEX_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(self.path, INDEX_FILE))
+
+    def _writable_pixels(self, capacity):
+        """Grow the pixel file to `capacity` rows if needed and map it for writing"""
+        self._pixels = None
+        pixels_path = os.path.join(self.path, PIXELS_FILE)
+        row_bytes = int(np.prod(self.image_shape))
+        with open(pixels_path, 'ab') as f:
+            if f.tell() < capacity * row_bytes:
+                f.truncate(capacity * row_bytes)
+        self.capacity = max(self.capacity, capacity)
+        return np.memmap(pixels_path, dtype=np.uint8, mode='r+', shape=(self.capacity,) + self.image_shape)
+
+    # Building
+
+    def plan(self, items):
+        """
+        Compare source files with the index.
+        Returns (to_decode, removed_ids); to_decode holds (id, path, label, hash, stat) for new or changed files.
+        """
+        to_decode = []
+        seen = set()
+        for path, label in items:
+            image_id = os.path.relpath(path)
+            seen.add(image_id)
+            stat = os.stat(path)
+            entry = self.entries.get(image_id)
+            if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                if entry['label'] != label:
+                    entry['label'] = label
+                continue
+
+            digest = file_hash(path)
+            if entry and entry['hash'] == digest:
+                # Touched but unchanged: only refresh the stat fields
+                entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, label=label)
+                continue
+            to_decode.append((image_id, path, label, digest, stat))
+
+        removed = [image_id for image_id in self.entries if image_id not in seen]
+        return to_decode, removed
+
+    def build(self, items, workers=None, batch_size=64):
+        """Add new and changed images, drop removed ones; returns (added_or_updated, removed, failed)"""
+        os.makedirs(self.path, exist_ok=True)
+        to_decode, removed = self.plan(items)
+
+        for image_id in removed:
+            self.free_rows.append(self.entries.pop(image_id)['row'])
+
+        # Changed files keep their row; new files take free rows first, then new rows at the end
+        new_count = sum(1 for image_id, *_ in to_decode if image_id not in self.entries)
+        extra = max(0, new_count - len(self.free_rows))
+        if not to_decode:
+            self._save_index()
+            return 0, len(removed), []
+        pixels = self._writable_pixels(self.capacity + extra)
+        free_rows = sorted(self.free_rows) + list(range(self.capacity - extra, self.capacity))
+        self.free_rows = []
+
+        failed = []
+        by_path = {path: (image_id, digest, stat) for image_id, path, _, digest, stat in to_decode}
+        batches = batched([(path, label) for _, path, label, _, _ in to_decode], batch_size)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for ok_items, decoded, batch_failed in executor.map(decode_batch, batches):
+                for (path, label), array in zip(ok_items, decoded):
+                    image_id, digest, stat = by_path[path]
+                    entry = self.entries.get(image_id)
+                    row = entry['row'] if entry else free_rows.pop(0)
+                    pixels[row] = array
+                    self.entries[image_id] = {'row': row, 'label': label, 'path': os.path.abspath(path),
+                                              'hash': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+                failed.extend(batch_failed)
+
+        pixels.flush()
+        del pixels
+        self.free_rows = sorted(free_rows)
+        self._save_index()
+        return len(to_decode) - len(failed), len(removed), failed
+
+    def stale(self):
+        """Ids whose source file is missing or no longer matches the stored hash"""
+        stale = []
+        for image_id, entry in self.entries.items():
+            try:
+                stat = os.stat(entry['path'])
+            except OSError:
+                stale.append(image_id)
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (entry['size'], entry['mtime_ns']) and \
+                    file_hash(entry['path']) != entry['hash']:
+                stale.append(image_id)
+        return stale
+
+    # Reading
+
+    def batches(self, batch_size=64, ids=None):
+        """
+        Yield (ids, labels, uint8 batch) in row order. Batches of consecutive
+        rows are zero-copy slices of the memmap; others are gathered.
+        """
+        entries = sorted(((self.entries[i]['row'], i) for i in (ids if ids is not None else self.entries)))
+        pixels = self.pixels
+        for start in range(0, len(entries), batch_size):
+            chunk = entries[start:start + batch_size]
+            rows = [row for row, _ in chunk]
+            if rows[-1] - rows[0] == len(rows) - 1:
+                batch = pixels[rows[0]:rows[-1] + 1]
+            else:
+                batch = pixels[rows]
+            yield [i for _, i in chunk], [self.entries[i]['label'] for _, i in chunk], batch
+
+    def float_batches(self, batch_size=64, ids=None):
+        """Like batches(), scaled to float32 /255 into one reused buffer (valid until the next batch)"""
+        buffer = np.empty((batch_size,) + self.image_shape, dtype=np.float32)
+        for batch_ids, labels, batch in self.batches(batch_size, ids):
+            out = buffer[:len(batch)]
+            np.divide(batch, np.float32(255.0), out=out)
+            yield batch_ids, labels, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['build', 'info', 'verify'])
+    parser.add_argument('input', nargs='?', help='Image directory or CSV manifest (build)')
+    parser.add_argument('--store', default='.tensor_store', help='Store directory')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Decode processes')
+    parser.add_argument('--batch-size', type=int, default=64, help='Images per decode task')
+    args = parser.parse_args()
+
+    store = TensorStore(args.store)
+
+    if args.command == 'build':
+        if not args.input:
+            parser.error('build needs an INPUT directory or manifest')
+        items = iter_manifest(args.input) if os.path.isfile(args.input) else iter_directory(args.input)
+        start = time.perf_counter()
+        updated, removed, failed = store.build(items, workers=args.workers, batch_size=args.batch_size)
+        print(f"Stored {updated} new/changed images, removed {removed}, {len(failed)} failed "
+              f"in {time.perf_counter() - start:.1f}s")
+        for path, _, error in failed:
+            print(f"  {path}: {error}")
+
+    elif args.command == 'verify':
+        stale = store.stale()
+        print(f"{len(stale)} of {len(store)} entries are stale" + (" - run build again" if stale else ""))
+        for image_id in stale:
+            print(f"  {image_id}")
+        return 1 if stale else 0
+
+    labels = {}
+    for entry in store.entries.values():
+        labels[entry['label']] = labels.get(entry['label'], 0) + 1
+    print(f"{len(store)} images in {args.store} ({store.disk_bytes() / 2 ** 20:.1f} MB on disk, "
+          f"{store.capacity - len(store)} free rows); labels: {labels}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
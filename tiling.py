@@ -0,0 +1,125 @@
+# tiling.py
+"""
+Tiled inference for high-resolution images.
+
+Instead of squashing a whole clinical photo down to 224x224, the image is
+resized so that a grid of overlapping 224x224 tiles covers it with at most
+max_tiles tiles, the tiles are cut out with NumPy stride tricks (a
+sliding-window view, no per-tile PIL crops or copies until a tile is written
+into the batch buffer) and scored in batched forward passes.
+
+The result holds the aggregated probabilities plus the per-tile grid, so a
+small lesion in a wide shot shows up as one high-scoring tile.
+"""
+import math
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from preprocessing import TARGET_SIZE
+
+TILE_SIZE = TARGET_SIZE[0]
+
+AGGREGATIONS = ('mean', 'max')
+
+
+def tile_starts(length, tile, stride):
+    """Tile offsets along one axis; the last tile is aligned to the edge so the whole axis is covered"""
+    if length <= tile:
+        return np.array([0])
+    starts = list(range(0, length - tile + 1, stride))
+    if starts[-1] != length - tile:
+        starts.append(length - tile)
+    return np.array(starts)
+
+
+def plan_grid(width, height, tile=TILE_SIZE, overlap=0.5, max_tiles=64, max_side=2048):
+    """
+    Choose the scale the image is tiled at: as close to full resolution as
+    max_side allows, reduced until the grid has at most max_tiles tiles.
+    Returns (scaled_width, scaled_height, stride).
+    """
+    stride = max(1, int(round(tile * (1.0 - overlap))))
+    scale = min(1.0, max_side / max(width, height))
+    while True:
+        scaled_w = max(tile, int(round(width * scale)))
+        scaled_h = max(tile, int(round(height * scale)))
+        count = len(tile_starts(scaled_w, tile, stride)) * len(tile_starts(scaled_h, tile, stride))
+        if count <= max_tiles or (scaled_w == tile and scaled_h == tile):
+            return scaled_w, scaled_h, stride
+        # Shrink roughly in proportion to the excess tile count
+        scale *= max(0.5, min(0.95, math.sqrt(max_tiles / count)))
+
+
+def load_for_tiling(image, width, height):
+    """Decode a PIL image to a uint8 (height, width, 3) array, using JPEG draft mode when downscaling"""
+    if image.format == 'JPEG':
+        image.draft('RGB', (width, height))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if image.size != (width, height):
+        image = image.resize((width, height))
+    return np.asarray(image)
+
+
+def predict_tiled(image, predict_fn, max_tiles=64, overlap=0.5, max_side=2048, chunk_size=32,
+                  aggregate='max', positive_index=-1):
+    """
+    Score an image tile by tile.
+    predict_fn takes a float32 (n, 224, 224, 3) batch scaled to [0, 1].
+    aggregate='max' reports the probabilities of the tile with the highest
+    positive_index (lesion) probability, 'mean' averages all tiles.
+    Returns a dict with the aggregated 'probabilities', the 'grid' of per-tile
+    probabilities (rows x cols x classes) and timing/shape information.
+    """
+    if aggregate not in AGGREGATIONS:
+        raise ValueError(f"aggregate must be one of {', '.join(AGGREGATIONS)}")
+
+    start = time.perf_counter()
+    original_size = image.size
+    width, height, stride = plan_grid(*original_size, tile=TILE_SIZE, overlap=overlap,
+                                      max_tiles=max_tiles, max_side=max_side)
+    pixels = load_for_tiling(image, width, height)
+    decoded = time.perf_counter()
+
+    # (H - t + 1, W - t + 1, 3, t, t) view of every possible tile; nothing is copied here
+    windows = sliding_window_view(pixels, (TILE_SIZE, TILE_SIZE), axis=(0, 1))
+    ys, xs = tile_starts(height, TILE_SIZE, stride), tile_starts(width, TILE_SIZE, stride)
+    row_index, col_index = (a.ravel() for a in np.meshgrid(ys, xs, indexing='ij'))
+    count = len(row_index)
+
+    buffer = np.empty((min(chunk_size, count), TILE_SIZE, TILE_SIZE, 3), dtype=np.float32)
+    outputs = []
+    for offset in range(0, count, chunk_size):
+        rows, cols = row_index[offset:offset + chunk_size], col_index[offset:offset + chunk_size]
+        batch = buffer[:len(rows)]
+        # Gather the tiles straight into the float32 batch buffer (uint8 -> float32 on assignment)
+        batch[...] = windows[rows, cols].transpose(0, 2, 3, 1)
+        np.divide(batch, 255.0, out=batch)
+        outputs.append(np.asarray(predict_fn(batch)))
+    inference_seconds = time.perf_counter() - decoded
+
+    probabilities = np.concatenate(outputs)
+    grid = probabilities.reshape(len(ys), len(xs), -1)
+    suspicious = int(np.argmax(probabilities[:, positive_index]))
+    aggregated = probabilities.mean(axis=0) if aggregate == 'mean' else probabilities[suspicious]
+
+    row, col = divmod(suspicious, len(xs))
+    return {
+        'probabilities': aggregated,
+        'grid': grid,
+        'most_suspicious_tile': {'row': row, 'col': col, 'x': int(xs[col]), 'y': int(ys[row]),
+                                 'probability': float(probabilities[suspicious, positive_index])},
+        'rows': len(ys),
+        'cols': len(xs),
+        'tiles': count,
+        'tile_size': TILE_SIZE,
+        'stride': stride,
+        'original_size': list(original_size),
+        'tiled_size': [width, height],
+        'aggregate': aggregate,
+        'decode_seconds': decoded - start,
+        'inference_seconds': inference_seconds,
+        'tiles_per_second': count / inference_seconds if inference_seconds > 0 else None
+    }
@@ -0,0 +1,95 @@
+# tta.py
+"""
+Test-time augmentation (TTA).
+
+Augmented views of a preprocessed batch are generated with NumPy array ops
+(flips, 90 degree rotations and center crops resized back to the model input
+size), scored together as one batch, and their probabilities are averaged per
+image. Dermoscopic lesions have no canonical orientation, so every view is a
+plausible input for the model.
+"""
+import numpy as np
+
+# Views generated by default, in output order ('identity' is the original image)
+DEFAULT_VIEWS = ('identity', 'flip_lr', 'flip_ud', 'rot90', 'rot180', 'rot270', 'crop_0.875')
+
+TTA_MODES = ('off', 'always', 'adaptive')
+
+
+def _center_crop_resize(batch, fraction):
+    """Center crop each image to `fraction` of its size and resize back (bilinear) in one vectorized pass"""
+    n, height, width, channels = batch.shape
+    crop_h, crop_w = height * fraction, width * fraction
+    top, left = (height - crop_h) / 2, (width - crop_w) / 2
+
+    # Source coordinates of every output pixel (pixel centres), shared by the whole batch
+    ys = top + (np.arange(height, dtype=np.float32) + 0.5) * crop_h / height - 0.5
+    xs = left + (np.arange(width, dtype=np.float32) + 0.5) * crop_w / width - 0.5
+    y0 = np.clip(np.floor(ys).astype(np.intp), 0, height - 1)
+    x0 = np.clip(np.floor(xs).astype(np.intp), 0, width - 1)
+    y1 = np.minimum(y0 + 1, height - 1)
+    x1 = np.minimum(x0 + 1, width - 1)
+    wy = (ys - y0)[None, :, None, None]
+    wx = (xs - x0)[None, None, :, None]
+
+    top_row = batch[:, y0][:, :, x0] * (1 - wx) + batch[:, y0][:, :, x1] * wx
+    bottom_row = batch[:, y1][:, :, x0] * (1 - wx) + batch[:, y1][:, :, x1] * wx
+    return (top_row * (1 - wy) + bottom_row * wy).astype(batch.dtype, copy=False)
+
+
+def make_view(batch, view):
+    """Apply one named view to a (N, H, W, C) batch"""
+    if view == 'identity':
+        return batch
+    if view == 'flip_lr':
+        return batch[:, :, ::-1]
+    if view == 'flip_ud':
+        return batch[:, ::-1]
+    if view.startswith('rot'):
+        # Rotations keep the shape only for square inputs (224x224)
+        return np.rot90(batch, k=int(view[3:]) // 90, axes=(1, 2))
+    if view.startswith('crop_'):
+        return _center_crop_resize(batch, float(view[5:]))
+    raise ValueError(f"Unknown TTA view '{view}'")
+
+
+def augment(batch, views=DEFAULT_VIEWS, out=None):
+    """
+    Stack every view of every image into one array of shape (V * N, H, W, C),
+    view-major: rows [v * N:(v + 1) * N] hold view v of all N images.
+    """
+    n = batch.shape[0]
+    if out is None:
+        out = np.empty((len(views) * n,) + batch.shape[1:], dtype=batch.dtype)
+    for i, view in enumerate(views):
+        out[i * n:(i + 1) * n] = make_view(batch, view)
+    return out
+
+
+def aggregate(probabilities, num_views):
+    """Average view-major (V * N, C) probabilities back to (N, C)"""
+    probabilities = np.asarray(probabilities)
+    return probabilities.reshape(num_views, -1, probabilities.shape[-1]).mean(axis=0)
+
+
+def predict_tta(predict_fn, batch, views=DEFAULT_VIEWS, base_probabilities=None):
+    """
+    Score every view of `batch` in a single predict_fn call and return the mean
+    probabilities per image. If the identity prediction is already known, pass
+    it as base_probabilities and the identity view is not scored again.
+    """
+    if base_probabilities is not None:
+        views = tuple(v for v in views if v != 'identity')
+        if not views:
+            return np.asarray(base_probabilities)
+        view_probabilities = aggregate(predict_fn(augment(batch, views)), len(views))
+        # Weight the base prediction as one view among the others
+        return (np.asarray(base_probabilities) + view_probabilities * len(views)) / (len(views) + 1)
+
+    return aggregate(predict_fn(augment(batch, views)), len(views))
+
+
+def in_band(confidence, band):
+    """True if a confidence falls inside the [low, high) band that triggers adaptive TTA"""
+    low, high = band
+    return low <= confidence < high